@@ -0,0 +1,300 @@
+from dataclasses import dataclass
+from typing import Optional, Tuple
+import pandas as pd
+import numpy as np
+from cache import LRUCache
+
+# Dimensi dan ukuran pada cube agregasi
+CUBE_DIMENSIONS = ['Bulan', 'Sopir', 'Plat Nomor', 'Order', 'Hari_Minggu', 'Quarter']
+CUBE_MEASURES = ['Volume (L)', 'Pemasukan', 'Pengeluaran']
+# Rasio per baris, rata-ratanya dihitung dari sum/count agar tetap bisa di-rollup
+RATIO_MEASURES = ['Efisiensi', 'Revenue_per_Liter']
+
+# Hasil rollup/totals dari cube bersama di-cache per versi data (LRU, jumlah entri terbatas)
+ROLLUP_CACHE = LRUCache(maxsize=256)
+
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def enrich_transactions(df):
+    """Return a new frame with time keys and per-litre ratios derived once"""
+    enriched = df.copy()
+
+    if 'Tanggal' in enriched.columns:
+        tanggal = pd.to_datetime(enriched['Tanggal'], errors='coerce')
+        enriched['Tanggal'] = tanggal
+        # Label bulan dibuat dari kategori period, bukan string per baris
+        bulan = tanggal.dt.to_period('M').astype('category')
+        enriched['Bulan'] = bulan.cat.rename_categories(lambda period: period.strftime('%Y-%m'))
+        day_codes = tanggal.dt.dayofweek.fillna(-1).astype('int8')
+        enriched['Hari_Minggu'] = pd.Categorical.from_codes(day_codes, categories=DAY_NAMES)
+        enriched['Quarter'] = tanggal.dt.quarter.astype('Int8')
+
+    if all(col in enriched.columns for col in CUBE_MEASURES):
+        # Volume 0 (baris pengeluaran) tidak punya rasio per liter: NaN, bukan inf
+        volume = enriched['Volume (L)'].astype('float64')
+        volume = volume.where(volume != 0)
+        pemasukan = enriched['Pemasukan'].astype('float64')
+        pengeluaran = enriched['Pengeluaran'].astype('float64')
+        enriched['Efisiensi'] = (pemasukan - pengeluaran) / volume
+        enriched['Revenue_per_Liter'] = pemasukan / volume
+        enriched['Cost_per_Liter'] = pengeluaran / volume
+        enriched['Profit_per_Liter'] = enriched['Revenue_per_Liter'] - enriched['Cost_per_Liter']
+
+    return enriched
+
+
+def _cube_input(df):
+    """Select dimension keys and measures needed to build the cube"""
+    if 'Tanggal' in df.columns and 'Bulan' not in df.columns:
+        df = enrich_transactions(df)
+
+    work = pd.DataFrame(index=df.index)
+    for dim in CUBE_DIMENSIONS:
+        if dim in df.columns:
+            work[dim] = df[dim]
+    if 'Tanggal' in df.columns:
+        work['Tanggal_count'] = df['Tanggal'].notna().astype('int64')
+
+    for measure in CUBE_MEASURES + RATIO_MEASURES:
+        if measure in df.columns:
+            work[measure] = pd.to_numeric(df[measure], errors='coerce').astype('float64')
+    # Rasio dari volume 0 (inf) dianggap missing; inf membuat sum grup bergantung urutan baris
+    for measure in RATIO_MEASURES:
+        if measure in work.columns:
+            work[measure] = work[measure].where(np.isfinite(work[measure]))
+
+    return work
+
+
+def build_cube(df):
+    """Build the summary cube (sum/count per measure) over all dimensions"""
+    work = _cube_input(df)
+    dims = [dim for dim in CUBE_DIMENSIONS if dim in work.columns]
+    values = [col for col in CUBE_MEASURES + RATIO_MEASURES if col in work.columns]
+
+    if not dims:
+        # Tanpa dimensi, cube berisi satu baris total
+        work['_total'] = 0
+        dims = ['_total']
+
+    grouped = work.groupby(dims, observed=True, dropna=False, sort=False)
+
+    cube = grouped.size().to_frame('Jumlah_Baris')
+    if values:
+        stats = grouped[values].agg(['sum', 'count'])
+        stats.columns = [f'{col}_{stat}' for col, stat in stats.columns]
+        cube = stats.join(cube)
+    if 'Tanggal_count' in work.columns:
+        cube['Tanggal_count'] = grouped['Tanggal_count'].sum()
+    return cube.reset_index().drop(columns=['_total'], errors='ignore')
+
+
+def merge_cubes(cube, delta):
+    """Merge a delta cube (built from new rows) into an existing cube"""
+    dims = [dim for dim in CUBE_DIMENSIONS if dim in cube.columns]
+    combined = pd.concat([cube, delta], ignore_index=True)
+    # Kategori disatukan dulu agar kunci dari data baru tidak hilang
+    for dim in dims:
+        if isinstance(cube[dim].dtype, pd.CategoricalDtype) or isinstance(delta[dim].dtype, pd.CategoricalDtype):
+            categories = pd.api.types.union_categoricals(
+                [cube[dim].astype('category'), delta[dim].astype('category')]
+            ).categories
+            combined[dim] = pd.Categorical(combined[dim], categories=categories)
+    if 'Quarter' in dims:
+        combined['Quarter'] = combined['Quarter'].astype('Int8')
+    merged = combined.groupby(dims, observed=True, dropna=False, sort=False).sum(numeric_only=True)
+    return merged.reset_index()
+
+
+def cube_measures(cube):
+    """Names of the measures available in a cube"""
+    return [col[:-4] for col in cube.columns if col.endswith('_sum')]
+
+
+def tag_cube(cube, version):
+    """Mark a shared cube so its rollups and totals are cached under the given data version"""
+    cube.attrs['cache_version'] = (version, id(cube))
+    return cube
+
+
+def _cached(cube, kind, by, compute):
+    tag = cube.attrs.get('cache_version')
+    # Subset/salinan cube ikut mewarisi attrs, jadi hanya objek cube yang ditandai yang memakai cache
+    if tag is None or tag[1] != id(cube):
+        return compute()
+    result = ROLLUP_CACHE.get_or_compute((tag[0], kind, tuple(by)), compute)
+    # Salinan dangkal: pemanggil boleh menambah kolom tanpa mengubah isi cache
+    return result.copy(deep=False) if isinstance(result, (pd.DataFrame, pd.Series)) else result
+
+
+def invalidate_rollups(predicate=None):
+    """Drop cached rollups whose data version matches predicate (all if None)"""
+    return ROLLUP_CACHE.invalidate(None if predicate is None else lambda key: predicate(key[0]))
+
+
+def rollup(cube, by, keep_categories=False):
+    """Roll the cube up to the given dimensions with sum, count and mean per measure
+
+    Categorical keys become plain objects for plotting unless keep_categories
+    is set, in which case their codes stay available for array lookups.
+    """
+    if isinstance(by, str):
+        by = [by]
+    if keep_categories:
+        return _cached(cube, 'rollup_categories', by, lambda: _rollup(cube, by))
+    return _cached(cube, 'rollup', by, lambda: _object_keys(rollup(cube, by, keep_categories=True), by))
+
+
+def _rollup(cube, by):
+    value_cols = [col for col in cube.columns if col.endswith(('_sum', '_count')) or col == 'Jumlah_Baris']
+
+    result = cube.groupby(by, observed=True, sort=False)[value_cols].sum().reset_index()
+
+    for measure in cube_measures(cube):
+        result[f'{measure}_mean'] = result[f'{measure}_sum'] / result[f'{measure}_count']
+
+    # Urutan baris mengikuti nilai kunci (bukan urutan kode kategori)
+    return result.sort_values(by, key=_sort_key).reset_index(drop=True)
+
+
+def _sort_key(values):
+    return values.astype(object) if isinstance(values.dtype, pd.CategoricalDtype) else values
+
+
+def _object_keys(result, by):
+    # Kunci kategori diubah ke object agar hasil kecil ini mudah diplot
+    for col in by:
+        if isinstance(result[col].dtype, pd.CategoricalDtype):
+            result[col] = result[col].astype(object)
+    return result
+
+
+def totals(cube):
+    """Grand totals of the cube as a Series (sum, count and mean per measure)"""
+    return _cached(cube, 'totals', [], lambda: _totals(cube))
+
+
+def _totals(cube):
+    value_cols = [col for col in cube.columns if col.endswith(('_sum', '_count')) or col == 'Jumlah_Baris']
+    result = cube[value_cols].sum()
+
+    for measure in cube_measures(cube):
+        count = result[f'{measure}_count']
+        result[f'{measure}_mean'] = result[f'{measure}_sum'] / count if count > 0 else np.nan
+
+    return result
+
+
+# Dimensi yang dicari paling/kurang efisiennya oleh kernel KPI
+KPI_DIMENSIONS = {'best_month': 'Bulan', 'best_armada': 'Plat Nomor', 'best_sopir': 'Sopir'}
+
+
+@dataclass(frozen=True)
+class KPIs:
+    """Headline metrics of a cube; (label, Rp/L) pairs are None when the dimension is missing"""
+    total_pemasukan: float
+    total_pengeluaran: float
+    laba: float
+    total_volume: float
+    jumlah_baris: int
+    # Persen laba terhadap pemasukan
+    profit_margin: float
+    # Rasio total (Rp per liter dari jumlah seluruh baris)
+    revenue_per_liter: float
+    cost_per_liter: float
+    # Rata-rata rasio per baris (Rp/L), sama dengan kolom Efisiensi dan Revenue_per_Liter
+    efisiensi_mean: float
+    revenue_per_liter_mean: float
+    # Persen perubahan pemasukan bulan terakhir terhadap bulan pertama
+    growth_rate: float
+    best_month: Optional[Tuple[str, float]] = None
+    worst_month: Optional[Tuple[str, float]] = None
+    best_armada: Optional[Tuple[str, float]] = None
+    worst_armada: Optional[Tuple[str, float]] = None
+    best_sopir: Optional[Tuple[str, float]] = None
+    worst_sopir: Optional[Tuple[str, float]] = None
+
+
+def kpis(cube):
+    """All headline metrics of a cube in one pass, cached per data version like totals"""
+    return _cached(cube, 'kpis', [], lambda: _kpis(cube))
+
+
+def _group_codes(values):
+    """Integer codes (-1 for missing) and the key of every code, ordered by key value"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes, keys = values.cat.codes.to_numpy(), values.cat.categories
+        # Kategori hasil ingest bisa tidak terurut; kode dipetakan ulang ke urutan nilai kunci
+        order = keys.argsort()
+        if not (order == np.arange(len(keys))).all():
+            rank = np.empty(len(keys) + 1, dtype='int64')
+            rank[order], rank[-1] = np.arange(len(keys)), -1
+            codes, keys = rank[codes], keys[order]
+        return codes, keys
+    codes, keys = pd.factorize(values, sort=True)
+    return codes, keys
+
+
+def _group_sums(cube, dim, columns):
+    """Per-key sums of cube columns with one bincount each, plus which keys occur"""
+    codes, keys = _group_codes(cube[dim])
+    valid = codes >= 0
+    codes = codes[valid]
+    sums = [np.bincount(codes, weights=cube[col].to_numpy(dtype='float64')[valid], minlength=len(keys))
+            for col in columns]
+    observed = np.bincount(codes, minlength=len(keys)) > 0
+    return keys, observed, sums
+
+
+def _best_worst(keys, observed, values):
+    # Urutan kunci sama dengan rollup, jadi seri nilai jatuh ke kunci pertama seperti idxmax/idxmin
+    values = np.where(observed, values, np.nan)
+    if np.isnan(values).all():
+        return None, None
+    best, worst = np.nanargmax(values), np.nanargmin(values)
+    return (keys[best], values[best]), (keys[worst], values[worst])
+
+
+def _ratio(numerator, denominator):
+    return numerator / denominator if denominator else np.nan
+
+
+def _kpis(cube):
+    column_totals = totals(cube)
+    total = lambda col: column_totals.get(col, np.nan)
+
+    pemasukan, pengeluaran, volume = total('Pemasukan_sum'), total('Pengeluaran_sum'), total('Volume (L)_sum')
+    metrics = {
+        'total_pemasukan': pemasukan,
+        'total_pengeluaran': pengeluaran,
+        'laba': pemasukan - pengeluaran,
+        'total_volume': volume,
+        'jumlah_baris': int(column_totals.get('Jumlah_Baris', 0)),
+        'profit_margin': _ratio(pemasukan - pengeluaran, pemasukan) * 100,
+        'revenue_per_liter': _ratio(pemasukan, volume),
+        'cost_per_liter': _ratio(pengeluaran, volume),
+        'efisiensi_mean': total('Efisiensi_mean'),
+        'revenue_per_liter_mean': total('Revenue_per_Liter_mean'),
+        'growth_rate': 0
+    }
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if 'Bulan' in cube.columns and 'Pemasukan_sum' in cube.columns:
+            _, observed, (monthly_revenue,) = _group_sums(cube, 'Bulan', ['Pemasukan_sum'])
+            monthly_revenue = monthly_revenue[observed]
+            if len(monthly_revenue) > 1:
+                metrics['growth_rate'] = (monthly_revenue[-1] - monthly_revenue[0]) / monthly_revenue[0] * 100
+
+        if 'Efisiensi_sum' in cube.columns:
+            for best_field, dim in KPI_DIMENSIONS.items():
+                if dim not in cube.columns:
+                    continue
+                keys, observed, (efficiency_sum, efficiency_count) = _group_sums(
+                    cube, dim, ['Efisiensi_sum', 'Efisiensi_count']
+                )
+                best, worst = _best_worst(keys, observed, efficiency_sum / efficiency_count)
+                metrics[best_field] = best
+                metrics[best_field.replace('best_', 'worst_')] = worst
+
+    return KPIs(**metrics)
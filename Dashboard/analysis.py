@@ -0,0 +1,510 @@
+# Lapisan komputasi murni untuk halaman analisis dashboard (tanpa Streamlit dan Plotly)
+# Setiap fungsi compute_* memakai signature yang sama (df, cube, df_locations) dan
+# mengembalikan dataclass berisi KPI dan frame agregat yang siap dirender.
+# df_locations boleh berupa tabel Sheet 3 atau LocationDimension yang sudah dibangun
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+import pandas as pd
+
+from aggregates import DAY_NAMES, kpis, rollup
+from cache import LRUCache
+from geo import GridIndex, build_index, location_dimension
+
+# Hasil halaman per versi data (hasil dibagi antar sesi, jadi renderer tidak boleh mengubahnya)
+RESULT_CACHE = LRUCache(maxsize=64)
+
+# Kolom yang wajib ada untuk setiap halaman
+REQUIRED_COLUMNS = {
+    'transaksi_keuangan': ['Tanggal', 'Pemasukan', 'Pengeluaran'],
+    'pengiriman_air': ['Tanggal', 'Volume (L)'],
+    'demografi_pengiriman': ['Tanggal', 'Order', 'Volume (L)', 'Pemasukan'],
+    'penggunaan_armada': ['Plat Nomor', 'Volume (L)'],
+    'kinerja_sopir': ['Sopir', 'Volume (L)'],
+    'efisiensi_operasional': ['Tanggal', 'Plat Nomor', 'Sopir', 'Volume (L)', 'Pemasukan', 'Pengeluaran'],
+    'pola_operasional': ['Tanggal', 'Volume (L)', 'Pemasukan', 'Pengeluaran'],
+    'performa_bisnis': ['Tanggal', 'Volume (L)', 'Pemasukan', 'Pengeluaran', 'Sopir', 'Plat Nomor']
+}
+
+ALL_ARMADA = 'Semua Armada'
+
+# Halaman yang menerima tabel/dimensi lokasi (bagian dari kunci cache hasil)
+LOCATION_PAGES = ['demografi_pengiriman', 'penggunaan_armada']
+
+# Thread pool untuk bagian halaman yang independen dan untuk precompute semua halaman.
+# Thread, bukan proses: cube dan frame dibagi tanpa pickling, dan groupby pandas melepas GIL
+SECTION_WORKERS = min(4, os.cpu_count() or 1)
+PAGE_WORKERS = min(len(REQUIRED_COLUMNS), os.cpu_count() or 1)
+# Pool terpisah: halaman yang di-precompute menunggu bagiannya tanpa menghabiskan worker pool bagian
+_SECTION_POOL = ThreadPoolExecutor(max_workers=SECTION_WORKERS, thread_name_prefix='section')
+_PAGE_POOL = ThreadPoolExecutor(max_workers=PAGE_WORKERS, thread_name_prefix='page')
+
+
+def missing_columns(df, page):
+    """Required columns of a page that are not in df"""
+    return [col for col in REQUIRED_COLUMNS[page] if col not in df.columns]
+
+
+def run_sections(*sections):
+    """Run independent zero-argument sections on the thread pool and return their results in order"""
+    if SECTION_WORKERS < 2 or len(sections) < 2:
+        return [section() for section in sections]
+    futures = [_SECTION_POOL.submit(section) for section in sections]
+    return [future.result() for future in futures]
+
+
+def _valid_coordinates(frame):
+    return frame[
+        (frame['Latitude'].notna()) &
+        (frame['Longitude'].notna()) &
+        (frame['Latitude'] != 0) &
+        (frame['Longitude'] != 0)
+    ]
+
+
+def _attach_coordinates(summary, locations, key='Order'):
+    """Rollup with categorical key plus Latitude/Longitude looked up by location ID"""
+    if locations.has_coordinates:
+        latitude, longitude = locations.coordinates(summary[key])
+        summary = summary.assign(Latitude=latitude, Longitude=longitude)
+    return summary
+
+
+def _object_keys(summary, keys):
+    # Kunci kategori dikembalikan ke object seperti hasil rollup biasa
+    return summary.astype({key: object for key in keys})
+
+
+def _size_normalized(values, fixed, scale, offset):
+    """Marker size scaled to [offset, offset + scale], or a fixed size if all values are equal"""
+    if values.max() == values.min():
+        return fixed
+    return (values - values.min()) / (values.max() - values.min()) * scale + offset
+
+
+# 1. ANALISIS TRANSAKSI KEUANGAN
+@dataclass
+class TransaksiKeuanganResult:
+    total_pemasukan: float
+    total_pengeluaran: float
+    laba_bersih: float
+    monthly_finance: pd.DataFrame
+
+
+def compute_transaksi_keuangan(df, cube, df_locations=None):
+    cube_kpis, monthly_summary = run_sections(lambda: kpis(cube), lambda: rollup(cube, 'Bulan'))
+    total_pemasukan = cube_kpis.total_pemasukan
+    total_pengeluaran = cube_kpis.total_pengeluaran
+
+    # Frame baru lewat rename/assign: tidak bergantung pada opsi copy-on-write global
+    monthly_finance = monthly_summary[['Bulan', 'Pemasukan_sum', 'Pengeluaran_sum']].rename(
+        columns={'Pemasukan_sum': 'Pemasukan', 'Pengeluaran_sum': 'Pengeluaran'}
+    )
+    monthly_finance = monthly_finance.assign(Laba=monthly_finance['Pemasukan'] - monthly_finance['Pengeluaran'])
+
+    return TransaksiKeuanganResult(
+        total_pemasukan=total_pemasukan,
+        total_pengeluaran=total_pengeluaran,
+        laba_bersih=cube_kpis.laba,
+        monthly_finance=monthly_finance
+    )
+
+
+# 2. REKAP PENGIRIMAN AIR
+@dataclass
+class PengirimanAirResult:
+    total_volume: float
+    total_pengiriman: int
+    rata_volume: float
+    monthly_volume: pd.DataFrame
+
+
+def compute_pengiriman_air(df, cube, df_locations=None):
+    total_volume = kpis(cube).total_volume
+    total_pengiriman = len(df)
+
+    monthly_volume = rollup(cube, 'Bulan')[['Bulan', 'Volume (L)_sum', 'Volume (L)_count', 'Volume (L)_mean']]
+    monthly_volume.columns = ['Bulan', 'Total Volume', 'Jumlah Pengiriman', 'Rata-rata Volume']
+
+    return PengirimanAirResult(
+        total_volume=total_volume,
+        total_pengiriman=total_pengiriman,
+        rata_volume=total_volume / total_pengiriman if total_pengiriman > 0 else 0,
+        monthly_volume=monthly_volume
+    )
+
+
+# 3. DEMOGRAFI PENGIRIMAN AIR
+@dataclass
+class DemografiPengirimanResult:
+    top_locations: pd.DataFrame
+    monthly_location: pd.DataFrame
+    # None jika data tidak punya kolom Latitude/Longitude sama sekali
+    map_data: Optional[pd.DataFrame]
+    # Indeks grid untuk clustering, hanya jika titik lokasi cukup banyak
+    map_index: Optional[GridIndex] = None
+
+
+def compute_demografi_pengiriman(df, cube, df_locations=None):
+    locations = location_dimension(df_locations)
+    order_summary = rollup(cube, 'Order')
+
+    # Koordinat diambil per ID lokasi dari kode kategori Order (tanpa join string)
+    if locations is not None:
+        order_locations = _object_keys(
+            _attach_coordinates(rollup(cube, 'Order', keep_categories=True), locations), ['Order']
+        )
+    else:
+        # Jika tidak ada data lokasi, tambahkan koordinat manual untuk Warung Makan Sari Rasa
+        order_locations = order_summary.copy()
+        sari_rasa = order_locations['Order'].str.contains('Sari Rasa', case=False, na=False)
+        order_locations.loc[sari_rasa, 'Latitude'] = -7.9932
+        order_locations.loc[sari_rasa, 'Longitude'] = 110.3417
+
+    location_analysis = order_summary[['Order', 'Volume (L)_sum', 'Pemasukan_sum', 'Tanggal_count']]
+    location_analysis.columns = ['Lokasi', 'Total Volume', 'Total Pemasukan', 'Jumlah Pengiriman']
+    location_analysis = location_analysis.sort_values('Total Volume', ascending=False).head(5)
+
+    top_locations = location_analysis['Lokasi'].head(5).tolist()
+    monthly_location = rollup(cube, ['Bulan', 'Order'])
+    monthly_location = monthly_location[monthly_location['Order'].isin(top_locations)]
+    monthly_location = monthly_location[['Bulan', 'Order', 'Volume (L)_sum', 'Pemasukan_sum']]
+    monthly_location.columns = ['Bulan', 'Order', 'Volume (L)', 'Pemasukan']
+
+    map_data = None
+    if 'Latitude' in order_locations.columns and 'Longitude' in order_locations.columns:
+        map_data = order_locations[['Order', 'Latitude', 'Longitude', 'Volume (L)_sum', 'Pemasukan_sum']]
+        map_data.columns = ['Order', 'Latitude', 'Longitude', 'Volume (L)', 'Pemasukan']
+        map_data = _valid_coordinates(map_data)
+        if len(map_data) > 0:
+            map_data = map_data.assign(size_normalized=_size_normalized(map_data['Volume (L)'], 50, 50, 10))
+
+    return DemografiPengirimanResult(
+        top_locations=location_analysis,
+        monthly_location=monthly_location,
+        map_data=map_data,
+        map_index=build_index(map_data, ['Volume (L)', 'Pemasukan'], 'Order')
+    )
+
+
+# 4. DEMOGRAFI PENGGUNAAN ARMADA
+@dataclass
+class PenggunaanArmadaResult:
+    has_locations: bool
+    total_armada: int
+    total_penggunaan: int
+    rata_penggunaan: float
+    armada_analysis: pd.DataFrame
+    # None jika data lokasi/koordinat tidak tersedia
+    armada_map: Optional[pd.DataFrame]
+    # None jika tidak ada kolom Tanggal
+    monthly_armada: Optional[pd.DataFrame]
+    # Posisi baris armada_map per plat nomor, agar pilihan armada tidak memindai seluruh peta
+    armada_rows: Dict[str, object] = field(default_factory=dict)
+    # Hasil compute_armada_selection per pilihan (dibangun saat pertama dipilih)
+    selections: Dict[str, object] = field(default_factory=dict, repr=False)
+
+
+@dataclass
+class ArmadaSelectionResult:
+    display_data: pd.DataFrame
+    map_title: str
+    volume_summary: pd.DataFrame
+    frequency_summary: pd.DataFrame
+    map_index: Optional[GridIndex] = None
+
+
+def compute_penggunaan_armada(df, cube, df_locations=None):
+    locations = location_dimension(df_locations)
+    has_locations = 'Order' in df.columns and locations is not None
+
+    armada_summary = rollup(cube, 'Plat Nomor')
+    total_armada = len(armada_summary)
+    total_penggunaan = len(df)
+
+    armada_analysis = armada_summary[['Plat Nomor', 'Volume (L)_sum', 'Volume (L)_mean', 'Volume (L)_count', 'Pengeluaran_sum']]
+    armada_analysis.columns = ['Plat Nomor', 'Total Volume', 'Rata-rata Volume', 'Frekuensi', 'Total Pengeluaran']
+
+    armada_map = None
+    armada_rows = {}
+    if has_locations and locations.has_coordinates:
+        # Rollup cube per armada dan lokasi lalu ambil koordinat per ID lokasi
+        armada_location_data = _object_keys(
+            _attach_coordinates(rollup(cube, ['Plat Nomor', 'Order'], keep_categories=True), locations),
+            ['Plat Nomor', 'Order']
+        )
+        armada_location_data = armada_location_data[['Plat Nomor', 'Order', 'Latitude', 'Longitude', 'Volume (L)_sum', 'Tanggal_count']]
+        armada_location_data.columns = ['Plat Nomor', 'Order', 'Latitude', 'Longitude', 'Total Volume', 'Frekuensi']
+        armada_map = _valid_coordinates(armada_location_data)
+        armada_rows = armada_map.groupby('Plat Nomor', observed=True, sort=False).indices
+
+    monthly_armada = None
+    if 'Tanggal' in df.columns:
+        top_armada = armada_analysis.sort_values('Total Volume', ascending=False).head(3)['Plat Nomor'].tolist()
+        monthly_armada = rollup(cube, ['Bulan', 'Plat Nomor'])
+        monthly_armada = monthly_armada[monthly_armada['Plat Nomor'].isin(top_armada)]
+        monthly_armada = monthly_armada[['Bulan', 'Plat Nomor', 'Volume (L)_sum']].rename(columns={'Volume (L)_sum': 'Volume (L)'})
+
+    return PenggunaanArmadaResult(
+        has_locations=has_locations,
+        total_armada=total_armada,
+        total_penggunaan=total_penggunaan,
+        rata_penggunaan=total_penggunaan / total_armada if total_armada > 0 else 0,
+        armada_analysis=armada_analysis,
+        armada_map=armada_map,
+        monthly_armada=monthly_armada,
+        armada_rows=armada_rows
+    )
+
+
+def compute_armada_selection(result, selected_armada):
+    """Map data and per-location summaries for one armada (or all of them), memoized on result"""
+    if selected_armada not in result.selections:
+        result.selections[selected_armada] = _armada_selection(result, selected_armada)
+    return result.selections[selected_armada]
+
+
+def _armada_selection(result, selected_armada):
+    armada_map = result.armada_map
+    if selected_armada != ALL_ARMADA:
+        display_data = armada_map.iloc[result.armada_rows.get(selected_armada, [])]
+        map_title = f"Persebaran Armada {selected_armada}"
+        # Volume dan frekuensi per lokasi untuk armada terpilih
+        volume_summary = display_data.groupby('Order', observed=True)['Total Volume'].sum().reset_index()
+        volume_summary = volume_summary.sort_values('Total Volume', ascending=False)
+        frequency_summary = display_data.groupby('Order', observed=True)['Frekuensi'].sum().reset_index()
+        frequency_summary = frequency_summary.sort_values('Frekuensi', ascending=False)
+    else:
+        display_data = armada_map
+        map_title = "Persebaran Semua Armada"
+        # Top armada per volume dan lokasi yang paling sering dikunjungi
+        volume_summary = armada_map.groupby('Plat Nomor', observed=True)['Total Volume'].sum().reset_index()
+        volume_summary = volume_summary.sort_values('Total Volume', ascending=False).head(5)
+        frequency_summary = armada_map.groupby('Order', observed=True)['Frekuensi'].sum().reset_index()
+        frequency_summary = frequency_summary.sort_values('Frekuensi', ascending=False).head(5)
+
+    if len(display_data) > 0:
+        display_data = display_data.assign(size_normalized=_size_normalized(display_data['Total Volume'], 20, 40, 10))
+
+    return ArmadaSelectionResult(
+        display_data=display_data,
+        map_title=map_title,
+        volume_summary=volume_summary,
+        frequency_summary=frequency_summary,
+        map_index=build_index(display_data, ['Total Volume', 'Frekuensi'], 'Order', group='Plat Nomor')
+    )
+
+
+# 5. ANALISIS KINERJA SOPIR
+@dataclass
+class KinerjaSopirResult:
+    total_sopir: int
+    total_tugas: int
+    rata_tugas: float
+    sopir_analysis: pd.DataFrame
+    # None jika tidak ada kolom Tanggal
+    monthly_sopir: Optional[pd.DataFrame]
+
+
+def compute_kinerja_sopir(df, cube, df_locations=None):
+    sopir_summary = rollup(cube, 'Sopir')
+    total_sopir = len(sopir_summary)
+    total_tugas = len(df)
+
+    sopir_analysis = sopir_summary[['Sopir', 'Volume (L)_sum', 'Volume (L)_mean', 'Volume (L)_count', 'Pemasukan_sum']]
+    sopir_analysis.columns = ['Sopir', 'Total Volume', 'Rata-rata Volume', 'Frekuensi', 'Total Pemasukan']
+
+    monthly_sopir = None
+    if 'Tanggal' in df.columns:
+        top_sopir = sopir_analysis.sort_values('Total Volume', ascending=False).head(3)['Sopir'].tolist()
+        monthly_sopir = rollup(cube, ['Bulan', 'Sopir'])
+        monthly_sopir = monthly_sopir[monthly_sopir['Sopir'].isin(top_sopir)]
+        monthly_sopir = monthly_sopir[['Bulan', 'Sopir', 'Volume (L)_sum']].rename(columns={'Volume (L)_sum': 'Volume (L)'})
+
+    return KinerjaSopirResult(
+        total_sopir=total_sopir,
+        total_tugas=total_tugas,
+        rata_tugas=total_tugas / total_sopir if total_sopir > 0 else 0,
+        sopir_analysis=sopir_analysis,
+        monthly_sopir=monthly_sopir
+    )
+
+
+# Rollup efisiensi (rata-rata Rp/L beserta total) untuk satu dimensi
+def efficiency_rollup(cube, by):
+    summary = rollup(cube, by)[[by, 'Efisiensi_mean', 'Volume (L)_sum', 'Pemasukan_sum', 'Pengeluaran_sum']]
+    summary.columns = [by, 'Efisiensi', 'Volume (L)', 'Pemasukan', 'Pengeluaran']
+    return summary
+
+
+# 6. ANALISIS EFISIENSI OPERASIONAL
+@dataclass
+class EfisiensiOperasionalResult:
+    efisiensi_total: float
+    volume_total: float
+    profit_margin: float
+    monthly_efficiency: pd.DataFrame
+    armada_efficiency: pd.DataFrame
+    sopir_efficiency: pd.DataFrame
+    # (label, efisiensi Rp/L) untuk yang paling dan paling tidak efisien
+    best_month: Tuple[str, float]
+    worst_month: Tuple[str, float]
+    best_armada: Tuple[str, float]
+    worst_armada: Tuple[str, float]
+    best_sopir: Tuple[str, float]
+    worst_sopir: Tuple[str, float]
+
+
+def compute_efisiensi_operasional(df, cube, df_locations=None):
+    # Efisiensi (Pemasukan - Pengeluaran) per liter sudah tersimpan di cube sebagai sum/count;
+    # KPI (termasuk paling/kurang efisien) dan rollup per bulan, armada, dan sopir dihitung paralel
+    cube_kpis, monthly_efficiency, armada_efficiency, sopir_efficiency = run_sections(
+        lambda: kpis(cube),
+        lambda: efficiency_rollup(cube, 'Bulan'),
+        lambda: efficiency_rollup(cube, 'Plat Nomor'),
+        lambda: efficiency_rollup(cube, 'Sopir')
+    )
+
+    return EfisiensiOperasionalResult(
+        efisiensi_total=cube_kpis.efisiensi_mean,
+        volume_total=cube_kpis.total_volume,
+        profit_margin=cube_kpis.profit_margin,
+        monthly_efficiency=monthly_efficiency,
+        armada_efficiency=armada_efficiency,
+        sopir_efficiency=sopir_efficiency,
+        best_month=cube_kpis.best_month,
+        worst_month=cube_kpis.worst_month,
+        best_armada=cube_kpis.best_armada,
+        worst_armada=cube_kpis.worst_armada,
+        best_sopir=cube_kpis.best_sopir,
+        worst_sopir=cube_kpis.worst_sopir
+    )
+
+
+# Rollup pola operasional (volume, jumlah order, keuangan) untuk satu dimensi waktu
+def pattern_rollup(cube, by):
+    return rollup(cube, by)[[by, 'Volume (L)_sum', 'Volume (L)_count', 'Volume (L)_mean', 'Pemasukan_sum', 'Pengeluaran_sum']]
+
+
+# 7. ANALISIS POLA OPERASIONAL
+@dataclass
+class PolaOperasionalResult:
+    daily_pattern: pd.DataFrame
+    quarterly_pattern: pd.DataFrame
+
+
+def compute_pola_operasional(df, cube, df_locations=None):
+    daily_pattern, quarterly_pattern = run_sections(
+        lambda: pattern_rollup(cube, 'Hari_Minggu'),
+        lambda: pattern_rollup(cube, 'Quarter')
+    )
+    daily_pattern.columns = ['Hari', 'Total_Volume', 'Jumlah_Order', 'Rata_Volume', 'Total_Pemasukan', 'Total_Pengeluaran']
+
+    # Urutkan hari
+    daily_pattern['Hari'] = pd.Categorical(daily_pattern['Hari'], categories=DAY_NAMES, ordered=True)
+    daily_pattern = daily_pattern.sort_values('Hari')
+
+    quarterly_pattern.columns = ['Kuartal', 'Total_Volume', 'Jumlah_Order', 'Rata_Volume', 'Total_Pemasukan', 'Total_Pengeluaran']
+    quarterly_pattern['Profit'] = quarterly_pattern['Total_Pemasukan'] - quarterly_pattern['Total_Pengeluaran']
+    quarterly_pattern['Kuartal'] = quarterly_pattern['Kuartal'].apply(lambda x: f'Q{x}')
+
+    return PolaOperasionalResult(daily_pattern=daily_pattern, quarterly_pattern=quarterly_pattern)
+
+
+# 8. ANALISIS PERFORMA BISNIS
+@dataclass
+class PerformaBisnisResult:
+    total_revenue: float
+    total_cost: float
+    total_profit: float
+    avg_revenue_per_liter: float
+    growth_rate: float
+    sopir_productivity: pd.DataFrame
+    monthly_profit: pd.DataFrame
+
+
+def compute_performa_bisnis(df, cube, df_locations=None):
+    # KPI, produktivitas sopir, dan profit bulanan berasal dari rollup yang independen
+    cube_kpis, monthly_summary, sopir_summary = run_sections(
+        lambda: kpis(cube),
+        lambda: rollup(cube, 'Bulan'),
+        lambda: rollup(cube, 'Sopir')
+    )
+
+    # Frame baru lewat rename/assign: tidak bergantung pada opsi copy-on-write global
+    sopir_productivity = sopir_summary[['Sopir', 'Pemasukan_sum', 'Pengeluaran_sum', 'Volume (L)_sum', 'Tanggal_count']].rename(
+        columns={
+            'Pemasukan_sum': 'Total_Revenue',
+            'Pengeluaran_sum': 'Total_Cost',
+            'Volume (L)_sum': 'Total_Volume',
+            'Tanggal_count': 'Total_Trips'
+        }
+    )
+    sopir_productivity = sopir_productivity.assign(
+        Revenue_per_Trip=lambda frame: frame['Total_Revenue'] / frame['Total_Trips'],
+        Volume_per_Trip=lambda frame: frame['Total_Volume'] / frame['Total_Trips'],
+        Profit_per_Trip=lambda frame: (frame['Total_Revenue'] - frame['Total_Cost']) / frame['Total_Trips']
+    ).sort_values('Revenue_per_Trip', ascending=False)
+
+    monthly_profit = monthly_summary[['Bulan', 'Pemasukan_sum', 'Pengeluaran_sum', 'Volume (L)_sum']].rename(
+        columns={'Pemasukan_sum': 'Pemasukan', 'Pengeluaran_sum': 'Pengeluaran', 'Volume (L)_sum': 'Volume (L)'}
+    )
+    monthly_profit = monthly_profit.assign(
+        Profit=lambda frame: frame['Pemasukan'] - frame['Pengeluaran'],
+        Profit_Margin=lambda frame: frame['Profit'] / frame['Pemasukan'] * 100,
+        Revenue_per_Liter=lambda frame: frame['Pemasukan'] / frame['Volume (L)']
+    )
+
+    return PerformaBisnisResult(
+        total_revenue=cube_kpis.total_pemasukan,
+        total_cost=cube_kpis.total_pengeluaran,
+        total_profit=cube_kpis.laba,
+        avg_revenue_per_liter=cube_kpis.revenue_per_liter_mean,
+        growth_rate=cube_kpis.growth_rate,
+        sopir_productivity=sopir_productivity,
+        monthly_profit=monthly_profit
+    )
+
+
+# Registry halaman → fungsi compute (dipakai untuk cache hasil, worker, dan benchmark)
+PAGE_COMPUTE = {
+    'transaksi_keuangan': compute_transaksi_keuangan,
+    'pengiriman_air': compute_pengiriman_air,
+    'demografi_pengiriman': compute_demografi_pengiriman,
+    'penggunaan_armada': compute_penggunaan_armada,
+    'kinerja_sopir': compute_kinerja_sopir,
+    'efisiensi_operasional': compute_efisiensi_operasional,
+    'pola_operasional': compute_pola_operasional,
+    'performa_bisnis': compute_performa_bisnis
+}
+
+
+def compute_page(page, df, cube, df_locations=None):
+    """Run the compute function of a page, memoized per data version of a tagged cube"""
+    compute = PAGE_COMPUTE[page]
+    tag = cube.attrs.get('cache_version')
+    if tag is None or tag[1] != id(cube):
+        return compute(df, cube, df_locations)
+    key = (tag[0], page, df_locations is not None)
+    return RESULT_CACHE.get_or_compute(key, lambda: compute(df, cube, df_locations))
+
+
+def precompute_pages(df, cube, df_locations=None, pages=None):
+    """Warm the result cache of every page (that df has the columns for) in parallel
+
+    Returns {page: Future} without waiting, so callers can warm in the
+    background or gather the results with future.result().
+    """
+    futures = {}
+    for page in pages or PAGE_COMPUTE:
+        if missing_columns(df, page):
+            continue
+        locations = df_locations if page in LOCATION_PAGES else None
+        futures[page] = _PAGE_POOL.submit(compute_page, page, df, cube, locations)
+    return futures
+
+
+def invalidate_results(predicate=None):
+    """Drop cached page results whose data version matches predicate (all if None)"""
+    return RESULT_CACHE.invalidate(None if predicate is None else lambda key: predicate(key[0]))
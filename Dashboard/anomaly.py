@@ -0,0 +1,444 @@
+# Deteksi anomali streaming: statistik berjalan per plat, sopir, dan order (median/MAD) serta
+# pita EWMA pengeluaran harian per plat; setiap baris baru dinilai O(1) tanpa memindai ulang histori
+from dataclasses import dataclass, replace
+import numpy as np
+import pandas as pd
+
+from cache import LRUCache
+from storage import load_anomalies, save_anomalies
+
+# Dimensi yang punya statistik berjalan sendiri (Order: pelanggan untuk pemasukan, jenis biaya untuk pengeluaran)
+ANOMALY_DIMENSIONS = ['Plat Nomor', 'Sopir', 'Order']
+ROW_MEASURES = ['Revenue_per_Liter', 'Pengeluaran']
+DAILY_MEASURE = 'Pengeluaran Harian'
+ANOMALY_COLUMNS = ['Plat Nomor', 'Volume (L)', 'Pemasukan', 'Pengeluaran']
+
+# Robust z-score: |x - median| / (1.4826 · MAD) di atas ambang dianggap anomali
+Z_THRESHOLD = 3.5
+MAD_SCALE = 1.4826
+# MAD 0 (harga tetap) diberi skala minimum relatif terhadap median
+MIN_RELATIVE_SCALE = 0.02
+# Kunci dengan baris lebih sedikit belum dinilai
+MIN_COUNT = 10
+# Bobot histori saat statistik blok baru digabung (statistik melupakan data yang sangat lama)
+STATS_WINDOW = 1000
+# Baris dinilai saat datang terhadap statistik yang sudah dikomit; statistik dan EWMA dikomit per blok
+# tetap menurut posisi baris, bukan per batch yang datang: hasilnya sama untuk pipeline, ingest dengan
+# ukuran batch apa pun, dan fallback dashboard. Blok kecil menjaga state blok terbuka tetap kecil
+STATS_BLOCK = 500
+# Kolom baris blok terbuka yang dibawa di state sampai bloknya penuh
+PENDING_COLUMNS = ['No', 'Tanggal'] + ANOMALY_DIMENSIONS + ['Volume (L)', 'Pemasukan', 'Pengeluaran']
+
+# Pita EWMA pengeluaran harian per plat (hari dengan pengeluaran saja): rata-rata + L·σ,
+# dinilai setelah masa pemanasan (jumlah hari pengeluaran)
+EWMA_SPAN = 30
+EWMA_ALPHA = 2 / (EWMA_SPAN + 1)
+EWMA_BAND = 3.0
+WARMUP_DAYS = 10
+
+FLAG_COLUMNS = ['Jenis', 'No', 'Tanggal', 'Plat Nomor', 'Sopir', 'Order',
+                'Ukuran', 'Dimensi', 'Nilai', 'Acuan', 'Skor']
+
+# Deteksi per versi data (dibagi antar sesi, jadi pemakai tidak boleh mengubahnya)
+ANOMALY_CACHE = LRUCache(maxsize=16)
+
+
+def _key_codes(values):
+    """(codes, labels) of a key column; -1 marks a missing key"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), values.cat.categories.astype(str)
+    codes, uniques = pd.factorize(values)
+    return codes, pd.Index(uniques).astype(str)
+
+
+def _numeric(df, col):
+    if col not in df.columns:
+        return None
+    return pd.to_numeric(df[col], errors='coerce').to_numpy(dtype='float64')
+
+
+def _row_measures(df):
+    """{measure: (row positions, values)}: Rp/L of income rows and the amount of expense rows"""
+    volume, pemasukan, pengeluaran = (_numeric(df, col) for col in ['Volume (L)', 'Pemasukan', 'Pengeluaran'])
+    measures = {}
+    if volume is not None and pemasukan is not None:
+        positions = np.flatnonzero((pemasukan > 0) & (volume > 0))
+        measures['Revenue_per_Liter'] = (positions, pemasukan[positions] / volume[positions])
+    if pengeluaran is not None:
+        positions = np.flatnonzero(pengeluaran > 0)
+        measures['Pengeluaran'] = (positions, pengeluaran[positions])
+    return measures
+
+
+def _empty_stats():
+    return pd.DataFrame({'Ukuran': pd.Series(dtype='object'), 'Dimensi': pd.Series(dtype='object'),
+                         'Kunci': pd.Series(dtype='object'), 'Median': pd.Series(dtype='float64'),
+                         'MAD': pd.Series(dtype='float64'), 'Jumlah': pd.Series(dtype='int64')})
+
+
+def _empty_ewma():
+    return pd.DataFrame({'Rata_Rata': pd.Series(dtype='float64'), 'Varians': pd.Series(dtype='float64'),
+                         'Hari': pd.Series(dtype='int64'), 'Total_Terbuka': pd.Series(dtype='float64')},
+                        index=pd.Index([], name='Plat Nomor', dtype='object'))
+
+
+def empty_flags():
+    flags = pd.DataFrame({col: pd.Series(dtype='object') for col in FLAG_COLUMNS})
+    flags['Tanggal'] = flags['Tanggal'].astype('datetime64[ns]')
+    return flags.astype({'Nilai': 'float64', 'Acuan': 'float64', 'Skor': 'float64'})
+
+
+def _block_stats(keys, blocks, values, n_keys, n_blocks):
+    """Median, MAD and count per (block, key) of the complete blocks, as (n_blocks, n_keys) arrays"""
+    valid = (keys >= 0) & (blocks < n_blocks)
+    groups = blocks[valid] * n_keys + keys[valid]
+    values = values[valid]
+    grouped = pd.Series(values).groupby(groups, sort=False)
+    median = grouped.median()
+    deviation = pd.Series(np.abs(values - median.reindex(groups).to_numpy()))
+    mad = deviation.groupby(groups, sort=False).median().reindex(median.index)
+
+    cells = median.index.to_numpy()
+    arrays = []
+    for column, fill in [(median, np.nan), (mad, np.nan), (grouped.size().reindex(median.index), 0)]:
+        array = np.full(n_blocks * n_keys, fill, dtype='float64')
+        array[cells] = column.to_numpy()
+        arrays.append(array.reshape(n_blocks, n_keys))
+    return arrays
+
+
+def _running_stats(old, labels, codes, blocks, values, n_blocks):
+    """Statistics of one measure and dimension at every block boundary of a batch
+
+    Returns (keys, row key positions, median, MAD, count); the arrays have a
+    row per boundary: the committed statistics before block 0 up to the ones
+    after the last complete block. Each block is blended into the running
+    statistics with at most STATS_WINDOW rows of weight for the history.
+    """
+    keys = pd.Index(old['Kunci'])
+    keys = keys.append(labels[~labels.isin(keys)])
+    row_keys = np.where(codes >= 0, keys.get_indexer(labels)[codes], -1)
+    batch_median, batch_mad, batch_count = _block_stats(row_keys, blocks, values, len(keys), n_blocks)
+
+    indexed = old.set_index('Kunci').reindex(keys)
+    median = np.empty((n_blocks + 1, len(keys)))
+    mad = np.empty((n_blocks + 1, len(keys)))
+    count = np.empty((n_blocks + 1, len(keys)))
+    median[0] = indexed['Median'].to_numpy(dtype='float64')
+    mad[0] = indexed['MAD'].to_numpy(dtype='float64')
+    count[0] = indexed['Jumlah'].fillna(0).to_numpy(dtype='float64')
+    for block in range(n_blocks):
+        weight = batch_count[block] / np.maximum(np.minimum(count[block], STATS_WINDOW) + batch_count[block], 1)
+        for running, batch in [(median, batch_median), (mad, batch_mad)]:
+            old_values, new_values = running[block], batch[block]
+            running[block + 1] = np.where(np.isnan(old_values), new_values,
+                                          np.where(np.isnan(new_values), old_values,
+                                                   (1 - weight) * old_values + weight * new_values))
+        count[block + 1] = count[block] + batch_count[block]
+    return keys, row_keys, median, mad, count
+
+
+def _lookup(running, blocks, row_keys):
+    """Per-row value of a running statistic at the row's block (NaN for unknown keys)"""
+    return np.where(row_keys >= 0, running[blocks, np.maximum(row_keys, 0)], np.nan)
+
+
+@dataclass
+class AnomalyState:
+    """Running statistics of the rows seen so far plus the anomalies flagged on them
+
+    Rows are flagged once, on arrival, against the committed statistics.
+    pending holds the (at most block) rows of the block that is not full yet;
+    they are folded into the statistics and the daily EWMA once the block
+    fills. ewma and open_day describe the committed blocks only, so the daily
+    flags of the open block (pending_flags) are provisional.
+    """
+    stats: pd.DataFrame
+    ewma: pd.DataFrame
+    open_day: pd.Timestamp
+    flags: pd.DataFrame
+    n_rows: int = 0
+    pending: pd.DataFrame = None
+    pending_flags: pd.DataFrame = None
+    block: int = STATS_BLOCK
+
+    def anomalies(self):
+        """Every flag, including the provisional daily ones of the open block and its (still open) last day"""
+        pending_flags = self.pending_flags if self.pending_flags is not None else _pending_flags(self)
+        return pd.concat([self.flags, pending_flags], ignore_index=True)
+
+
+def new_anomaly_state(block=STATS_BLOCK):
+    return AnomalyState(_empty_stats(), _empty_ewma(), None, empty_flags(), 0, None, empty_flags(), block)
+
+
+def _key_stats(stats, measure, dim):
+    return stats[(stats['Ukuran'] == measure) & (stats['Dimensi'] == dim)]
+
+
+def _concat_flags(frames):
+    frames = [frame for frame in frames if len(frame)]
+    return pd.concat(frames, ignore_index=True) if frames else empty_flags()
+
+
+def _advance(state, df):
+    """Score the rows against the committed statistics and commit every block that fills up
+
+    Blocks are cut at fixed row positions (every state.block rows since the
+    first row). A row is scored against the statistics committed before its
+    block; a committed block updates the key statistics and the daily EWMA.
+    The flags therefore depend on the order of the rows and not on how they
+    were split into batches. Only the open block (at most state.block rows)
+    is carried between batches, never the history.
+    """
+    rows = df[[col for col in PENDING_COLUMNS if col in df.columns]]
+    offset = 0 if state.pending is None else len(state.pending)
+    combined = rows if offset == 0 else pd.concat([state.pending, rows], ignore_index=True)
+    n_blocks = len(combined) // state.block
+    blocks = np.arange(len(combined)) // state.block
+    keys = {dim: _key_codes(combined[dim]) for dim in ANOMALY_DIMENSIONS if dim in combined.columns}
+
+    flags = []
+    updated = [state.stats]
+    for measure, (positions, values) in _row_measures(combined).items():
+        row_blocks = blocks[positions]
+        best = np.zeros(len(positions))
+        best_reference = np.full(len(positions), np.nan)
+        best_dimension = np.full(len(positions), None, dtype=object)
+        for dim, (codes, labels) in keys.items():
+            stats = _key_stats(state.stats, measure, dim)
+            kunci, row_keys, medians, mads, counts = _running_stats(
+                stats, labels, codes[positions], row_blocks, values, n_blocks)
+            updated.append(pd.DataFrame({'Ukuran': measure, 'Dimensi': dim, 'Kunci': kunci, 'Median': medians[-1],
+                                         'MAD': mads[-1], 'Jumlah': counts[-1].astype('int64')}))
+
+            # Skor O(1) per baris: median dan skala kuncinya diambil lewat indeks blok dan kunci
+            median = _lookup(medians, row_blocks, row_keys)
+            scale = np.maximum(MAD_SCALE * _lookup(mads, row_blocks, row_keys), MIN_RELATIVE_SCALE * np.abs(median))
+            count = _lookup(counts, row_blocks, row_keys)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                z = np.where((count >= MIN_COUNT) & (scale > 0), (values - median) / scale, 0.0)
+            z = np.nan_to_num(z)
+            stronger = np.abs(z) > np.abs(best)
+            best = np.where(stronger, z, best)
+            best_reference = np.where(stronger, median, best_reference)
+            best_dimension = np.where(stronger, dim, best_dimension)
+        # Baris blok terbuka yang sudah dinilai pada batch sebelumnya tidak dinilai ulang
+        flagged = (np.abs(best) > Z_THRESHOLD) & (positions >= offset)
+        flags.append(_row_flags(combined, positions[flagged], measure, best_dimension[flagged],
+                                values[flagged], best_reference[flagged], best[flagged]))
+
+    committed = n_blocks * state.block
+    if n_blocks:
+        # Statistik lama dimensi/ukuran yang diperbarui diganti versi gabungannya
+        stats = pd.concat(updated, ignore_index=True)
+        stats = stats[stats['Jumlah'] > 0].drop_duplicates(['Ukuran', 'Dimensi', 'Kunci'], keep='last')
+        state.stats = stats[_empty_stats().columns].reset_index(drop=True)
+        flags += _update_ewma(state, combined.iloc[:committed], blocks[:committed])
+    state.pending = combined.iloc[committed:].reset_index(drop=True)
+    state.pending_flags = _pending_flags(state)
+    return flags
+
+
+def _pending_flags(state):
+    """Provisional daily flags of the open block, as if it were committed now (state not modified)
+
+    Includes the provisional daily flag of the last (open) day.
+    """
+    if state.pending is None or len(state.pending) == 0:
+        return _open_day_flags(state)
+    preview = replace(state)
+    return _concat_flags(_update_ewma(preview, state.pending) + [_open_day_flags(preview)])
+
+
+def _row_flags(df, positions, measure, dimensions, values, references, scores):
+    rows = df.iloc[positions]
+    flags = pd.DataFrame({
+        'Jenis': 'Transaksi',
+        'No': rows['No'].to_numpy() if 'No' in rows.columns else None,
+        'Tanggal': pd.to_datetime(rows['Tanggal'], errors='coerce').to_numpy() if 'Tanggal' in rows.columns else pd.NaT,
+        'Ukuran': measure,
+        'Dimensi': dimensions,
+        'Nilai': values,
+        'Acuan': references,
+        'Skor': scores
+    })
+    for dim in ANOMALY_DIMENSIONS:
+        flags[dim] = rows[dim].astype(str).to_numpy() if dim in rows.columns else None
+    return flags[FLAG_COLUMNS]
+
+
+def _update_ewma(state, df, blocks=None):
+    """Advance the per-plate EWMA of daily expense over the days the rows cover
+
+    Only days with an expense count (most days a plate has none, and zeros
+    would make every repair day look like a spike). Days are closed in
+    order: a closed day is scored against the band of the expense days
+    before it and then folded into the mean and variance. The last day stays
+    open (rows of the same day may still arrive) and is scored
+    provisionally. Rows dated before the open day only count for row scores.
+    With blocks (block number per row) the rows are handled as if every block
+    were committed in turn.
+    """
+    if not all(col in df.columns for col in ['Plat Nomor', 'Tanggal', 'Pengeluaran']):
+        return []
+    frame = pd.DataFrame({'Plat Nomor': df['Plat Nomor'].astype(str).where(df['Plat Nomor'].notna()),
+                          'Tanggal': pd.to_datetime(df['Tanggal'], errors='coerce').dt.normalize(),
+                          'Pengeluaran': _numeric(df, 'Pengeluaran')})
+    if blocks is not None:
+        frame['Blok'] = blocks
+    frame = frame[frame['Pengeluaran'] > 0].dropna(subset=['Plat Nomor', 'Tanggal'])
+    if blocks is not None and len(frame):
+        # Hari terbuka sesudah blok-blok sebelumnya: hari pengeluaran terakhir yang sudah terlihat
+        opened = frame.groupby('Blok')['Tanggal'].max().cummax().shift(1).reindex(frame['Blok']).to_numpy()
+        frame = frame[np.isnat(opened) | (frame['Tanggal'].to_numpy() >= opened)]
+    if state.open_day is not None:
+        frame = frame[frame['Tanggal'] >= state.open_day]
+    if len(frame) == 0:
+        return []
+
+    start = frame['Tanggal'].min() if state.open_day is None else state.open_day
+    calendar = pd.date_range(start, frame['Tanggal'].max(), freq='D')
+    plates = state.ewma.index.union(pd.Index(frame['Plat Nomor'].unique())).sort_values()
+    ewma = state.ewma.reindex(plates)
+    totals = frame.groupby(['Plat Nomor', 'Tanggal'])['Pengeluaran'].sum().unstack(fill_value=0.0)
+    totals = totals.reindex(index=plates, columns=calendar, fill_value=0.0).to_numpy(dtype='float64', copy=True)
+    totals[:, 0] += ewma['Total_Terbuka'].fillna(0.0).to_numpy()
+
+    mean = ewma['Rata_Rata'].fillna(0.0).to_numpy()
+    variance = ewma['Varians'].fillna(0.0).to_numpy()
+    n_days = ewma['Hari'].fillna(0).to_numpy(dtype='int64')
+    flags = []
+    for day in range(len(calendar) - 1):
+        x = totals[:, day]
+        active = x > 0
+        flagged = _band_flags(x, mean, variance, n_days)
+        if flagged.any():
+            flags.append(_daily_flags(plates[flagged], calendar[day], x[flagged],
+                                      mean[flagged], variance[flagged]))
+        # Hari pengeluaran pertama menjadi nilai awal; sesudahnya rekursi EWMA rata-rata dan varians
+        delta = x - mean
+        update = active & (n_days > 0)
+        variance = np.where(update, (1 - EWMA_ALPHA) * (variance + EWMA_ALPHA * delta ** 2), variance)
+        mean = np.where(update, mean + EWMA_ALPHA * delta, np.where(active & (n_days == 0), x, mean))
+        n_days = n_days + active
+
+    state.ewma = pd.DataFrame({
+        'Rata_Rata': mean, 'Varians': variance, 'Hari': n_days, 'Total_Terbuka': totals[:, -1]
+    }, index=pd.Index(plates, name='Plat Nomor'))
+    state.open_day = calendar[-1]
+    return flags
+
+
+def _band_flags(x, mean, variance, n_days):
+    sd = np.sqrt(variance)
+    return (x > 0) & (n_days >= WARMUP_DAYS) & (sd > 0) & (x > mean + EWMA_BAND * sd)
+
+
+def _daily_flags(plates, day, values, mean, variance):
+    flags = pd.DataFrame({
+        'Jenis': 'Harian',
+        'No': None,
+        'Tanggal': day,
+        'Plat Nomor': np.asarray(plates, dtype=object),
+        'Sopir': None,
+        'Order': None,
+        'Ukuran': DAILY_MEASURE,
+        'Dimensi': 'Plat Nomor',
+        'Nilai': values,
+        'Acuan': mean,
+        'Skor': (values - mean) / np.sqrt(variance)
+    })
+    return flags[FLAG_COLUMNS]
+
+
+def _open_day_flags(state):
+    if state.open_day is None or len(state.ewma) == 0:
+        return empty_flags()
+    ewma = state.ewma
+    values = ewma['Total_Terbuka'].to_numpy()
+    flagged = _band_flags(values, ewma['Rata_Rata'].to_numpy(), ewma['Varians'].to_numpy(), ewma['Hari'].to_numpy())
+    if not flagged.any():
+        return empty_flags()
+    return _daily_flags(ewma.index[flagged], state.open_day, values[flagged],
+                        ewma['Rata_Rata'].to_numpy()[flagged], ewma['Varians'].to_numpy()[flagged])
+
+
+def detect_rows(state, df):
+    """Score a batch of new rows, fold it into the running state and keep the new flags
+
+    Cost depends on the batch (plus the open block) only: statistics are
+    merged per key and each row is scored with a lookup of its keys' median
+    and MAD.
+    """
+    if len(df) == 0:
+        return state
+    flags = [frame for frame in _advance(state, df) if len(frame)]
+    if flags:
+        state.flags = pd.concat([state.flags] + flags, ignore_index=True)
+    state.n_rows += len(df)
+    return state
+
+
+def detect_anomalies(df, block=STATS_BLOCK):
+    """Anomaly state of a whole frame, committed in the same fixed blocks as the pipeline and ingest"""
+    return detect_rows(new_anomaly_state(block), df)
+
+
+def state_record(state):
+    """JSON-friendly form of the running statistics (flags are stored separately)"""
+    return {
+        'n_rows': state.n_rows,
+        'block': state.block,
+        'open_day': None if state.open_day is None else str(state.open_day.date()),
+        'stats': state.stats.to_dict('records'),
+        'ewma': state.ewma.reset_index().to_dict('records')
+    }
+
+
+def save_anomaly_state(state, path):
+    pending = state.pending if state.pending is not None else pd.DataFrame(columns=PENDING_COLUMNS)
+    save_anomalies(state_record(state), state.flags, pending, path)
+
+
+def load_anomaly_state(path):
+    """Persisted anomaly state of a store, or None"""
+    stored = load_anomalies(path)
+    if stored is None:
+        return None
+    record, flags, pending = stored
+    # State tanpa ukuran blok dibuat dengan aturan lama: dibangun ulang dari store
+    if 'block' not in record:
+        return None
+    stats = pd.DataFrame(record['stats'], columns=_empty_stats().columns).astype(_empty_stats().dtypes.to_dict())
+    ewma = _empty_ewma()
+    if record['ewma']:
+        ewma = pd.DataFrame(record['ewma']).set_index('Plat Nomor').astype(ewma.dtypes.to_dict())
+    open_day = None if record['open_day'] is None else pd.Timestamp(record['open_day'])
+    # Parquet mengubah No kosong (flag harian) menjadi NaN; samakan dengan flag yang baru dibuat
+    flags['No'] = pd.Series([None if pd.isna(no) else int(no) for no in flags['No']], dtype=object)
+    state = AnomalyState(stats, ewma, open_day, flags, record['n_rows'], pending, None, record['block'])
+    state.pending_flags = _pending_flags(state)
+    return state
+
+
+def cube_anomalies(df, cube, stored=None):
+    """Anomaly state of df, built once per data version of a tagged cube
+
+    A stored state (kept up to date by ingest/pipeline) is reused when it
+    covers the same number of rows, so history is never rescanned.
+    """
+    def build():
+        if stored is not None and stored.n_rows == len(df):
+            return stored
+        return detect_anomalies(df)
+
+    tag = cube.attrs.get('cache_version')
+    if tag is None or tag[1] != id(cube):
+        return build()
+    return ANOMALY_CACHE.get_or_compute(tag[0], build)
+
+
+def invalidate_anomalies(predicate=None):
+    """Drop cached anomaly states whose data version matches predicate (all if None)"""
+    return ANOMALY_CACHE.invalidate(predicate)
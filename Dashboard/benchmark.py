@@ -0,0 +1,334 @@
+# Benchmark headless untuk semua fungsi analisis dashboard pada data sintetis
+# Streamlit diganti stub sehingga yang diukur hanya komputasi (pandas/plotly), bukan rendering
+import os
+import sys
+import json
+import time
+import types
+import platform
+import argparse
+import resource
+import subprocess
+import numpy as np
+import pandas as pd
+
+# Ukuran default: 10k, 100k, 1M, 10M baris
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+
+# Dimensi mengikuti dataset asli (Sheet 2)
+SOPIR = ['Pak Andi', 'Pak Budi', 'Pak Dedi', 'Pak Eko', 'Pak Hendra', 'Pak Joko', 'Pak Rudi', 'Pak Slamet']
+PLAT_NOMOR = ['H 1111 AA', 'H 1234 CD', 'H 2222 BB', 'H 3333 CC', 'H 4444 DD', 'H 5678 XY', 'H 9999 ZZ']
+ORDER_PEMASUKAN = ['Depot Air Segar', 'Depot Air Sehat', 'Depot Tirta Jaya', 'Toko Maju Jaya',
+                   'Toko Sumber Rejeki', 'Warung Bu Darmi', 'Warung Lesehan Berkah', 'Warung Makan Sari Rasa']
+ORDER_PENGELUARAN = {
+    'Cuci Truk': 'Biaya cuci truk',
+    'Ganti Oli': 'Biaya ganti oli',
+    'Isi Solar': 'Biaya isi solar',
+    'Perbaikan Ban': 'Biaya perbaikan ban',
+    'Servis Mesin': 'Biaya servis mesin'
+}
+# Porsi transaksi pemasukan pada data asli (~73%)
+PEMASUKAN_SHARE = 0.73
+ROWS_PER_DAY = 6
+
+
+class _StopPage(Exception):
+    pass
+
+
+class _Element:
+    """No-op stand-in for any Streamlit element, container or widget"""
+
+    def __call__(self, *args, **kwargs):
+        return self
+
+    def __getattr__(self, name):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class StreamlitStub(types.ModuleType):
+    """Fake streamlit module: widgets return their defaults, output calls do nothing"""
+
+    def __init__(self):
+        super().__init__('streamlit')
+        self.sidebar = self
+
+    def __getattr__(self, name):
+        return _Element()
+
+    @staticmethod
+    def _cache(func=None, **kwargs):
+        if func is None:
+            return lambda f: f
+        return func
+
+    cache_data = _cache
+    cache_resource = _cache
+
+    def columns(self, spec, **kwargs):
+        return [_Element() for _ in range(spec if isinstance(spec, int) else len(spec))]
+
+    def tabs(self, labels):
+        return [_Element() for _ in labels]
+
+    def selectbox(self, label, options, index=0, **kwargs):
+        options = list(options)
+        return options[index] if options else None
+
+    def radio(self, label, options, index=0, **kwargs):
+        options = list(options)
+        return options[index] if options else None
+
+    def multiselect(self, label, options, default=None, **kwargs):
+        return list(default or [])
+
+    def button(self, *args, **kwargs):
+        return False
+
+    def checkbox(self, label, value=False, **kwargs):
+        return value
+
+    def slider(self, label, min_value=None, max_value=None, value=None, **kwargs):
+        return value if value is not None else min_value
+
+    def number_input(self, label, min_value=None, max_value=None, value=None, **kwargs):
+        return value if value is not None else min_value
+
+    def date_input(self, label, value=None, **kwargs):
+        return value
+
+    def file_uploader(self, *args, **kwargs):
+        return None
+
+    def stop(self):
+        raise _StopPage()
+
+
+def make_synthetic_ledger(n_rows, seed=0):
+    """Synthetic trip ledger with the typed Sheet 2 schema"""
+    rng = np.random.default_rng(seed)
+    is_income = rng.random(n_rows) < PEMASUKAN_SHARE
+
+    # Order: pelanggan untuk pemasukan, jenis biaya untuk pengeluaran
+    expense_orders = list(ORDER_PENGELUARAN)
+    order_categories = ORDER_PEMASUKAN + expense_orders
+    order_codes = np.where(
+        is_income,
+        rng.integers(0, len(ORDER_PEMASUKAN), n_rows),
+        len(ORDER_PEMASUKAN) + rng.integers(0, len(expense_orders), n_rows)
+    )
+    keterangan_categories = ['Pembayaran lunas'] + list(ORDER_PENGELUARAN.values())
+    keterangan_codes = np.where(is_income, 0, order_codes - len(ORDER_PEMASUKAN) + 1)
+
+    # Rentang tanggal bertambah dengan jumlah baris (maksimal 10 tahun)
+    n_days = int(min(max(180, n_rows // ROWS_PER_DAY), 3650))
+    day_offsets = np.sort(rng.integers(0, n_days, n_rows))
+    tanggal = pd.Timestamp('2024-01-01') + pd.to_timedelta(day_offsets, unit='D')
+
+    volume = rng.choice(np.array([6000, 8000, 10000], dtype='float32'), n_rows)
+    pemasukan = np.where(is_income, (volume * rng.uniform(35, 50, n_rows)).round(), 0).astype('int64')
+    pengeluaran = np.where(is_income, 0, rng.integers(50_000, 500_000, n_rows)).astype('int64')
+
+    return pd.DataFrame({
+        'No': np.arange(1, n_rows + 1, dtype='int32'),
+        'Tanggal': tanggal,
+        'Sopir': pd.Categorical.from_codes(rng.integers(0, len(SOPIR), n_rows), categories=SOPIR),
+        'Plat Nomor': pd.Categorical.from_codes(rng.integers(0, len(PLAT_NOMOR), n_rows), categories=PLAT_NOMOR),
+        'Order': pd.Categorical.from_codes(order_codes, categories=order_categories),
+        'Volume (L)': volume,
+        'Pemasukan': pemasukan,
+        'Pengeluaran': pengeluaran,
+        'Jenis Transaksi': pd.Categorical.from_codes((~is_income).astype('int8'), categories=['Pemasukan', 'Pengeluaran']),
+        'Jumlah': pemasukan - pengeluaran,
+        'Keterangan': pd.Categorical.from_codes(keterangan_codes, categories=keterangan_categories)
+    })
+
+
+def make_synthetic_locations(seed=0):
+    """Coordinates around Yogyakarta for every customer order"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Nama Lokasi': ORDER_PEMASUKAN,
+        'Latitude': -7.80 + rng.uniform(-0.15, 0.15, len(ORDER_PEMASUKAN)),
+        'Longitude': 110.40 + rng.uniform(-0.25, 0.25, len(ORDER_PEMASUKAN))
+    })
+
+
+def _peak_rss_mb():
+    # ru_maxrss dalam KB di Linux, dalam byte di macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _import_dashboard():
+    """Import dashboard.py with the Streamlit stub installed"""
+    sys.modules['streamlit'] = StreamlitStub()
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import dashboard
+    return dashboard
+
+
+def page_functions(dashboard):
+    """(name, callable(df, cube, locations)) for every analysis page"""
+    return [
+        ('analisis_transaksi_keuangan', lambda df, cube, loc: dashboard.analisis_transaksi_keuangan(df, cube)),
+        ('rekap_pengiriman_air', lambda df, cube, loc: dashboard.rekap_pengiriman_air(df, cube)),
+        ('demografi_pengiriman_air', lambda df, cube, loc: dashboard.demografi_pengiriman_air(df, cube, loc)),
+        ('demografi_penggunaan_armada', lambda df, cube, loc: dashboard.demografi_penggunaan_armada(df, cube, loc)),
+        ('analisis_kinerja_sopir', lambda df, cube, loc: dashboard.analisis_kinerja_sopir(df, cube)),
+        ('analisis_efisiensi_operasional', lambda df, cube, loc: dashboard.analisis_efisiensi_operasional(df, cube, loc)),
+        ('analisis_pola_operasional', lambda df, cube, loc: dashboard.analisis_pola_operasional(df, cube)),
+        ('analisis_performa_bisnis', lambda df, cube, loc: dashboard.analisis_performa_bisnis(df, cube)),
+        ('analisis_peramalan', lambda df, cube, loc: dashboard.analisis_peramalan(df, cube)),
+        ('analisis_anomali', lambda df, cube, loc: dashboard.analisis_anomali(df, cube)),
+        ('perencanaan_rute', lambda df, cube, loc: dashboard.perencanaan_rute(df, cube, loc))
+    ]
+
+
+def run_size(n_rows, pages=None, seed=0):
+    """Benchmark every stage for one ledger size inside the current process"""
+    dashboard = _import_dashboard()
+    from aggregates import build_cube, enrich_transactions, tag_cube
+
+    stages = []
+    start = time.perf_counter()
+
+    def stage(name, func):
+        stage_start = time.perf_counter()
+        error = None
+        try:
+            result = func()
+        except _StopPage:
+            result = None
+        except Exception as e:
+            result, error = None, f"{type(e).__name__}: {e}"
+        entry = {'name': name, 'seconds': round(time.perf_counter() - stage_start, 4),
+                 'peak_rss_mb': round(_peak_rss_mb(), 1)}
+        if error:
+            entry['error'] = error
+        stages.append(entry)
+        return result
+
+    df = stage('generate', lambda: make_synthetic_ledger(n_rows, seed))
+    locations = make_synthetic_locations(seed)
+    base_df = stage('enrich', lambda: enrich_transactions(df))
+    del df
+    cube = stage('cube', lambda: tag_cube(build_cube(base_df), ('benchmark', n_rows)))
+
+    # Lapisan compute murni tanpa cache: salinan dangkal cube tidak cocok dengan tag cache-nya
+    from analysis import PAGE_COMPUTE
+    untagged = cube.copy(deep=False)
+    for name, compute in PAGE_COMPUTE.items():
+        if pages and name not in pages:
+            continue
+        stage(f'compute:{name}', lambda: compute(base_df, untagged, locations))
+
+    # Fit model peramalan dan deteksi anomali dari nol (tanpa state tersimpan dan tanpa cache)
+    from forecast import fit_forecasts
+    from anomaly import detect_anomalies
+    if not pages or 'peramalan' in pages:
+        stage('compute:peramalan', lambda: fit_forecasts(base_df))
+    if not pages or 'anomali' in pages:
+        stage('compute:anomali', lambda: detect_anomalies(base_df))
+    # Rencana rute hari terakhir (matriks jarak dan solver tanpa cache rencana)
+    from routing import cube_route_plan
+    if not pages or 'rute' in pages:
+        stage('compute:rute', lambda: cube_route_plan(base_df, untagged, locations, base_df['Tanggal'].max()))
+    # Utilisasi armada per plat per hari (jarak depot → Order untuk setiap trip)
+    from utilization import compute_utilization
+    if not pages or 'utilisasi' in pages:
+        stage('compute:utilisasi', lambda: compute_utilization(base_df, locations))
+
+    # Semua halaman sekaligus di thread pool (mode precompute), tetap tanpa cache
+    from analysis import precompute_pages
+    compute_pages = [name for name in PAGE_COMPUTE if not pages or name in pages]
+    if compute_pages:
+        stage('compute:all_pages', lambda: {page: future.result() for page, future in
+                                            precompute_pages(base_df, untagged, locations, compute_pages).items()})
+
+    # Setiap halaman dijalankan dua kali: cold (dihitung lalu dirender) dan warm (hasil dari cache)
+    for name, page in page_functions(dashboard):
+        if pages and name not in pages:
+            continue
+        for run in ['cold', 'warm']:
+            stage(f'{name}:{run}', lambda: page(base_df.copy(deep=False), cube, locations))
+
+    return {
+        'rows': n_rows,
+        'wall_seconds': round(time.perf_counter() - start, 4),
+        'peak_rss_mb': round(_peak_rss_mb(), 1),
+        'cube_rows': len(cube),
+        'stages': stages
+    }
+
+
+def run_benchmark(sizes, pages=None, seed=0):
+    """Run each size in a fresh subprocess so peak RSS is measured per size"""
+    results = []
+    for n_rows in sizes:
+        command = [sys.executable, os.path.abspath(__file__), '--worker', str(n_rows), '--seed', str(seed)]
+        if pages:
+            command += ['--pages', ','.join(pages)]
+        completed = subprocess.run(command, capture_output=True, text=True)
+        if completed.returncode != 0:
+            results.append({'rows': n_rows, 'error': completed.stderr.strip().splitlines()[-1:]})
+            continue
+        results.append(json.loads(completed.stdout))
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'results': results
+    }
+
+
+def _parse_sizes(text):
+    sizes = []
+    for part in text.split(','):
+        part = part.strip().lower()
+        factor = {'k': 1_000, 'm': 1_000_000}.get(part[-1:], 1)
+        sizes.append(int(float(part.rstrip('km')) * factor))
+    return sizes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark headless fungsi analisis dashboard")
+    parser.add_argument('--sizes', default='10k,100k,1m,10m', help="Jumlah baris, dipisah koma (contoh: 10k,100k,1m)")
+    parser.add_argument('--pages', default=None, help="Nama fungsi halaman atau kunci compute yang diukur, dipisah koma (default: semua)")
+    parser.add_argument('--seed', type=int, default=0, help="Seed data sintetis")
+    parser.add_argument('--output', default=None, help="File JSON hasil (default: stdout)")
+    parser.add_argument('--worker', type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    pages = args.pages.split(',') if args.pages else None
+
+    if args.worker is not None:
+        # Mode worker: satu ukuran data, hasil JSON ke stdout untuk proses induk
+        import warnings
+        warnings.filterwarnings('ignore')
+        print(json.dumps(run_size(args.worker, pages, args.seed)))
+        raise SystemExit(0)
+
+    report = run_benchmark(_parse_sizes(args.sizes), pages, args.seed)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+        for result in report['results']:
+            if 'error' in result:
+                print(f"❌ {result['rows']:,} baris: {result['error']}")
+            else:
+                print(f"✅ {result['rows']:,} baris: {result['wall_seconds']} s, puncak RSS {result['peak_rss_mb']} MB")
+    else:
+        print(output)
@@ -0,0 +1,84 @@
+# Cache sisi server: LRU berukuran terbatas dan fingerprint file sumber data
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-safe, size-bounded least-recently-used cache"""
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            # Entri yang paling lama tidak dipakai dibuang lebih dulu
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, computing and storing it on a miss"""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def invalidate(self, predicate=None):
+        """Drop entries whose key matches predicate (all entries if None), returns the count"""
+        with self._lock:
+            keys = [key for key in self._data if predicate is None or predicate(key)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._data), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+
+    def __len__(self):
+        return len(self._data)
+
+
+def _source_files(path):
+    if os.path.isdir(path):
+        for root, _, files in os.walk(path):
+            for name in sorted(files):
+                yield os.path.join(root, name)
+    elif os.path.exists(path):
+        yield path
+
+
+def source_fingerprint(paths, hash_contents=False):
+    """Fingerprint of data files/stores from their names, sizes and mtimes (or full contents)
+
+    Any rewritten CSV or new parquet part changes the fingerprint, so caches
+    keyed on it pick up fresh data without a restart.
+    """
+    digest = hashlib.sha1()
+    for path in paths:
+        for file_path in sorted(_source_files(path)):
+            stat = os.stat(file_path)
+            digest.update(f"{file_path}|{stat.st_size}|{stat.st_mtime_ns}".encode())
+            if hash_contents:
+                with open(file_path, 'rb') as f:
+                    for block in iter(lambda: f.read(1 << 20), b''):
+                        digest.update(block)
+    return digest.hexdigest()[:16]
@@ -0,0 +1,128 @@
+# Helper grafik untuk data besar: WebGL otomatis, downsampling LTTB, dan batas jumlah titik
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from cache import LRUCache
+
+# Di atas jumlah titik ini grafik dirender dengan WebGL (Scattergl), bukan SVG
+WEBGL_THRESHOLD = 1000
+
+# Batas total titik yang dikirim ke browser per grafik
+MAX_POINTS = 20000
+
+# Figure Plotly per (versi data, halaman, pilihan widget); figure dibagi antar sesi dan tidak boleh diubah
+FIGURE_CACHE = LRUCache(maxsize=64)
+
+
+def lttb_indices(x, y, n_out):
+    """Row positions kept by Largest-Triangle-Three-Buckets downsampling
+
+    x and y must be numeric and sorted by x. The first and last points are
+    always kept; every bucket in between keeps the point that forms the
+    largest triangle with the previously kept point and the next bucket's mean.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    every = (n - 2) / (n_out - 2)
+    kept = np.empty(n_out, dtype='int64')
+    kept[0], kept[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        kept[i + 1] = a
+
+    return kept
+
+
+def _numeric_axis(values):
+    # Tanggal dan angka dipakai langsung; label teks memakai urutan posisinya
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.astype('int64').to_numpy()
+    if pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy()
+    return np.arange(len(values))
+
+
+def downsample_series(frame, x, y, max_points):
+    """LTTB-downsample one series (rows sorted by x) to at most max_points rows"""
+    if len(frame) <= max_points:
+        return frame
+    frame = frame.sort_values(x, kind='stable')
+    y_values = frame[y].astype('float64').fillna(0).to_numpy()
+    return frame.iloc[lttb_indices(_numeric_axis(frame[x]), y_values, max_points)]
+
+
+def downsample_points(frame, y, max_points, seed=0):
+    """Sample a point cloud to at most max_points rows, always keeping the y extremes"""
+    if len(frame) <= max_points:
+        return frame
+    extremes = list(dict.fromkeys([frame[y].idxmax(), frame[y].idxmin()]))
+    rest = frame.drop(index=extremes)
+    sample = rest.sample(n=max_points - len(extremes), random_state=seed)
+    return pd.concat([frame.loc[extremes], sample]).sort_index()
+
+
+def _limit(frame, x, y, color, max_points, series):
+    groups = frame[color].nunique() if color else 1
+    per_group = max(max_points // max(groups, 1), 3)
+    reduce = (lambda part: downsample_series(part, x, y, per_group)) if series else \
+             (lambda part: downsample_points(part, y, per_group))
+    if not color or groups <= 1:
+        return reduce(frame)
+    return pd.concat([reduce(part) for _, part in frame.groupby(color, observed=True, sort=False)])
+
+
+def _large_figure_options(kwargs, n_points, n_total):
+    if n_total > WEBGL_THRESHOLD:
+        kwargs.setdefault('render_mode', 'webgl')
+    if n_points < n_total and kwargs.get('title'):
+        kwargs['title'] = f"{kwargs['title']} (sampel {n_points:,} dari {n_total:,} titik)"
+    return kwargs
+
+
+def line_chart(frame, x, y, color=None, max_points=MAX_POINTS, **kwargs):
+    """px.line that switches to WebGL and LTTB-downsamples each series for large frames"""
+    data = _limit(frame, x, y, color, max_points, series=True)
+    kwargs = _large_figure_options(kwargs, len(data), len(frame))
+    return px.line(data, x=x, y=y, color=color, **kwargs)
+
+
+def scatter_chart(frame, x, y, color=None, max_points=MAX_POINTS, **kwargs):
+    """px.scatter that switches to WebGL and caps the number of points for large frames"""
+    # Grup warna kontinu (angka) tidak dipecah, hanya label kategori
+    group = color if color is not None and not pd.api.types.is_numeric_dtype(frame[color]) else None
+    data = _limit(frame, x, y, group, max_points, series=False)
+    kwargs = _large_figure_options(kwargs, len(data), len(frame))
+    return px.scatter(data, x=x, y=y, color=color, **kwargs)
+
+
+def cached_figures(cube, key, build):
+    """Figures of a page built once per data version of a tagged cube
+
+    key names the page (plus any widget selection, as a tuple) so reruns and
+    other sessions on the same data reuse the figure objects instead of
+    rebuilding them.
+    """
+    tag = cube.attrs.get('cache_version')
+    if tag is None or tag[1] != id(cube):
+        return build()
+    key = key if isinstance(key, tuple) else (key,)
+    return FIGURE_CACHE.get_or_compute((tag[0],) + key, build)
+
+
+def invalidate_figures(predicate=None):
+    """Drop cached figures whose data version matches predicate (all if None)"""
+    return FIGURE_CACHE.invalidate(None if predicate is None else lambda key: predicate(key[0]))
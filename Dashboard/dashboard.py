@@ -7,8 +7,34 @@ from plotly.subplots import make_subplots
 from datetime import datetime, timedelta
 import os
 import warnings
+from aggregates import build_cube, enrich_transactions, invalidate_rollups, tag_cube
+from analysis import (
+    ALL_ARMADA, compute_armada_selection, compute_page, invalidate_results, missing_columns, precompute_pages
+)
+from cache import source_fingerprint
+from filters import FILTER_DIMENSIONS, FilterIndex, FilterSpec, filter_cube
+from engine import build_store_cube, configured_engine
+from charts import cached_figures, invalidate_figures, line_chart, scatter_chart
+from formatting import COORDINATE, LITER, PAGE_SIZE, RUPIAH, format_table, page_count, page_slice
+from geo import MAX_ZOOM, MIN_ZOOM, location_dimension
+from anomaly import ANOMALY_COLUMNS, EWMA_BAND, Z_THRESHOLD, cube_anomalies, invalidate_anomalies, load_anomaly_state
+from forecast import (
+    FORECAST_COLUMNS, HORIZON_DAYS, INTERVAL_Z, cube_forecasts, forecast, forecast_summary,
+    invalidate_forecasts, load_forecast_state
+)
+from routing import ROAD_FACTOR, ROUTING_COLUMNS, cube_route_plan, default_base, invalidate_plans, located_ids
+from utilization import UTILIZATION_COLUMNS, cube_utilization, invalidate_utilization
+from timeseries import FREQUENCIES, ROLLING_WINDOWS, cube_timeseries, invalidate_series, load_timeseries
+from storage import (
+    SHEET2_SCHEMA, SHEET3_SCHEMA, SHEET2_STORE, SHEET3_STORE,
+    apply_schema, load_cube, load_dataset, store_exists
+)
 warnings.filterwarnings('ignore')
 
+# Copy-on-write: frame yang di-cache dibagi antar rerun/sesi tanpa salinan penuh,
+# perubahan di halaman analisis tidak pernah menyentuh data bersama
+pd.set_option('mode.copy_on_write', True)
+
 # Konfigurasi halaman
 st.set_page_config(
     page_title="Dashboard Analisis Truk Air Isi Ulang",
@@ -66,44 +92,59 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Fungsi untuk load data CSV dari file lokal
-@st.cache_data
-def load_csv_from_files():
-    """Load CSV files from local directory"""
+# Jumlah versi data yang disimpan di cache server (LRU); versi lama otomatis tergeser
+DATA_CACHE_ENTRIES = 2
+FRAME_CACHE_ENTRIES = 6
+
+# DASHBOARD_PRECOMPUTE=all: saat versi data baru dimuat, semua halaman dihitung paralel di latar belakang
+PRECOMPUTE_ALL_PAGES = os.environ.get('DASHBOARD_PRECOMPUTE', '').strip().lower() == 'all'
+
+# Fungsi untuk mencari sumber data lokal (store parquet bertipe, fallback ke CSV)
+def find_local_source():
+    """Locate the local dataset, returns (kind, sheet2_path, sheet3_path) or None"""
     possible_locations = [
-        ('Dataset/Cleaned/Sheet2_Cleaned.csv', 'Dataset/Cleaned/Sheet3_Cleaned.csv'),
-        ('../Dataset/Cleaned/Sheet2_Cleaned.csv', '../Dataset/Cleaned/Sheet3_Cleaned.csv')
+        ('Dataset/Cleaned', ''),
+        ('../Dataset/Cleaned', '../')
     ]
     
-    for sheet2_path, sheet3_path in possible_locations:
+    for cleaned_dir, prefix in possible_locations:
+        sheet2_store = prefix + SHEET2_STORE
+        sheet3_store = prefix + SHEET3_STORE
+        if store_exists(sheet2_store) and store_exists(sheet3_store):
+            return 'parquet', sheet2_store, sheet3_store
+        
+        sheet2_path = os.path.join(cleaned_dir, 'Sheet2_Cleaned.csv')
+        sheet3_path = os.path.join(cleaned_dir, 'Sheet3_Cleaned.csv')
         if os.path.exists(sheet2_path) and os.path.exists(sheet3_path):
-            try:
-                sheet2 = pd.read_csv(sheet2_path)
-                sheet3 = pd.read_csv(sheet3_path)
-                
-                # Konversi kolom tanggal
-                for df in [sheet2, sheet3]:
-                    if 'Tanggal' in df.columns:
-                        df['Tanggal'] = pd.to_datetime(df['Tanggal'], errors='coerce')
-                
-                return sheet2, sheet3
-            except Exception as e:
-                st.error(f"Error loading CSV files: {str(e)}")
-                return None, None
+            return 'csv', sheet2_path, sheet3_path
     
-    return None, None
+    return None
 
-# Fungsi untuk load data dari uploaded files
-def load_csv_from_upload(uploaded_sheet2, uploaded_sheet3):
-    """Load CSV files from uploaded files"""
+# Fungsi untuk load data dari file lokal
+# cache_resource: satu objek bersama untuk semua sesi, di-key dengan fingerprint file sumber
+# sehingga file yang ditulis ulang (atau part baru hasil ingest) langsung terbaca tanpa restart
+@st.cache_resource(show_spinner=False, max_entries=DATA_CACHE_ENTRIES)
+def load_csv_from_files(kind, sheet2_path, sheet3_path, fingerprint):
+    """Load the cleaned dataset from local parquet stores or CSV files"""
     try:
-        sheet2 = pd.read_csv(uploaded_sheet2)
-        sheet3 = pd.read_csv(uploaded_sheet3)
+        # Store parquet sudah bertipe (kategori, datetime, numerik) sehingga tidak perlu parsing ulang
+        if kind == 'parquet':
+            return load_dataset(sheet2_path), load_dataset(sheet3_path)
         
-        # Konversi kolom tanggal
-        for df in [sheet2, sheet3]:
-            if 'Tanggal' in df.columns:
-                df['Tanggal'] = pd.to_datetime(df['Tanggal'], errors='coerce')
+        sheet2 = apply_schema(pd.read_csv(sheet2_path), SHEET2_SCHEMA)
+        sheet3 = apply_schema(pd.read_csv(sheet3_path), SHEET3_SCHEMA)
+        return sheet2, sheet3
+    except Exception as e:
+        st.error(f"Error loading dataset files: {str(e)}")
+        return None, None
+
+# Fungsi untuk load data dari uploaded files (di-cache per pasangan file upload)
+@st.cache_resource(show_spinner=False, max_entries=DATA_CACHE_ENTRIES)
+def load_csv_from_upload(_uploaded_sheet2, _uploaded_sheet3, upload_key):
+    """Load CSV files from uploaded files"""
+    try:
+        sheet2 = apply_schema(pd.read_csv(_uploaded_sheet2), SHEET2_SCHEMA)
+        sheet3 = apply_schema(pd.read_csv(_uploaded_sheet3), SHEET3_SCHEMA)
         
         return sheet2, sheet3
     except Exception as e:
@@ -112,12 +153,26 @@ def load_csv_from_upload(uploaded_sheet2, uploaded_sheet3):
 
 # Fungsi utama untuk load data
 def load_csv_data():
-    """Main function to load CSV data"""
-    # Coba load dari file lokal dulu
-    sheet2, sheet3 = load_csv_from_files()
-    
-    if sheet2 is not None and sheet3 is not None:
-        return sheet2, sheet3
+    """Main function to load CSV data, returns (sheet2, sheet3, data_version)"""
+    # Coba load dari file lokal dulu (fingerprint dihitung dari ukuran dan mtime, murah per rerun)
+    source = find_local_source()
+    if source is not None:
+        fingerprint = source_fingerprint(source[1:])
+        sheet2, sheet3 = load_csv_from_files(*source, fingerprint)
+        
+        if sheet2 is not None and sheet3 is not None:
+            data_version = f"local:{fingerprint}"
+            # Rollup dari versi lokal sebelumnya tidak akan dipakai lagi
+            stale = lambda version: version[1].startswith('local:') and version[1] != data_version
+            invalidate_rollups(stale)
+            invalidate_results(stale)
+            invalidate_figures(stale)
+            invalidate_series(stale)
+            invalidate_forecasts(stale)
+            invalidate_anomalies(stale)
+            invalidate_plans(stale)
+            invalidate_utilization(stale)
+            return sheet2, sheet3, data_version
     
     # Jika tidak ada file lokal, tampilkan file uploader
     st.error("File dataset tidak ditemukan. Silakan upload file CSV:")
@@ -129,64 +184,234 @@ def load_csv_data():
         uploaded_sheet3 = st.file_uploader("Sheet3_Cleaned.csv:", type=['csv'], key="sheet3")
     
     if uploaded_sheet2 is not None and uploaded_sheet3 is not None:
-        return load_csv_from_upload(uploaded_sheet2, uploaded_sheet3)
+        upload_key = f"upload:{uploaded_sheet2.file_id}:{uploaded_sheet3.file_id}"
+        sheet2, sheet3 = load_csv_from_upload(uploaded_sheet2, uploaded_sheet3, upload_key)
+        return sheet2, sheet3, upload_key
     
-    return None, None
+    return None, None, None
 
-# 1. ANALISIS TRANSAKSI KEUANGAN
-def analisis_transaksi_keuangan(df):
-    st.subheader("💰 Analisis Transaksi Keuangan")
-    
-    # Pastikan kolom yang diperlukan ada
-    required_cols = ['Tanggal', 'Pemasukan', 'Pengeluaran']
-    missing_cols = [col for col in required_cols if col not in df.columns]
+# Fungsi untuk menyiapkan base frame yang sudah diperkaya (kolom turunan dihitung sekali)
+@st.cache_resource(show_spinner=False, max_entries=FRAME_CACHE_ENTRIES)
+def get_base_frame(_sheet2, _sheet3, dataset_choice, data_version):
+    """Build the shared, pre-enriched frame and its info once per dataset version"""
+    if dataset_choice == "Sheet 2":
+        source = _sheet2
+    elif dataset_choice == "Sheet 3":
+        source = _sheet3
+    else:
+        source = pd.concat([_sheet2, _sheet3], ignore_index=True)
     
-    if missing_cols:
-        st.warning(f"Kolom yang diperlukan tidak ditemukan: {missing_cols}")
+    # Info dataset dihitung dari kolom asli, sebelum kolom turunan ditambahkan
+    info = {
+        'rows': len(source),
+        'columns': len(source.columns),
+        'missing': int(source.isnull().sum().sum())
+    }
+    return enrich_transactions(source), info
+
+# Store parquet Sheet 2 lokal (tempat cube dan model peramalan disimpan), None untuk upload/gabungan
+def find_local_store(dataset_key):
+    """Local Sheet 2 store behind a dataset version, if the dashboard reads one"""
+    dataset_choice, data_version = dataset_key
+    if dataset_choice != "Sheet 2" or not data_version.startswith('local:'):
+        return None
+    return next((prefix + SHEET2_STORE for prefix in ['', '../'] if store_exists(prefix + SHEET2_STORE)), None)
+
+# Fungsi untuk membangun cube agregasi sekali per versi dataset
+# cache_resource: cube dibagi tanpa disalin, dan rollup-nya di-cache per versi data
+@st.cache_resource(show_spinner=False, max_entries=FRAME_CACHE_ENTRIES)
+def get_cube(_df, dataset_key):
+    """Build the aggregate cube once per (dataset choice, data version)"""
+    cube = None
+    store = find_local_store(dataset_key)
+    if store is not None:
+        # Cube yang disimpan oleh ingest dipakai langsung jika jumlah barisnya cocok;
+        # selain itu engine DuckDB/Polars (DASHBOARD_ENGINE) mengagregasi store langsung dari disk
+        candidates = [lambda: load_cube(store)]
+        if configured_engine() != 'pandas':
+            candidates.append(lambda: build_store_cube(store))
+        for candidate in candidates:
+            stored = candidate()
+            if stored is not None and stored['Jumlah_Baris'].sum() == len(_df):
+                cube = stored
+                break
+    if cube is None:
+        cube = build_cube(_df)
+    return tag_cube(cube, dataset_key)
+
+# Fungsi untuk memuat deret tren harian yang disimpan ingest/pipeline sekali per versi dataset
+@st.cache_resource(show_spinner=False, max_entries=FRAME_CACHE_ENTRIES)
+def get_stored_timeseries(dataset_key):
+    """Daily trend series persisted in the local store, or None"""
+    store = find_local_store(dataset_key)
+    return None if store is None else load_timeseries(store)
+
+# Fungsi untuk memuat model peramalan yang disimpan ingest/pipeline sekali per versi dataset
+@st.cache_resource(show_spinner=False, max_entries=FRAME_CACHE_ENTRIES)
+def get_stored_forecasts(dataset_key):
+    """Forecast state persisted in the local store, or None"""
+    store = find_local_store(dataset_key)
+    return None if store is None else load_forecast_state(store)
+
+# Fungsi untuk memuat statistik dan hasil deteksi anomali yang disimpan ingest/pipeline
+@st.cache_resource(show_spinner=False, max_entries=FRAME_CACHE_ENTRIES)
+def get_stored_anomalies(dataset_key):
+    """Anomaly state persisted in the local store, or None"""
+    store = find_local_store(dataset_key)
+    return None if store is None else load_anomaly_state(store)
+
+# Fungsi untuk memulai precompute semua halaman sekali per versi dataset (tidak menunggu hasilnya)
+@st.cache_resource(show_spinner=False, max_entries=FRAME_CACHE_ENTRIES)
+def warm_pages(_df, _cube, _locations, dataset_key):
+    """Start computing every page in the background; results land in the shared result cache"""
+    return precompute_pages(_df, _cube, _locations)
+
+# Fungsi untuk membangun indeks filter (tanggal terurut + kode kategori) sekali per versi dataset
+@st.cache_resource(show_spinner=False, max_entries=FRAME_CACHE_ENTRIES)
+def get_filter_index(_df, dataset_key):
+    """Build the date and category indexes used by the global filter panel"""
+    return FilterIndex(_df)
+
+# Fungsi untuk menyiapkan view terfilter beserta cube-nya sekali per kombinasi filter
+@st.cache_resource(show_spinner=False, max_entries=FRAME_CACHE_ENTRIES)
+def get_filtered_view(_df, _index, _cube, dataset_key, filter_key, _spec):
+    """Filtered rows and their cube, cached per (dataset version, filter selection)"""
+    view = _index.apply(_df, _spec)
+    # Filter yang hanya menyentuh dimensi cube cukup memfilter baris cube, tanpa membangun ulang
+    cube = filter_cube(_cube, _spec)
+    if cube is None:
+        cube = build_cube(view)
+    return view, tag_cube(cube, dataset_key + (filter_key,))
+
+def filter_panel(index):
+    """Sidebar widgets of the global filter; returns the selected FilterSpec"""
+    st.sidebar.markdown("### 🔎 Filter Data")
+    
+    date_range = None
+    if index.date_min is not None:
+        full_range = (index.date_min.date(), index.date_max.date())
+        selected = st.sidebar.date_input(
+            "📅 Rentang Tanggal:",
+            value=full_range,
+            min_value=full_range[0],
+            max_value=full_range[1]
+        )
+        # Rentang penuh berarti tanpa filter tanggal; pilihan satu tanggal menunggu tanggal akhir
+        if isinstance(selected, (tuple, list)) and len(selected) == 2 and tuple(selected) != full_range:
+            date_range = (pd.Timestamp(selected[0]), pd.Timestamp(selected[1]))
+    
+    selections = {}
+    for col, label in FILTER_DIMENSIONS.items():
+        options = index.options(col)
+        if options:
+            selections[col] = tuple(st.sidebar.multiselect(label, options, default=[]))
+    
+    return FilterSpec(
+        date_range=date_range,
+        sopir=selections.get('Sopir', ()),
+        plat_nomor=selections.get('Plat Nomor', ()),
+        order=selections.get('Order', ()),
+        jenis_transaksi=selections.get('Jenis Transaksi', ())
+    )
+
+# Fungsi untuk membangun dimensi ID lokasi dari Sheet 3 sekali per versi data
+@st.cache_resource(show_spinner=False, max_entries=DATA_CACHE_ENTRIES)
+def get_locations(_sheet3, data_version):
+    """Resolve the location table into an integer location-ID dimension once per data version"""
+    return location_dimension(_sheet3)
+
+# Peta cluster: hanya cluster yang terlihat pada tingkat zoom terpilih yang dikirim ke browser
+def cluster_map_figure(index, zoom, size, color, title):
+    """scatter_mapbox of the grid clusters visible at one zoom level"""
+    clusters = index.visible(zoom)
+    center_lat, center_lon = index.center()
+    fig = px.scatter_mapbox(
+        clusters,
+        lat="Latitude",
+        lon="Longitude",
+        size=size,
+        color=color,
+        hover_name=index.label,
+        hover_data={
+            "Jumlah Titik": ":,",
+            size: ":,.0f",
+            "Latitude": ":.4f",
+            "Longitude": ":.4f"
+        },
+        size_max=30,
+        zoom=zoom,
+        center={"lat": center_lat, "lon": center_lon},
+        height=600,
+        title=f"{title} ({len(clusters):,} cluster dari {len(index):,} titik)"
+    )
+    fig.update_layout(
+        mapbox_style="open-street-map",
+        margin={"r":0,"t":50,"l":0,"b":0}
+    )
+    return fig
+
+def map_zoom_slider(key):
+    """Zoom level that picks the cluster level of a clustered map"""
+    return st.slider("🔍 Tingkat Zoom Peta:", min_value=MIN_ZOOM, max_value=MAX_ZOOM, value=11, key=key)
+
+def base_selectbox(locations, key):
+    """Start/end location (ID) of trips, chosen among the locations with coordinates"""
+    located = located_ids(locations)
+    names = list(locations.names[located])
+    name = st.selectbox(
+        "🏠 Titik Berangkat/Kembali:",
+        names,
+        index=int(np.searchsorted(located, default_base(locations))),
+        key=key
+    )
+    return int(located[names.index(name)])
+
+def show_table(frame, formats, key):
+    """st.dataframe with numeric columns formatted per page; large tables get a page selector"""
+    page = 1
+    n_pages = page_count(len(frame))
+    if n_pages > 1:
+        page = st.number_input(
+            f"Halaman (1-{n_pages}, {PAGE_SIZE} baris per halaman):",
+            min_value=1, max_value=n_pages, value=1, step=1,
+            # Jumlah halaman masuk ke key agar pilihan lama tidak melebihi batas saat tabel mengecil
+            key=f"{key}_{n_pages}"
+        )
+    st.dataframe(format_table(page_slice(frame, page), formats), use_container_width=True)
+
+def trend_figure(series, measures, frequency, title):
+    """Line chart of resampled sums; the daily view adds the rolling-window moving averages"""
+    resampled = series.resample(frequency)
+    frames = []
+    for col in measures:
+        frames.append(pd.DataFrame({'Tanggal': resampled.index, 'Nilai': resampled[col].to_numpy(), 'Seri': col}))
+        if FREQUENCIES[frequency] == 'D':
+            for window in ROLLING_WINDOWS:
+                rolling = series.rolling(window)
+                frames.append(pd.DataFrame({
+                    'Tanggal': rolling.index,
+                    'Nilai': rolling[f'{col}_avg_{window}'].to_numpy(),
+                    'Seri': f'{col} (rata-rata {window} hari)'
+                }))
+    data = pd.concat(frames, ignore_index=True)
+    return line_chart(data, x='Tanggal', y='Nilai', color='Seri', title=title)
+
+def trend_section(df, cube, page, measures, title, stored=None):
+    """Day/week/month trend of the measures from the shared daily series"""
+    series = cube_timeseries(df, cube, stored)
+    if len(series) == 0:
         return
     
-    # Konversi tanggal dan tambahkan kolom bulan
-    df['Tanggal'] = pd.to_datetime(df['Tanggal'])
-    df['Bulan'] = df['Tanggal'].dt.to_period('M').astype(str)
-    
-    # Rekapitulasi keuangan
-    total_pemasukan = df['Pemasukan'].sum()
-    total_pengeluaran = df['Pengeluaran'].sum()
-    laba_bersih = total_pemasukan - total_pengeluaran
-    
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        st.markdown(f"""
-        <div class="metric-container">
-            <h4>💰 Total Pemasukan</h4>
-            <p class="big-metric">Rp {total_pemasukan:,.0f}</p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col2:
-        st.markdown(f"""
-        <div class="metric-container">
-            <h4>💸 Total Pengeluaran</h4>
-            <p class="big-metric">Rp {total_pengeluaran:,.0f}</p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col3:
-        st.markdown(f"""
-        <div class="metric-container">
-            <h4>📈 Laba Bersih</h4>
-            <p class="big-metric">Rp {laba_bersih:,.0f}</p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    # Analisis bulanan
-    st.markdown("### 📅 Rekapitulasi Bulanan")
-    
-    monthly_finance = df.groupby('Bulan').agg({
-        'Pemasukan': 'sum',
-        'Pengeluaran': 'sum'
-    }).reset_index()
-    monthly_finance['Laba'] = monthly_finance['Pemasukan'] - monthly_finance['Pengeluaran']
+    st.markdown("### 📆 Tren Harian, Mingguan, dan Bulanan")
+    frequency = st.radio("Granularitas:", list(FREQUENCIES), horizontal=True, key=f"{page}_trend")
+    fig = cached_figures(cube, (page, 'trend', frequency), lambda: trend_figure(series, measures, frequency, title))
+    st.plotly_chart(fig, use_container_width=True)
+
+# 1. ANALISIS TRANSAKSI KEUANGAN
+def transaksi_keuangan_figures(result):
+    """Plotly figures of the transaksi keuangan page"""
+    figures = {}
+    monthly_finance = result.monthly_finance
     
     fig = make_subplots(specs=[[{"secondary_y": False}]])
     
@@ -227,70 +452,70 @@ def analisis_transaksi_keuangan(df):
         yaxis_title='Jumlah (Rp)',
         barmode='group'
     )
-    
-    st.plotly_chart(fig, use_container_width=True)
-    
-    # Tabel detail bulanan
-    st.markdown("### 📋 Detail Bulanan")
-    monthly_finance_display = monthly_finance.copy()
-    monthly_finance_display['Pemasukan'] = monthly_finance_display['Pemasukan'].apply(lambda x: f"Rp {x:,.0f}")
-    monthly_finance_display['Pengeluaran'] = monthly_finance_display['Pengeluaran'].apply(lambda x: f"Rp {x:,.0f}")
-    monthly_finance_display['Laba'] = monthly_finance_display['Laba'].apply(lambda x: f"Rp {x:,.0f}")
-    st.dataframe(monthly_finance_display, use_container_width=True)
+    figures['monthly'] = fig
+    return figures
 
-# 2. REKAP PENGIRIMAN AIR
-def rekap_pengiriman_air(df):
-    st.subheader("🚛 Rekap Pengiriman Air")
+def analisis_transaksi_keuangan(df, cube, stored_series=None):
+    st.subheader("💰 Analisis Transaksi Keuangan")
     
     # Pastikan kolom yang diperlukan ada
-    required_cols = ['Tanggal', 'Volume (L)']
-    missing_cols = [col for col in required_cols if col not in df.columns]
+    missing_cols = missing_columns(df, 'transaksi_keuangan')
     
     if missing_cols:
         st.warning(f"Kolom yang diperlukan tidak ditemukan: {missing_cols}")
         return
     
-    # Konversi tanggal dan tambahkan kolom bulan
-    df['Tanggal'] = pd.to_datetime(df['Tanggal'])
-    df['Bulan'] = df['Tanggal'].dt.to_period('M').astype(str)
-    
-    # Total volume
-    total_volume = df['Volume (L)'].sum()
-    total_pengiriman = len(df)
-    rata_volume = total_volume / total_pengiriman if total_pengiriman > 0 else 0
+    # Rekapitulasi keuangan dari cube agregasi
+    result = compute_page('transaksi_keuangan', df, cube)
+    figures = cached_figures(cube, 'transaksi_keuangan', lambda: transaksi_keuangan_figures(result))
+    total_pemasukan = result.total_pemasukan
+    total_pengeluaran = result.total_pengeluaran
+    laba_bersih = result.laba_bersih
     
     col1, col2, col3 = st.columns(3)
     with col1:
         st.markdown(f"""
         <div class="metric-container">
-            <h4>🚰 Total Volume Air</h4>
-            <p class="big-metric">{total_volume:,.0f} L</p>
+            <h4>💰 Total Pemasukan</h4>
+            <p class="big-metric">Rp {total_pemasukan:,.0f}</p>
         </div>
         """, unsafe_allow_html=True)
     
     with col2:
         st.markdown(f"""
         <div class="metric-container">
-            <h4>🚚 Total Pengiriman</h4>
-            <p class="big-metric">{total_pengiriman:,}</p>
+            <h4>💸 Total Pengeluaran</h4>
+            <p class="big-metric">Rp {total_pengeluaran:,.0f}</p>
         </div>
         """, unsafe_allow_html=True)
     
     with col3:
         st.markdown(f"""
         <div class="metric-container">
-            <h4>📊 Rata-rata Volume</h4>
-            <p class="big-metric">{rata_volume:,.0f} L</p>
+            <h4>📈 Laba Bersih</h4>
+            <p class="big-metric">Rp {laba_bersih:,.0f}</p>
         </div>
         """, unsafe_allow_html=True)
     
     # Analisis bulanan
-    st.markdown("### 📅 Volume Pengiriman per Bulan")
+    st.markdown("### 📅 Rekapitulasi Bulanan")
+    
+    monthly_finance = result.monthly_finance
+    
+    st.plotly_chart(figures['monthly'], use_container_width=True)
+    
+    # Tren harian dengan rata-rata bergerak 7/30 hari
+    trend_section(df, cube, 'transaksi_keuangan', ['Pemasukan', 'Pengeluaran'], 'Tren Pemasukan dan Pengeluaran', stored_series)
     
-    monthly_volume = df.groupby('Bulan').agg({
-        'Volume (L)': ['sum', 'count', 'mean']
-    }).reset_index()
-    monthly_volume.columns = ['Bulan', 'Total Volume', 'Jumlah Pengiriman', 'Rata-rata Volume']
+    # Tabel detail bulanan
+    st.markdown("### 📋 Detail Bulanan")
+    show_table(monthly_finance, {'Pemasukan': RUPIAH, 'Pengeluaran': RUPIAH, 'Laba': RUPIAH}, 'transaksi_page')
+
+# 2. REKAP PENGIRIMAN AIR
+def pengiriman_air_figures(result):
+    """Plotly figures of the pengiriman air page"""
+    figures = {}
+    monthly_volume = result.monthly_volume
     
     fig = make_subplots(specs=[[{"secondary_y": True}]])
     
@@ -321,159 +546,193 @@ def rekap_pengiriman_air(df):
         yaxis_title='Volume (L)',
         yaxis2_title='Jumlah Pengiriman'
     )
+    figures['monthly'] = fig
+    return figures
+
+def rekap_pengiriman_air(df, cube, stored_series=None):
+    st.subheader("🚛 Rekap Pengiriman Air")
     
-    st.plotly_chart(fig, use_container_width=True)
+    # Pastikan kolom yang diperlukan ada
+    missing_cols = missing_columns(df, 'pengiriman_air')
+    
+    if missing_cols:
+        st.warning(f"Kolom yang diperlukan tidak ditemukan: {missing_cols}")
+        return
+    
+    # Total volume
+    result = compute_page('pengiriman_air', df, cube)
+    figures = cached_figures(cube, 'pengiriman_air', lambda: pengiriman_air_figures(result))
+    total_volume = result.total_volume
+    total_pengiriman = result.total_pengiriman
+    rata_volume = result.rata_volume
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.markdown(f"""
+        <div class="metric-container">
+            <h4>🚰 Total Volume Air</h4>
+            <p class="big-metric">{total_volume:,.0f} L</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col2:
+        st.markdown(f"""
+        <div class="metric-container">
+            <h4>🚚 Total Pengiriman</h4>
+            <p class="big-metric">{total_pengiriman:,}</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col3:
+        st.markdown(f"""
+        <div class="metric-container">
+            <h4>📊 Rata-rata Volume</h4>
+            <p class="big-metric">{rata_volume:,.0f} L</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    # Analisis bulanan
+    st.markdown("### 📅 Volume Pengiriman per Bulan")
+    
+    monthly_volume = result.monthly_volume
+    
+    st.plotly_chart(figures['monthly'], use_container_width=True)
+    
+    # Tren harian dengan rata-rata bergerak 7/30 hari
+    trend_section(df, cube, 'pengiriman_air', ['Volume (L)'], 'Tren Volume Pengiriman (L)', stored_series)
     
     # Tabel detail bulanan
     st.markdown("### 📋 Detail Bulanan")
-    monthly_volume_display = monthly_volume.copy()
-    monthly_volume_display['Total Volume'] = monthly_volume_display['Total Volume'].apply(lambda x: f"{x:,.0f} L")
-    monthly_volume_display['Rata-rata Volume'] = monthly_volume_display['Rata-rata Volume'].apply(lambda x: f"{x:,.0f} L")
-    st.dataframe(monthly_volume_display, use_container_width=True)
+    show_table(monthly_volume, {'Total Volume': LITER, 'Rata-rata Volume': LITER}, 'pengiriman_page')
 
 # 3. DEMOGRAFI PENGIRIMAN AIR
-def demografi_pengiriman_air(df, df_locations):
+def demografi_pengiriman_figures(result):
+    """Plotly figures of the demografi pengiriman page"""
+    figures = {}
+    location_analysis = result.top_locations
+    map_data_valid = result.map_data
+    
+    fig = px.bar(
+        location_analysis,
+        x='Lokasi',
+        y='Total Volume',
+        title='Total Volume per Lokasi (Top 5)',
+        labels={'Total Volume': 'Volume (L)'},
+        color='Total Volume',
+        color_continuous_scale='Blues'
+    )
+    fig.update_xaxes(tickangle=45)
+    figures['top_volume'] = fig
+    
+    fig = px.bar(
+        location_analysis,
+        x='Lokasi',
+        y='Total Pemasukan',
+        title='Total Pemasukan per Lokasi (Top 5)',
+        labels={'Total Pemasukan': 'Pemasukan (Rp)'},
+        color='Total Pemasukan',
+        color_continuous_scale='Greens'
+    )
+    fig.update_xaxes(tickangle=45)
+    figures['top_pemasukan'] = fig
+    
+    fig = line_chart(
+        result.monthly_location,
+        x='Bulan',
+        y='Volume (L)',
+        color='Order',
+        title='Volume Pengiriman per Bulan (Top 5 Lokasi)',
+        markers=True
+    )
+    figures['monthly'] = fig
+    
+    # Peta per titik hanya untuk data kecil; data besar memakai peta cluster
+    if map_data_valid is not None and len(map_data_valid) > 0 and result.map_index is None:
+        fig = px.scatter_mapbox(
+            map_data_valid,
+            lat="Latitude",
+            lon="Longitude",
+            size="size_normalized",
+            color="Pemasukan",
+            hover_name="Order",
+            hover_data={
+                "Volume (L)": ":,.0f",
+                "Pemasukan": ":,.0f",
+                "Latitude": ":.4f",
+                "Longitude": ":.4f",
+                "size_normalized": False
+            },
+            color_continuous_scale='Viridis',
+            size_max=30,
+            zoom=11,
+            height=600,
+            title="Sebaran Lokasi Pengiriman (Ukuran: Volume, Warna: Pemasukan)"
+        )
+        
+        fig.update_layout(
+            mapbox_style="open-street-map",
+            margin={"r":0,"t":30,"l":0,"b":0}
+        )
+        figures['map'] = fig
+    return figures
+
+def demografi_pengiriman_air(df, cube, df_locations):
     st.subheader("📍 Demografi Pengiriman Air")
     
     # Pastikan kolom yang diperlukan ada
-    required_cols = ['Tanggal', 'Order', 'Volume (L)', 'Pemasukan']
-    missing_cols = [col for col in required_cols if col not in df.columns]
+    missing_cols = missing_columns(df, 'demografi_pengiriman')
     
     if missing_cols:
         st.warning(f"Kolom yang diperlukan tidak ditemukan: {missing_cols}")
         return
     
-    # Konversi tanggal dan tambahkan kolom bulan
-    df['Tanggal'] = pd.to_datetime(df['Tanggal'])
-    df['Bulan'] = df['Tanggal'].dt.to_period('M').astype(str)
-    
-    # Gabungkan dengan data lokasi jika ada
-    if df_locations is not None and 'Nama Lokasi' in df_locations.columns:
-        df = pd.merge(df, df_locations, left_on='Order', right_on='Nama Lokasi', how='left')
-    else:
-        # Jika tidak ada data lokasi, tambahkan koordinat manual untuk Warung Makan Sari Rasa
-        df.loc[df['Order'].str.contains('Sari Rasa', case=False, na=False), 'Latitude'] = -7.9932
-        df.loc[df['Order'].str.contains('Sari Rasa', case=False, na=False), 'Longitude'] = 110.3417
+    # Rollup per lokasi dari cube, digabung dengan data lokasi
+    result = compute_page('demografi_pengiriman', df, cube, df_locations)
+    figures = cached_figures(cube, 'demografi_pengiriman', lambda: demografi_pengiriman_figures(result))
     
     # Analisis per lokasi
     st.markdown("### 🏆 Top 5 Lokasi Pengiriman")
     
-    location_analysis = df.groupby('Order').agg({
-        'Volume (L)': 'sum',
-        'Pemasukan': 'sum',
-        'Tanggal': 'count'
-    }).reset_index()
-    location_analysis.columns = ['Lokasi', 'Total Volume', 'Total Pemasukan', 'Jumlah Pengiriman']
-    location_analysis = location_analysis.sort_values('Total Volume', ascending=False).head(5)
-    
     col1, col2 = st.columns(2)
     
     with col1:
-        fig = px.bar(
-            location_analysis,
-            x='Lokasi',
-            y='Total Volume',
-            title='Total Volume per Lokasi (Top 5)',
-            labels={'Total Volume': 'Volume (L)'},
-            color='Total Volume',
-            color_continuous_scale='Blues'
-        )
-        fig.update_xaxes(tickangle=45)
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(figures['top_volume'], use_container_width=True)
     
     with col2:
-        fig = px.bar(
-            location_analysis,
-            x='Lokasi',
-            y='Total Pemasukan',
-            title='Total Pemasukan per Lokasi (Top 5)',
-            labels={'Total Pemasukan': 'Pemasukan (Rp)'},
-            color='Total Pemasukan',
-            color_continuous_scale='Greens'
-        )
-        fig.update_xaxes(tickangle=45)
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(figures['top_pemasukan'], use_container_width=True)
     
     # Analisis bulanan per lokasi
     st.markdown("### 📅 Trend Bulanan per Lokasi")
     
-    top_locations = location_analysis['Lokasi'].head(5).tolist()
-    monthly_location = df[df['Order'].isin(top_locations)].groupby(['Bulan', 'Order']).agg({
-        'Volume (L)': 'sum',
-        'Pemasukan': 'sum'
-    }).reset_index()
-    
-    fig = px.line(
-        monthly_location,
-        x='Bulan',
-        y='Volume (L)',
-        color='Order',
-        title='Volume Pengiriman per Bulan (Top 5 Lokasi)',
-        markers=True
-    )
-    st.plotly_chart(fig, use_container_width=True)
+    st.plotly_chart(figures['monthly'], use_container_width=True)
     
     # Peta lokasi jika ada koordinat
-    if 'Latitude' in df.columns and 'Longitude' in df.columns:
+    if result.map_data is not None:
         st.markdown("### 🗺️ Peta Sebaran Lokasi Pengiriman")
         
-        # Agregasi data untuk peta
-        map_data = df.groupby(['Order', 'Latitude', 'Longitude']).agg({
-            'Volume (L)': 'sum',
-            'Pemasukan': 'sum'
-        }).reset_index()
-        
-        # Filter data yang memiliki koordinat valid
-        map_data_valid = map_data[
-            (map_data['Latitude'].notna()) & 
-            (map_data['Longitude'].notna()) &
-            (map_data['Latitude'] != 0) &
-            (map_data['Longitude'] != 0)
-        ]
+        # Data peta sudah difilter ke koordinat valid dan diberi ukuran marker
+        map_data_valid = result.map_data
         
         # Tampilkan peta jika ada data valid
-        if len(map_data_valid) > 0:
-            # Pastikan ada variasi dalam ukuran dan warna
-            if map_data_valid['Volume (L)'].max() == map_data_valid['Volume (L)'].min():
-                map_data_valid['size_normalized'] = 50  # Ukuran tetap jika semua sama
-            else:
-                map_data_valid['size_normalized'] = ((map_data_valid['Volume (L)'] - map_data_valid['Volume (L)'].min()) / 
-                                                   (map_data_valid['Volume (L)'].max() - map_data_valid['Volume (L)'].min()) * 50 + 10)
-            
-            fig = px.scatter_mapbox(
-                map_data_valid,
-                lat="Latitude",
-                lon="Longitude",
-                size="size_normalized",
-                color="Pemasukan",
-                hover_name="Order",
-                hover_data={
-                    "Volume (L)": ":,.0f",
-                    "Pemasukan": ":,.0f",
-                    "Latitude": ":.4f",
-                    "Longitude": ":.4f",
-                    "size_normalized": False
-                },
-                color_continuous_scale='Viridis',
-                size_max=30,
-                zoom=11,
-                height=600,
-                title="Sebaran Lokasi Pengiriman (Ukuran: Volume, Warna: Pemasukan)"
-            )
-            
-            fig.update_layout(
-                mapbox_style="open-street-map",
-                margin={"r":0,"t":30,"l":0,"b":0}
+        if result.map_index is not None:
+            zoom = map_zoom_slider('demografi_zoom')
+            fig = cached_figures(
+                cube, ('demografi_pengiriman', 'cluster', zoom),
+                lambda: cluster_map_figure(result.map_index, zoom, 'Volume (L)', 'Pemasukan', "Sebaran Lokasi Pengiriman")
             )
-            
             st.plotly_chart(fig, use_container_width=True)
+        
+        if len(map_data_valid) > 0:
+            if result.map_index is None:
+                st.plotly_chart(figures['map'], use_container_width=True)
             
             # Informasi tambahan
             st.markdown("### 📋 Informasi Lokasi Pengiriman")
-            display_data = map_data_valid.copy()
-            display_data['Volume (L)'] = display_data['Volume (L)'].apply(lambda x: f"{x:,.0f} L")
-            display_data['Pemasukan'] = display_data['Pemasukan'].apply(lambda x: f"Rp {x:,.0f}")
-            st.dataframe(display_data[['Order', 'Volume (L)', 'Pemasukan', 'Latitude', 'Longitude']], use_container_width=True)
+            show_table(
+                map_data_valid[['Order', 'Volume (L)', 'Pemasukan', 'Latitude', 'Longitude']],
+                {'Volume (L)': LITER, 'Pemasukan': RUPIAH, 'Latitude': COORDINATE, 'Longitude': COORDINATE},
+                'demografi_page'
+            )
             
         else:
             st.warning("⚠️ Tidak ada data koordinat yang valid untuk ditampilkan di peta")
@@ -495,41 +754,162 @@ def demografi_pengiriman_air(df, df_locations):
             df['Latitude'] = None
             df['Longitude'] = None
             
-            # Tambahkan koordinat untuk Warung Makan Sari Rasa
-            df.loc[df['Order'].str.contains('Sari Rasa', case=False, na=False), 'Latitude'] = -7.9932
-            df.loc[df['Order'].str.contains('Sari Rasa', case=False, na=False), 'Longitude'] = 110.3417
+            # Tambahkan koordinat untuk Warung Makan Sari Rasa (mask dihitung sekali)
+            sari_rasa = df['Order'].str.contains('Sari Rasa', case=False, na=False)
+            df.loc[sari_rasa, 'Latitude'] = -7.9932
+            df.loc[sari_rasa, 'Longitude'] = 110.3417
             
             st.success("✅ Koordinat berhasil ditambahkan! Refresh halaman untuk melihat peta.")
             st.experimental_rerun()
 
 # 4. DEMOGRAFI PENGGUNAAN ARMADA
-def demografi_penggunaan_armada(df, df_locations):
+def penggunaan_armada_figures(result):
+    """Plotly figures of the penggunaan armada page"""
+    figures = {}
+    armada_analysis = result.armada_analysis
+    
+    fig = px.bar(
+        armada_analysis.sort_values('Total Volume', ascending=False).head(5),
+        x='Plat Nomor',
+        y='Total Volume',
+        title='Total Volume per Armada (Top 5)',
+        labels={'Total Volume': 'Volume (L)'}
+    )
+    fig.update_xaxes(tickangle=45)
+    figures['top_volume'] = fig
+    
+    fig = scatter_chart(
+        armada_analysis,
+        x='Frekuensi',
+        y='Total Volume',
+        size='Total Pengeluaran',
+        color='Rata-rata Volume',
+        title='Korelasi Frekuensi vs Volume vs Biaya',
+        hover_name='Plat Nomor',
+        labels={
+            'Frekuensi': 'Frekuensi Penggunaan',
+            'Total Volume': 'Total Volume (L)',
+            'Total Pengeluaran': 'Total Pengeluaran (Rp)',
+            'Rata-rata Volume': 'Rata-rata Volume (L)'
+        }
+    )
+    figures['scatter'] = fig
+    
+    if result.monthly_armada is not None:
+        fig = line_chart(
+            result.monthly_armada,
+            x='Bulan',
+            y='Volume (L)',
+            color='Plat Nomor',
+            title='Volume Pengiriman per Bulan (Top 3 Armada)',
+            markers=True
+        )
+        figures['monthly'] = fig
+    return figures
+
+def armada_selection_figures(selection, selected_armada):
+    """Plotly figures of the armada map for one selection"""
+    figures = {}
+    display_data = selection.display_data
+    map_title = selection.map_title
+    if len(display_data) == 0:
+        return figures
+    
+    # Peta persebaran armada per titik hanya untuk data kecil; data besar memakai peta cluster
+    if selection.map_index is None:
+        fig = px.scatter_mapbox(
+            display_data,
+            lat="Latitude",
+            lon="Longitude",
+            size="size_normalized",
+            color="Plat Nomor",
+            hover_name="Order",
+            hover_data={
+                "Plat Nomor": True,
+                "Total Volume": ":,.0f L",
+                "Frekuensi": ":,",
+                "Latitude": ":.4f",
+                "Longitude": ":.4f",
+                "size_normalized": False
+            },
+            size_max=25,
+            zoom=10,
+            height=600,
+            title=f"{map_title} (Ukuran: Volume, Warna: Armada)"
+        )
+        
+        fig.update_layout(
+            mapbox_style="open-street-map",
+            margin={"r":0,"t":50,"l":0,"b":0}
+        )
+        figures['map'] = fig
+    
+    if selected_armada != ALL_ARMADA:
+        # Volume dan frekuensi per lokasi untuk armada terpilih
+        fig = px.bar(
+            selection.volume_summary,
+            x='Order',
+            y='Total Volume',
+            title=f'Volume per Lokasi - {selected_armada}',
+            labels={'Total Volume': 'Total Volume (L)', 'Order': 'Lokasi'}
+        )
+        fig.update_xaxes(tickangle=45)
+        figures['volume'] = fig
+        
+        fig = px.bar(
+            selection.frequency_summary,
+            x='Order',
+            y='Frekuensi',
+            title=f'Frekuensi per Lokasi - {selected_armada}',
+            labels={'Frekuensi': 'Frekuensi Kunjungan', 'Order': 'Lokasi'}
+        )
+        fig.update_xaxes(tickangle=45)
+        figures['frequency'] = fig
+    else:
+        # Top armada per volume dan lokasi yang paling sering dikunjungi
+        fig = px.bar(
+            selection.volume_summary,
+            x='Plat Nomor',
+            y='Total Volume',
+            title='Top 5 Armada - Total Volume',
+            labels={'Total Volume': 'Total Volume (L)', 'Plat Nomor': 'Armada'}
+        )
+        fig.update_xaxes(tickangle=45)
+        figures['volume'] = fig
+        
+        fig = px.bar(
+            selection.frequency_summary,
+            x='Order',
+            y='Frekuensi',
+            title='Top 5 Lokasi - Frekuensi Kunjungan',
+            labels={'Frekuensi': 'Total Frekuensi', 'Order': 'Lokasi'}
+        )
+        fig.update_xaxes(tickangle=45)
+        figures['frequency'] = fig
+    return figures
+
+def demografi_penggunaan_armada(df, cube, df_locations):
     st.subheader("🚚 Demografi Penggunaan Armada")
     
     # Pastikan kolom yang diperlukan ada
-    required_cols = ['Plat Nomor', 'Volume (L)']
-    missing_cols = [col for col in required_cols if col not in df.columns]
+    missing_cols = missing_columns(df, 'penggunaan_armada')
     
     if missing_cols:
         st.warning(f"Kolom yang diperlukan tidak ditemukan: {missing_cols}")
         return
     
-    # Tambahkan kolom bulan jika ada tanggal
-    if 'Tanggal' in df.columns:
-        df['Tanggal'] = pd.to_datetime(df['Tanggal'])
-        df['Bulan'] = df['Tanggal'].dt.to_period('M').astype(str)
-    
     # Gabungkan dengan data lokasi dari sheet 3 jika ada kolom Order
-    if 'Order' in df.columns and df_locations is not None and 'Nama Lokasi' in df_locations.columns:
-        df = pd.merge(df, df_locations, left_on='Order', right_on='Nama Lokasi', how='left')
+    result = compute_page('penggunaan_armada', df, cube, df_locations)
+    figures = cached_figures(cube, 'penggunaan_armada', lambda: penggunaan_armada_figures(result))
+    if result.has_locations:
         st.success("✅ Data lokasi berhasil digabungkan dengan data armada")
     else:
         st.warning("⚠️ Kolom 'Order' tidak ditemukan atau data lokasi tidak tersedia")
     
     # Statistik armada
-    total_armada = df['Plat Nomor'].nunique()
-    total_penggunaan = len(df)
-    rata_penggunaan = total_penggunaan / total_armada if total_armada > 0 else 0
+    total_armada = result.total_armada
+    total_penggunaan = result.total_penggunaan
+    rata_penggunaan = result.rata_penggunaan
     
     col1, col2, col3 = st.columns(3)
     with col1:
@@ -559,122 +939,55 @@ def demografi_penggunaan_armada(df, df_locations):
     # Analisis armada
     st.markdown("### 📊 Analisis Penggunaan Armada")
     
-    armada_analysis = df.groupby('Plat Nomor').agg({
-        'Volume (L)': ['sum', 'mean', 'count'],
-        'Pengeluaran': 'sum'
-    }).reset_index()
-    armada_analysis.columns = ['Plat Nomor', 'Total Volume', 'Rata-rata Volume', 'Frekuensi', 'Total Pengeluaran']
-    
     col1, col2 = st.columns(2)
     
     with col1:
-        fig = px.bar(
-            armada_analysis.sort_values('Total Volume', ascending=False).head(5),
-            x='Plat Nomor',
-            y='Total Volume',
-            title='Total Volume per Armada (Top 5)',
-            labels={'Total Volume': 'Volume (L)'}
-        )
-        fig.update_xaxes(tickangle=45)
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(figures['top_volume'], use_container_width=True)
     
     with col2:
-        fig = px.scatter(
-            armada_analysis,
-            x='Frekuensi',
-            y='Total Volume',
-            size='Total Pengeluaran',
-            color='Rata-rata Volume',
-            title='Korelasi Frekuensi vs Volume vs Biaya',
-            hover_name='Plat Nomor',
-            labels={
-                'Frekuensi': 'Frekuensi Penggunaan',
-                'Total Volume': 'Total Volume (L)',
-                'Total Pengeluaran': 'Total Pengeluaran (Rp)',
-                'Rata-rata Volume': 'Rata-rata Volume (L)'
-            }
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(figures['scatter'], use_container_width=True)
     
     # PERSEBARAN ARMADA BERDASARKAN LOKASI ORDER - BAGIAN BARU
-    if 'Latitude' in df.columns and 'Longitude' in df.columns and 'Order' in df.columns:
+    if result.armada_map is not None:
         st.markdown("### 🗺️ Persebaran Armada Berdasarkan Lokasi Order")
         
-        # Agregasi data untuk peta persebaran armada
-        armada_location_data = df.groupby(['Plat Nomor', 'Order', 'Latitude', 'Longitude']).agg({
-            'Volume (L)': 'sum',
-            'Tanggal': 'count'
-        }).reset_index()
-        armada_location_data.columns = ['Plat Nomor', 'Order', 'Latitude', 'Longitude', 'Total Volume', 'Frekuensi']
-        
-        # Filter data yang memiliki koordinat valid
-        armada_map_valid = armada_location_data[
-            (armada_location_data['Latitude'].notna()) & 
-            (armada_location_data['Longitude'].notna()) &
-            (armada_location_data['Latitude'] != 0) &
-            (armada_location_data['Longitude'] != 0)
-        ]
+        # Rollup cube per armada dan lokasi yang sudah dijoin koordinat valid
+        armada_map_valid = result.armada_map
         
         if len(armada_map_valid) > 0:
             # Selectbox untuk memilih armada
             selected_armada = st.selectbox(
                 "Pilih Armada untuk Melihat Persebaran:",
-                options=['Semua Armada'] + list(armada_map_valid['Plat Nomor'].unique())
+                options=[ALL_ARMADA] + list(armada_map_valid['Plat Nomor'].unique())
             )
             
-            if selected_armada != 'Semua Armada':
-                display_data = armada_map_valid[armada_map_valid['Plat Nomor'] == selected_armada]
-                map_title = f"Persebaran Armada {selected_armada}"
-            else:
-                display_data = armada_map_valid
-                map_title = "Persebaran Semua Armada"
+            selection = compute_armada_selection(result, selected_armada)
+            display_data = selection.display_data
+            selection_figures = cached_figures(
+                cube, ('penggunaan_armada', selected_armada),
+                lambda: armada_selection_figures(selection, selected_armada)
+            )
             
-            # Normalisasi ukuran untuk visualisasi
             if len(display_data) > 0:
-                if display_data['Total Volume'].max() == display_data['Total Volume'].min():
-                    display_data['size_normalized'] = 20
+                if selection.map_index is not None:
+                    zoom = map_zoom_slider('armada_zoom')
+                    fig = cached_figures(
+                        cube, ('penggunaan_armada', selected_armada, 'cluster', zoom),
+                        lambda: cluster_map_figure(selection.map_index, zoom, 'Total Volume', 'Plat Nomor', selection.map_title)
+                    )
+                    st.plotly_chart(fig, use_container_width=True)
                 else:
-                    display_data['size_normalized'] = ((display_data['Total Volume'] - display_data['Total Volume'].min()) / 
-                                                     (display_data['Total Volume'].max() - display_data['Total Volume'].min()) * 40 + 10)
-                
-                # Peta persebaran armada
-                fig = px.scatter_mapbox(
-                    display_data,
-                    lat="Latitude",
-                    lon="Longitude",
-                    size="size_normalized",
-                    color="Plat Nomor",
-                    hover_name="Order",
-                    hover_data={
-                        "Plat Nomor": True,
-                        "Total Volume": ":,.0f L",
-                        "Frekuensi": ":,",
-                        "Latitude": ":.4f",
-                        "Longitude": ":.4f",
-                        "size_normalized": False
-                    },
-                    size_max=25,
-                    zoom=10,
-                    height=600,
-                    title=f"{map_title} (Ukuran: Volume, Warna: Armada)"
-                )
-                
-                fig.update_layout(
-                    mapbox_style="open-street-map",
-                    margin={"r":0,"t":50,"l":0,"b":0}
-                )
-                
-                st.plotly_chart(fig, use_container_width=True)
+                    st.plotly_chart(selection_figures['map'], use_container_width=True)
                 
                 # Tabel detail persebaran armada
                 st.markdown("### 📋 Detail Persebaran Armada per Lokasi")
                 
                 # Summary per armada dan lokasi
-                summary_data = display_data.copy()
-                summary_data['Total Volume'] = summary_data['Total Volume'].apply(lambda x: f"{x:,.0f} L")
-                summary_data_display = summary_data[['Plat Nomor', 'Order', 'Total Volume', 'Frekuensi', 'Latitude', 'Longitude']]
-                
-                st.dataframe(summary_data_display, use_container_width=True)
+                show_table(
+                    display_data[['Plat Nomor', 'Order', 'Total Volume', 'Frekuensi', 'Latitude', 'Longitude']],
+                    {'Total Volume': LITER, 'Latitude': COORDINATE, 'Longitude': COORDINATE},
+                    'armada_page'
+                )
                 
                 # Analisis tambahan per armada
                 st.markdown("### 📊 Analisis Armada per Lokasi")
@@ -682,64 +995,12 @@ def demografi_penggunaan_armada(df, df_locations):
                 col1, col2 = st.columns(2)
                 
                 with col1:
-                    # Grafik volume per lokasi untuk armada terpilih
-                    if selected_armada != 'Semua Armada':
-                        location_volume = display_data.groupby('Order')['Total Volume'].sum().reset_index()
-                        location_volume = location_volume.sort_values('Total Volume', ascending=False)
-                        
-                        fig = px.bar(
-                            location_volume,
-                            x='Order',
-                            y='Total Volume',
-                            title=f'Volume per Lokasi - {selected_armada}',
-                            labels={'Total Volume': 'Total Volume (L)', 'Order': 'Lokasi'}
-                        )
-                        fig.update_xaxes(tickangle=45)
-                        st.plotly_chart(fig, use_container_width=True)
-                    else:
-                        # Top armada per volume
-                        top_armada_volume = armada_map_valid.groupby('Plat Nomor')['Total Volume'].sum().reset_index()
-                        top_armada_volume = top_armada_volume.sort_values('Total Volume', ascending=False).head(5)
-                        
-                        fig = px.bar(
-                            top_armada_volume,
-                            x='Plat Nomor',
-                            y='Total Volume',
-                            title='Top 5 Armada - Total Volume',
-                            labels={'Total Volume': 'Total Volume (L)', 'Plat Nomor': 'Armada'}
-                        )
-                        fig.update_xaxes(tickangle=45)
-                        st.plotly_chart(fig, use_container_width=True)
+                    # Volume per lokasi untuk armada terpilih, atau top armada per volume
+                    st.plotly_chart(selection_figures['volume'], use_container_width=True)
                 
                 with col2:
-                    # Grafik frekuensi per lokasi
-                    if selected_armada != 'Semua Armada':
-                        location_freq = display_data.groupby('Order')['Frekuensi'].sum().reset_index()
-                        location_freq = location_freq.sort_values('Frekuensi', ascending=False)
-                        
-                        fig = px.bar(
-                            location_freq,
-                            x='Order',
-                            y='Frekuensi',
-                            title=f'Frekuensi per Lokasi - {selected_armada}',
-                            labels={'Frekuensi': 'Frekuensi Kunjungan', 'Order': 'Lokasi'}
-                        )
-                        fig.update_xaxes(tickangle=45)
-                        st.plotly_chart(fig, use_container_width=True)
-                    else:
-                        # Sebaran lokasi terbanyak
-                        top_locations = armada_map_valid.groupby('Order')['Frekuensi'].sum().reset_index()
-                        top_locations = top_locations.sort_values('Frekuensi', ascending=False).head(5)
-                        
-                        fig = px.bar(
-                            top_locations,
-                            x='Order',
-                            y='Frekuensi',
-                            title='Top 5 Lokasi - Frekuensi Kunjungan',
-                            labels={'Frekuensi': 'Total Frekuensi', 'Order': 'Lokasi'}
-                        )
-                        fig.update_xaxes(tickangle=45)
-                        st.plotly_chart(fig, use_container_width=True)
+                    # Frekuensi per lokasi untuk armada terpilih, atau lokasi terbanyak
+                    st.plotly_chart(selection_figures['frequency'], use_container_width=True)
                 
             else:
                 st.warning("⚠️ Tidak ada data armada dengan koordinat valid")
@@ -749,45 +1010,72 @@ def demografi_penggunaan_armada(df, df_locations):
         st.info("ℹ️ Data koordinat atau kolom Order tidak tersedia untuk menampilkan persebaran armada")
     
     # Analisis bulanan jika ada data bulan
-    if 'Bulan' in df.columns:
+    if result.monthly_armada is not None:
         st.markdown("### 📅 Trend Bulanan per Armada")
         
-        top_armada = armada_analysis.sort_values('Total Volume', ascending=False).head(3)['Plat Nomor'].tolist()
-        monthly_armada = df[df['Plat Nomor'].isin(top_armada)].groupby(['Bulan', 'Plat Nomor']).agg({
-            'Volume (L)': 'sum'
-        }).reset_index()
-        
-        fig = px.line(
-            monthly_armada,
-            x='Bulan',
-            y='Volume (L)',
-            color='Plat Nomor',
-            title='Volume Pengiriman per Bulan (Top 3 Armada)',
+        st.plotly_chart(figures['monthly'], use_container_width=True)
+
+# 5. ANALISIS KINERJA SOPIR
+def kinerja_sopir_figures(result):
+    """Plotly figures of the kinerja sopir page"""
+    figures = {}
+    sopir_analysis = result.sopir_analysis
+    
+    fig = px.bar(
+        sopir_analysis.sort_values('Total Volume', ascending=False).head(5),
+        x='Sopir',
+        y='Total Volume',
+        title='Total Volume per Sopir (Top 5)',
+        labels={'Total Volume': 'Volume (L)'}
+    )
+    fig.update_xaxes(tickangle=45)
+    figures['top_volume'] = fig
+    
+    fig = scatter_chart(
+        sopir_analysis,
+        x='Frekuensi',
+        y='Total Volume',
+        size='Total Pemasukan',
+        color='Rata-rata Volume',
+        title='Korelasi Frekuensi vs Volume vs Pemasukan',
+        hover_name='Sopir',
+        labels={
+            'Frekuensi': 'Frekuensi Tugas',
+            'Total Volume': 'Total Volume (L)',
+            'Total Pemasukan': 'Total Pemasukan (Rp)',
+            'Rata-rata Volume': 'Rata-rata Volume (L)'
+        }
+    )
+    figures['scatter'] = fig
+    
+    if result.monthly_sopir is not None:
+        fig = line_chart(
+            result.monthly_sopir,
+            x='Bulan',
+            y='Volume (L)',
+            color='Sopir',
+            title='Volume Pengiriman per Bulan (Top 3 Sopir)',
             markers=True
         )
-        st.plotly_chart(fig, use_container_width=True)
+        figures['monthly'] = fig
+    return figures
 
-# 5. ANALISIS KINERJA SOPIR
-def analisis_kinerja_sopir(df):
+def analisis_kinerja_sopir(df, cube):
     st.subheader("👨‍🚀 Analisis Kinerja Sopir")
     
     # Pastikan kolom yang diperlukan ada
-    required_cols = ['Sopir', 'Volume (L)']
-    missing_cols = [col for col in required_cols if col not in df.columns]
+    missing_cols = missing_columns(df, 'kinerja_sopir')
     
     if missing_cols:
         st.warning(f"Kolom yang diperlukan tidak ditemukan: {missing_cols}")
         return
     
-    # Tambahkan kolom bulan jika ada tanggal
-    if 'Tanggal' in df.columns:
-        df['Tanggal'] = pd.to_datetime(df['Tanggal'])
-        df['Bulan'] = df['Tanggal'].dt.to_period('M').astype(str)
-    
     # Statistik sopir
-    total_sopir = df['Sopir'].nunique()
-    total_tugas = len(df)
-    rata_tugas = total_tugas / total_sopir if total_sopir > 0 else 0
+    result = compute_page('kinerja_sopir', df, cube)
+    figures = cached_figures(cube, 'kinerja_sopir', lambda: kinerja_sopir_figures(result))
+    total_sopir = result.total_sopir
+    total_tugas = result.total_tugas
+    rata_tugas = result.rata_tugas
     
     col1, col2, col3 = st.columns(3)
     with col1:
@@ -817,120 +1105,27 @@ def analisis_kinerja_sopir(df):
     # Analisis kinerja sopir
     st.markdown("### 📊 Analisis Kinerja Sopir")
     
-    sopir_analysis = df.groupby('Sopir').agg({
-        'Volume (L)': ['sum', 'mean', 'count'],
-        'Pemasukan': 'sum'
-    }).reset_index()
-    sopir_analysis.columns = ['Sopir', 'Total Volume', 'Rata-rata Volume', 'Frekuensi', 'Total Pemasukan']
-    
     col1, col2 = st.columns(2)
     
     with col1:
-        fig = px.bar(
-            sopir_analysis.sort_values('Total Volume', ascending=False).head(5),
-            x='Sopir',
-            y='Total Volume',
-            title='Total Volume per Sopir (Top 5)',
-            labels={'Total Volume': 'Volume (L)'}
-        )
-        fig.update_xaxes(tickangle=45)
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(figures['top_volume'], use_container_width=True)
     
     with col2:
-        fig = px.scatter(
-            sopir_analysis,
-            x='Frekuensi',
-            y='Total Volume',
-            size='Total Pemasukan',
-            color='Rata-rata Volume',
-            title='Korelasi Frekuensi vs Volume vs Pemasukan',
-            hover_name='Sopir',
-            labels={
-                'Frekuensi': 'Frekuensi Tugas',
-                'Total Volume': 'Total Volume (L)',
-                'Total Pemasukan': 'Total Pemasukan (Rp)',
-                'Rata-rata Volume': 'Rata-rata Volume (L)'
-            }
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(figures['scatter'], use_container_width=True)
     
     # Analisis bulanan jika ada data bulan
-    if 'Bulan' in df.columns:
+    if result.monthly_sopir is not None:
         st.markdown("### 📅 Trend Bulanan per Sopir")
         
-        top_sopir = sopir_analysis.sort_values('Total Volume', ascending=False).head(3)['Sopir'].tolist()
-        monthly_sopir = df[df['Sopir'].isin(top_sopir)].groupby(['Bulan', 'Sopir']).agg({
-            'Volume (L)': 'sum'
-        }).reset_index()
-        
-        fig = px.line(
-            monthly_sopir,
-            x='Bulan',
-            y='Volume (L)',
-            color='Sopir',
-            title='Volume Pengiriman per Bulan (Top 3 Sopir)',
-            markers=True
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(figures['monthly'], use_container_width=True)
 
 # 6. ANALISIS EFISIENSI OPERASIONAL
-def analisis_efisiensi_operasional(df):
-    st.subheader("⚡ Analisis Efisiensi Operasional")
-    
-    # Pastikan kolom yang diperlukan ada
-    required_cols = ['Tanggal', 'Plat Nomor', 'Sopir', 'Volume (L)', 'Pemasukan', 'Pengeluaran']
-    missing_cols = [col for col in required_cols if col not in df.columns]
-    
-    if missing_cols:
-        st.warning(f"Kolom yang diperlukan tidak ditemukan: {missing_cols}")
-        return
-    
-    # Konversi tanggal dan tambahkan kolom bulan
-    df['Tanggal'] = pd.to_datetime(df['Tanggal'])
-    df['Bulan'] = df['Tanggal'].dt.to_period('M').astype(str)
-    
-    # Hitung efisiensi (Pemasukan - Pengeluaran) per liter
-    df['Efisiensi'] = (df['Pemasukan'] - df['Pengeluaran']) / df['Volume (L)']
-    
-    # Metrik utama efisiensi
-    efisiensi_total = df['Efisiensi'].mean()
-    volume_total = df['Volume (L)'].sum()
-    profit_margin = ((df['Pemasukan'].sum() - df['Pengeluaran'].sum()) / df['Pemasukan'].sum()) * 100
-    
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        st.markdown(f"""
-        <div class="metric-container">
-            <h4>⚡ Efisiensi Rata-rata</h4>
-            <p class="big-metric">Rp {efisiensi_total:.2f}/L</p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col2:
-        st.markdown(f"""
-        <div class="metric-container">
-            <h4>🚰 Total Volume</h4>
-            <p class="big-metric">{volume_total:,.0f} L</p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col3:
-        st.markdown(f"""
-        <div class="metric-container">
-            <h4>📈 Profit Margin</h4>
-            <p class="big-metric">{profit_margin:.1f}%</p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    # 1. Efisiensi per Bulan
-    st.markdown("### 📅 Efisiensi Operasional per Bulan")
-    
-    monthly_efficiency = df.groupby('Bulan').agg({
-        'Efisiensi': 'mean',
-        'Pemasukan': 'sum',
-        'Pengeluaran': 'sum',
-        'Volume (L)': 'sum'
-    }).reset_index()
+def efisiensi_operasional_figures(result):
+    """Plotly figures of the efisiensi operasional page"""
+    figures = {}
+    monthly_efficiency = result.monthly_efficiency
+    armada_efficiency = result.armada_efficiency
+    sopir_efficiency = result.sopir_efficiency
     
     fig = make_subplots(specs=[[{"secondary_y": True}]])
     
@@ -972,198 +1167,299 @@ def analisis_efisiensi_operasional(df):
         yaxis_title='Efisiensi (Rp/Liter)',
         yaxis2_title='Pemasukan/Pengeluaran (Rp)'
     )
+    figures['monthly'] = fig
+    
+    fig = px.bar(
+        armada_efficiency.nlargest(5, 'Efisiensi'),
+        x='Plat Nomor',
+        y='Efisiensi',
+        title='Top 5 Armada Paling Efisien',
+        labels={'Efisiensi': 'Efisiensi (Rp/L)'},
+        color='Efisiensi',
+        color_continuous_scale='Greens'
+    )
+    fig.update_xaxes(tickangle=45)
+    figures['armada_top'] = fig
+    
+    fig = scatter_chart(
+        armada_efficiency,
+        x='Volume (L)',
+        y='Efisiensi',
+        size='Pemasukan',
+        color='Pengeluaran',
+        title='Korelasi Volume vs Efisiensi',
+        hover_name='Plat Nomor',
+        labels={
+            'Volume (L)': 'Total Volume (L)',
+            'Efisiensi': 'Efisiensi (Rp/L)',
+            'Pemasukan': 'Total Pemasukan (Rp)',
+            'Pengeluaran': 'Total Pengeluaran (Rp)'
+        }
+    )
+    figures['armada_scatter'] = fig
+    
+    fig = px.bar(
+        sopir_efficiency.nlargest(5, 'Efisiensi'),
+        x='Sopir',
+        y='Efisiensi',
+        title='Top 5 Sopir Paling Efisien',
+        labels={'Efisiensi': 'Efisiensi (Rp/L)'},
+        color='Efisiensi',
+        color_continuous_scale='Greens'
+    )
+    fig.update_xaxes(tickangle=45)
+    figures['sopir_top'] = fig
+    
+    fig = scatter_chart(
+        sopir_efficiency,
+        x='Volume (L)',
+        y='Efisiensi',
+        size='Pemasukan',
+        color='Pengeluaran',
+        title='Korelasi Volume vs Efisiensi',
+        hover_name='Sopir',
+        labels={
+            'Volume (L)': 'Total Volume (L)',
+            'Efisiensi': 'Efisiensi (Rp/L)',
+            'Pemasukan': 'Total Pemasukan (Rp)',
+            'Pengeluaran': 'Total Pengeluaran (Rp)'
+        }
+    )
+    figures['sopir_scatter'] = fig
+    return figures
+
+def utilisasi_figures(result):
+    """Cost and revenue per km and active vs idle days per plate"""
+    figures = {}
+    
+    per_km = result.per_plate.melt(
+        id_vars='Plat Nomor',
+        value_vars=['Biaya per Km', 'Pendapatan per Km'],
+        var_name='Ukuran',
+        value_name='Rp per Km'
+    )
+    figures['per_km'] = px.bar(
+        per_km,
+        x='Plat Nomor',
+        y='Rp per Km',
+        color='Ukuran',
+        barmode='group',
+        title='Biaya dan Pendapatan per Km per Armada'
+    )
     
-    st.plotly_chart(fig, use_container_width=True)
-    
-    # 2. Efisiensi per Armada
-    st.markdown("### 🚚 Efisiensi per Armada")
+    days = result.per_plate.melt(
+        id_vars='Plat Nomor',
+        value_vars=['Hari Aktif', 'Hari Menganggur'],
+        var_name='Status',
+        value_name='Jumlah Hari'
+    )
+    figures['days'] = px.bar(
+        days,
+        x='Plat Nomor',
+        y='Jumlah Hari',
+        color='Status',
+        title=f'Hari Aktif vs Menganggur per Armada ({result.period_days:,} hari)'
+    )
+    return figures
+
+def utilisasi_armada(df, cube, df_locations):
+    """Fleet utilization section: km from base to each Order location, cost/km, revenue/km and idle days"""
+    st.markdown("### 🛣️ Utilisasi dan Biaya per Km Armada")
+    
+    missing_cols = [col for col in UTILIZATION_COLUMNS if col not in df.columns]
+    locations = location_dimension(df_locations)
+    if missing_cols or locations is None or not locations.has_coordinates or len(located_ids(locations)) == 0:
+        st.info("Utilisasi per km membutuhkan kolom Order dan data lokasi dengan koordinat")
+        return
     
-    armada_efficiency = df.groupby('Plat Nomor').agg({
-        'Efisiensi': 'mean',
-        'Volume (L)': 'sum',
-        'Pemasukan': 'sum',
-        'Pengeluaran': 'sum'
-    }).reset_index()
-    armada_efficiency = armada_efficiency.sort_values('Efisiensi', ascending=False)
+    base = base_selectbox(locations, key="utilisasi_base")
+    result = cube_utilization(df, cube, locations, base)
+    fleet = result.fleet()
     
-    col1, col2 = st.columns(2)
+    col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        fig = px.bar(
-            armada_efficiency.head(5),
-            x='Plat Nomor',
-            y='Efisiensi',
-            title='Top 5 Armada Paling Efisien',
-            labels={'Efisiensi': 'Efisiensi (Rp/L)'},
-            color='Efisiensi',
-            color_continuous_scale='Greens'
-        )
-        fig.update_xaxes(tickangle=45)
-        st.plotly_chart(fig, use_container_width=True)
+        st.markdown(f"""
+        <div class="metric-container">
+            <h4>🛣️ Total Jarak</h4>
+            <p class="big-metric">{fleet['km']:,.0f} km</p>
+        </div>
+        """, unsafe_allow_html=True)
     
     with col2:
-        fig = px.scatter(
-            armada_efficiency,
-            x='Volume (L)',
-            y='Efisiensi',
-            size='Pemasukan',
-            color='Pengeluaran',
-            title='Korelasi Volume vs Efisiensi',
-            hover_name='Plat Nomor',
-            labels={
-                'Volume (L)': 'Total Volume (L)',
-                'Efisiensi': 'Efisiensi (Rp/L)',
-                'Pemasukan': 'Total Pemasukan (Rp)',
-                'Pengeluaran': 'Total Pengeluaran (Rp)'
-            }
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        st.markdown(f"""
+        <div class="metric-container">
+            <h4>💸 Biaya per Km</h4>
+            <p class="big-metric">{RUPIAH.format(fleet['biaya_per_km'])}</p>
+        </div>
+        """, unsafe_allow_html=True)
     
-    # 3. Efisiensi per Sopir
-    st.markdown("### 👨‍🚀 Efisiensi per Sopir")
+    with col3:
+        st.markdown(f"""
+        <div class="metric-container">
+            <h4>💰 Pendapatan per Km</h4>
+            <p class="big-metric">{RUPIAH.format(fleet['pendapatan_per_km'])}</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col4:
+        st.markdown(f"""
+        <div class="metric-container">
+            <h4>📆 Utilisasi Armada</h4>
+            <p class="big-metric">{fleet['utilisasi']:.1f}%</p>
+        </div>
+        """, unsafe_allow_html=True)
     
-    sopir_efficiency = df.groupby('Sopir').agg({
-        'Efisiensi': 'mean',
-        'Volume (L)': 'sum',
-        'Pemasukan': 'sum',
-        'Pengeluaran': 'sum'
-    }).reset_index()
-    sopir_efficiency = sopir_efficiency.sort_values('Efisiensi', ascending=False)
+    st.caption(f"Jarak per trip = pulang-pergi titik berangkat → lokasi Order (garis lurus × {ROAD_FACTOR:g}); "
+               f"hari menganggur = hari tanpa pengiriman dalam periode data")
+    
+    figures = cached_figures(cube, ('utilisasi', base), lambda: utilisasi_figures(result))
     
     col1, col2 = st.columns(2)
     
     with col1:
-        fig = px.bar(
-            sopir_efficiency.head(5),
-            x='Sopir',
-            y='Efisiensi',
-            title='Top 5 Sopir Paling Efisien',
-            labels={'Efisiensi': 'Efisiensi (Rp/L)'},
-            color='Efisiensi',
-            color_continuous_scale='Greens'
-        )
-        fig.update_xaxes(tickangle=45)
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(figures['per_km'], use_container_width=True)
     
     with col2:
-        fig = px.scatter(
-            sopir_efficiency,
-            x='Volume (L)',
-            y='Efisiensi',
-            size='Pemasukan',
-            color='Pengeluaran',
-            title='Korelasi Volume vs Efisiensi',
-            hover_name='Sopir',
-            labels={
-                'Volume (L)': 'Total Volume (L)',
-                'Efisiensi': 'Efisiensi (Rp/L)',
-                'Pemasukan': 'Total Pemasukan (Rp)',
-                'Pengeluaran': 'Total Pengeluaran (Rp)'
-            }
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(figures['days'], use_container_width=True)
+    
+    show_table(result.per_plate, {
+        'Km': "{:,.1f}",
+        'Volume (L)': LITER,
+        'Pemasukan': RUPIAH,
+        'Pengeluaran': RUPIAH,
+        'Utilisasi (%)': "{:.1f}%",
+        'Biaya per Km': RUPIAH,
+        'Pendapatan per Km': RUPIAH,
+        'Liter per Km': "{:,.1f}"
+    }, key="utilisasi_tabel")
+
+def analisis_efisiensi_operasional(df, cube, df_locations=None):
+    st.subheader("⚡ Analisis Efisiensi Operasional")
     
-    # Insight tambahan
-    st.markdown("### 💡 Key Insights")
+    # Pastikan kolom yang diperlukan ada
+    missing_cols = missing_columns(df, 'efisiensi_operasional')
     
-    most_efficient_month = monthly_efficiency.loc[monthly_efficiency['Efisiensi'].idxmax()]
-    least_efficient_month = monthly_efficiency.loc[monthly_efficiency['Efisiensi'].idxmin()]
+    if missing_cols:
+        st.warning(f"Kolom yang diperlukan tidak ditemukan: {missing_cols}")
+        return
     
-    most_efficient_armada = armada_efficiency.iloc[0]
-    least_efficient_armada = armada_efficiency.iloc[-1]
+    result = compute_page('efisiensi_operasional', df, cube)
+    figures = cached_figures(cube, 'efisiensi_operasional', lambda: efisiensi_operasional_figures(result))
     
-    most_efficient_driver = sopir_efficiency.iloc[0]
-    least_efficient_driver = sopir_efficiency.iloc[-1]
+    # Metrik utama efisiensi
+    efisiensi_total = result.efisiensi_total
+    volume_total = result.volume_total
+    profit_margin = result.profit_margin
     
-    insights = [
-        f"📈 Bulan paling efisien: **{most_efficient_month['Bulan']}** (Rp {most_efficient_month['Efisiensi']:.2f}/L)",
-        f"📉 Bulan paling tidak efisien: **{least_efficient_month['Bulan']}** (Rp {least_efficient_month['Efisiensi']:.2f}/L)",
-        f"🏆 Armada paling efisien: **{most_efficient_armada['Plat Nomor']}** (Rp {most_efficient_armada['Efisiensi']:.2f}/L)",
-        f"🚛 Armada paling tidak efisien: **{least_efficient_armada['Plat Nomor']}** (Rp {least_efficient_armada['Efisiensi']:.2f}/L)",
-        f"👨‍🚀 Sopir paling efisien: **{most_efficient_driver['Sopir']}** (Rp {most_efficient_driver['Efisiensi']:.2f}/L)",
-        f"🧑‍💼 Sopir paling tidak efisien: **{least_efficient_driver['Sopir']}** (Rp {least_efficient_driver['Efisiensi']:.2f}/L)"
-    ]
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.markdown(f"""
+        <div class="metric-container">
+            <h4>⚡ Efisiensi Rata-rata</h4>
+            <p class="big-metric">Rp {efisiensi_total:.2f}/L</p>
+        </div>
+        """, unsafe_allow_html=True)
     
-    for insight in insights:
+    with col2:
         st.markdown(f"""
-        <div class="insight-box">
-            {insight}
+        <div class="metric-container">
+            <h4>🚰 Total Volume</h4>
+            <p class="big-metric">{volume_total:,.0f} L</p>
         </div>
         """, unsafe_allow_html=True)
-
-# 7. ANALISIS POLA OPERASIONAL - VISUALISASI BARU 1
-def analisis_pola_operasional(df):
-    st.subheader("📊 Analisis Pola Operasional")
     
-    # Pastikan kolom yang diperlukan ada
-    required_cols = ['Tanggal', 'Volume (L)', 'Pemasukan', 'Pengeluaran']
-    missing_cols = [col for col in required_cols if col not in df.columns]
+    with col3:
+        st.markdown(f"""
+        <div class="metric-container">
+            <h4>📈 Profit Margin</h4>
+            <p class="big-metric">{profit_margin:.1f}%</p>
+        </div>
+        """, unsafe_allow_html=True)
     
-    if missing_cols:
-        st.warning(f"Kolom yang diperlukan tidak ditemukan: {missing_cols}")
-        return
+    # 1. Efisiensi per Bulan
+    st.markdown("### 📅 Efisiensi Operasional per Bulan")
     
-    # Konversi tanggal dan tambahkan kolom
-    df['Tanggal'] = pd.to_datetime(df['Tanggal'])
-    df['Hari_Minggu'] = df['Tanggal'].dt.day_name()
-    df['Quarter'] = df['Tanggal'].dt.quarter
+    st.plotly_chart(figures['monthly'], use_container_width=True)
     
-    # 1. Analisis Hari dalam Minggu
-    st.markdown("### 📅 Pola Operasional per Hari dalam Minggu")
+    # 2. Efisiensi per Armada
+    st.markdown("### 🚚 Efisiensi per Armada")
     
-    daily_pattern = df.groupby('Hari_Minggu').agg({
-        'Volume (L)': ['sum', 'count', 'mean'],
-        'Pemasukan': 'sum',
-        'Pengeluaran': 'sum'
-    }).reset_index()
+    col1, col2 = st.columns(2)
     
-    daily_pattern.columns = ['Hari', 'Total_Volume', 'Jumlah_Order', 'Rata_Volume', 'Total_Pemasukan', 'Total_Pengeluaran']
+    with col1:
+        st.plotly_chart(figures['armada_top'], use_container_width=True)
     
-    # Urutkan hari
-    day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    daily_pattern['Hari'] = pd.Categorical(daily_pattern['Hari'], categories=day_order, ordered=True)
-    daily_pattern = daily_pattern.sort_values('Hari')
+    with col2:
+        st.plotly_chart(figures['armada_scatter'], use_container_width=True)
+    
+    # 3. Efisiensi per Sopir
+    st.markdown("### 👨‍🚀 Efisiensi per Sopir")
     
     col1, col2 = st.columns(2)
     
     with col1:
-        fig = px.bar(
-            daily_pattern,
-            x='Hari',
-            y='Total_Volume',
-            title='Total Volume per Hari dalam Minggu',
-            labels={'Total_Volume': 'Total Volume (L)', 'Hari': 'Hari'},
-            color='Total_Volume',
-            color_continuous_scale='Blues'
-        )
-        fig.update_xaxes(tickangle=45)
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(figures['sopir_top'], use_container_width=True)
     
     with col2:
-        fig = px.bar(
-            daily_pattern,
-            x='Hari',
-            y='Jumlah_Order',
-            title='Jumlah Order per Hari dalam Minggu',
-            labels={'Jumlah_Order': 'Jumlah Order', 'Hari': 'Hari'},
-            color='Jumlah_Order',
-            color_continuous_scale='Oranges'
-        )
-        fig.update_xaxes(tickangle=45)
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(figures['sopir_scatter'], use_container_width=True)
     
-    # 2. Analisis Kuartalan
-    st.markdown("### 📊 Pola Operasional per Kuartal")
+    # 4. Utilisasi dan biaya per km (jarak depot → lokasi Order)
+    utilisasi_armada(df, cube, df_locations)
+    
+    # Insight tambahan
+    st.markdown("### 💡 Key Insights")
     
-    quarterly_pattern = df.groupby('Quarter').agg({
-        'Volume (L)': ['sum', 'count', 'mean'],
-        'Pemasukan': 'sum',
-        'Pengeluaran': 'sum'
-    }).reset_index()
+    # Pasangan (label, Rp/L) bernilai None bila tidak ada baris dengan efisiensi (mis. semua volume 0)
+    insights = [
+        "{} **{}** (Rp {:.2f}/L)".format(label, *pair) if pair is not None else f"{label} tidak tersedia"
+        for label, pair in [
+            ("📈 Bulan paling efisien:", result.best_month),
+            ("📉 Bulan paling tidak efisien:", result.worst_month),
+            ("🏆 Armada paling efisien:", result.best_armada),
+            ("🚛 Armada paling tidak efisien:", result.worst_armada),
+            ("👨‍🚀 Sopir paling efisien:", result.best_sopir),
+            ("🧑‍💼 Sopir paling tidak efisien:", result.worst_sopir)
+        ]
+    ]
     
-    quarterly_pattern.columns = ['Kuartal', 'Total_Volume', 'Jumlah_Order', 'Rata_Volume', 'Total_Pemasukan', 'Total_Pengeluaran']
-    quarterly_pattern['Profit'] = quarterly_pattern['Total_Pemasukan'] - quarterly_pattern['Total_Pengeluaran']
-    quarterly_pattern['Kuartal'] = quarterly_pattern['Kuartal'].apply(lambda x: f'Q{x}')
+    for insight in insights:
+        st.markdown(f"""
+        <div class="insight-box">
+            {insight}
+        </div>
+        """, unsafe_allow_html=True)
+
+# 7. ANALISIS POLA OPERASIONAL - VISUALISASI BARU 1
+def pola_operasional_figures(result):
+    """Plotly figures of the pola operasional page"""
+    figures = {}
+    daily_pattern = result.daily_pattern
+    quarterly_pattern = result.quarterly_pattern
+    
+    fig = px.bar(
+        daily_pattern,
+        x='Hari',
+        y='Total_Volume',
+        title='Total Volume per Hari dalam Minggu',
+        labels={'Total_Volume': 'Total Volume (L)', 'Hari': 'Hari'},
+        color='Total_Volume',
+        color_continuous_scale='Blues'
+    )
+    fig.update_xaxes(tickangle=45)
+    figures['daily_volume'] = fig
+    
+    fig = px.bar(
+        daily_pattern,
+        x='Hari',
+        y='Jumlah_Order',
+        title='Jumlah Order per Hari dalam Minggu',
+        labels={'Jumlah_Order': 'Jumlah Order', 'Hari': 'Hari'},
+        color='Jumlah_Order',
+        color_continuous_scale='Oranges'
+    )
+    fig.update_xaxes(tickangle=45)
+    figures['daily_order'] = fig
     
     fig = make_subplots(
         rows=2, cols=2,
@@ -1198,37 +1494,128 @@ def analisis_pola_operasional(df):
     )
     
     fig.update_layout(height=600, showlegend=False, title_text="Analisis Kuartalan")
-    st.plotly_chart(fig, use_container_width=True)
+    figures['quarterly'] = fig
+    return figures
+
+def analisis_pola_operasional(df, cube):
+    st.subheader("📊 Analisis Pola Operasional")
+    
+    # Pastikan kolom yang diperlukan ada
+    missing_cols = missing_columns(df, 'pola_operasional')
+    
+    if missing_cols:
+        st.warning(f"Kolom yang diperlukan tidak ditemukan: {missing_cols}")
+        return
+    
+    result = compute_page('pola_operasional', df, cube)
+    figures = cached_figures(cube, 'pola_operasional', lambda: pola_operasional_figures(result))
+    
+    # 1. Analisis Hari dalam Minggu
+    st.markdown("### 📅 Pola Operasional per Hari dalam Minggu")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.plotly_chart(figures['daily_volume'], use_container_width=True)
+    
+    with col2:
+        st.plotly_chart(figures['daily_order'], use_container_width=True)
+    
+    # 2. Analisis Kuartalan
+    st.markdown("### 📊 Pola Operasional per Kuartal")
+    
+    st.plotly_chart(figures['quarterly'], use_container_width=True)
 
 # 8. ANALISIS PERFORMA BISNIS - VISUALISASI BARU 2
-def analisis_performa_bisnis(df):
+def performa_bisnis_figures(result):
+    """Plotly figures of the performa bisnis page"""
+    figures = {}
+    sopir_productivity = result.sopir_productivity
+    monthly_profit = result.monthly_profit
+    
+    fig = px.bar(
+        sopir_productivity.head(5),
+        x='Sopir',
+        y='Revenue_per_Trip',
+        title='Top 5 Sopir - Revenue per Trip',
+        labels={'Revenue_per_Trip': 'Revenue per Trip (Rp)', 'Sopir': 'Sopir'},
+        color='Revenue_per_Trip',
+        color_continuous_scale='Blues'
+    )
+    fig.update_xaxes(tickangle=45)
+    figures['sopir_top'] = fig
+    
+    fig = scatter_chart(
+        sopir_productivity,
+        x='Total_Trips',
+        y='Revenue_per_Trip',
+        size='Total_Volume',
+        color='Profit_per_Trip',
+        title='Produktivitas vs Profitabilitas Sopir',
+        hover_name='Sopir',
+        labels={
+            'Total_Trips': 'Total Trips',
+            'Revenue_per_Trip': 'Revenue per Trip (Rp)',
+            'Total_Volume': 'Total Volume (L)',
+            'Profit_per_Trip': 'Profit per Trip (Rp)'
+        }
+    )
+    figures['sopir_scatter'] = fig
+    
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+    
+    fig.add_trace(
+        go.Bar(
+            x=monthly_profit['Bulan'],
+            y=monthly_profit['Profit'],
+            name='Monthly Profit',
+            marker_color='lightgreen'
+        ),
+        secondary_y=False
+    )
+    
+    fig.add_trace(
+        go.Scatter(
+            x=monthly_profit['Bulan'],
+            y=monthly_profit['Profit_Margin'],
+            name='Profit Margin (%)',
+            mode='lines+markers',
+            line=dict(color='red', width=3)
+        ),
+        secondary_y=True
+    )
+    
+    fig.update_layout(
+        title='Trend Profit dan Profit Margin Bulanan',
+        xaxis_title='Bulan'
+    )
+    
+    fig.update_yaxes(title_text="Profit (Rp)", secondary_y=False)
+    fig.update_yaxes(title_text="Profit Margin (%)", secondary_y=True)
+    figures['monthly'] = fig
+    return figures
+
+def analisis_performa_bisnis(df, cube, stored_series=None):
     st.subheader("📈 Analisis Performa Bisnis")
     
     # Pastikan kolom yang diperlukan ada
-    required_cols = ['Tanggal', 'Volume (L)', 'Pemasukan', 'Pengeluaran', 'Sopir', 'Plat Nomor']
-    missing_cols = [col for col in required_cols if col not in df.columns]
+    missing_cols = missing_columns(df, 'performa_bisnis')
     
     if missing_cols:
         st.warning(f"Kolom yang diperlukan tidak ditemukan: {missing_cols}")
         return
     
-    # Konversi tanggal dan tambahkan kolom
-    df['Tanggal'] = pd.to_datetime(df['Tanggal'])
-    df['Bulan'] = df['Tanggal'].dt.to_period('M').astype(str)
-    df['Revenue_per_Liter'] = df['Pemasukan'] / df['Volume (L)']
-    df['Cost_per_Liter'] = df['Pengeluaran'] / df['Volume (L)']
-    df['Profit_per_Liter'] = df['Revenue_per_Liter'] - df['Cost_per_Liter']
-    
     # 1. KPI Dashboard
     st.markdown("### 🎯 Key Performance Indicators (KPI)")
     
-    total_revenue = df['Pemasukan'].sum()
-    total_cost = df['Pengeluaran'].sum()
-    total_profit = total_revenue - total_cost
-    avg_revenue_per_liter = df['Revenue_per_Liter'].mean()
-    growth_rate = ((df.groupby('Bulan')['Pemasukan'].sum().iloc[-1] - 
-                   df.groupby('Bulan')['Pemasukan'].sum().iloc[0]) / 
-                   df.groupby('Bulan')['Pemasukan'].sum().iloc[0] * 100) if len(df.groupby('Bulan')) > 1 else 0
+    result = compute_page('performa_bisnis', df, cube)
+    figures = cached_figures(cube, 'performa_bisnis', lambda: performa_bisnis_figures(result))
+    
+    total_revenue = result.total_revenue
+    total_cost = result.total_cost
+    total_profit = result.total_profit
+    avg_revenue_per_liter = result.avg_revenue_per_liter
+    growth_rate = result.growth_rate
     
     col1, col2, col3, col4, col5 = st.columns(5)
     
@@ -1275,105 +1662,378 @@ def analisis_performa_bisnis(df):
     # 2. Analisis Produktivitas Sopir
     st.markdown("### 👨‍🚀 Produktivitas dan Profitabilitas Sopir")
     
-    sopir_productivity = df.groupby('Sopir').agg({
-        'Pemasukan': 'sum',
-        'Pengeluaran': 'sum',
-        'Volume (L)': 'sum',
-        'Tanggal': 'count'
-    }).reset_index()
-    
-    sopir_productivity.columns = ['Sopir', 'Total_Revenue', 'Total_Cost', 'Total_Volume', 'Total_Trips']
-    sopir_productivity['Revenue_per_Trip'] = sopir_productivity['Total_Revenue'] / sopir_productivity['Total_Trips']
-    sopir_productivity['Volume_per_Trip'] = sopir_productivity['Total_Volume'] / sopir_productivity['Total_Trips']
-    sopir_productivity['Profit_per_Trip'] = (sopir_productivity['Total_Revenue'] - sopir_productivity['Total_Cost']) / sopir_productivity['Total_Trips']
-    
-    sopir_productivity = sopir_productivity.sort_values('Revenue_per_Trip', ascending=False)
-    
     col1, col2 = st.columns(2)
     
     with col1:
-        fig = px.bar(
-            sopir_productivity.head(5),
-            x='Sopir',
-            y='Revenue_per_Trip',
-            title='Top 5 Sopir - Revenue per Trip',
-            labels={'Revenue_per_Trip': 'Revenue per Trip (Rp)', 'Sopir': 'Sopir'},
-            color='Revenue_per_Trip',
-            color_continuous_scale='Blues'
-        )
-        fig.update_xaxes(tickangle=45)
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(figures['sopir_top'], use_container_width=True)
     
     with col2:
-        fig = px.scatter(
-            sopir_productivity,
-            x='Total_Trips',
-            y='Revenue_per_Trip',
-            size='Total_Volume',
-            color='Profit_per_Trip',
-            title='Produktivitas vs Profitabilitas Sopir',
-            hover_name='Sopir',
-            labels={
-                'Total_Trips': 'Total Trips',
-                'Revenue_per_Trip': 'Revenue per Trip (Rp)',
-                'Total_Volume': 'Total Volume (L)',
-                'Profit_per_Trip': 'Profit per Trip (Rp)'
-            }
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(figures['sopir_scatter'], use_container_width=True)
     
     # 3. Trend Profitabilitas Bulanan
     st.markdown("### 📊 Trend Profitabilitas Bulanan")
     
-    monthly_profit = df.groupby('Bulan').agg({
-        'Pemasukan': 'sum',
-        'Pengeluaran': 'sum',
-        'Volume (L)': 'sum'
-    }).reset_index()
+    st.plotly_chart(figures['monthly'], use_container_width=True)
     
-    monthly_profit['Profit'] = monthly_profit['Pemasukan'] - monthly_profit['Pengeluaran']
-    monthly_profit['Profit_Margin'] = (monthly_profit['Profit'] / monthly_profit['Pemasukan']) * 100
-    monthly_profit['Revenue_per_Liter'] = monthly_profit['Pemasukan'] / monthly_profit['Volume (L)']
+    # 4. Tren pemasukan harian dengan rata-rata bergerak 7/30 hari
+    trend_section(df, cube, 'performa_bisnis', ['Pemasukan'], 'Tren Pemasukan', stored_series)
+
+# 9. PERAMALAN PEMASUKAN DAN VOLUME
+def forecast_figure(history, prediction, target, title):
+    """Actual daily values of the fit window followed by the forecast and its interval band"""
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=history['Tanggal'], y=history['Aktual'], mode='lines', name='Aktual'))
+    fig.add_trace(go.Scatter(x=prediction['Tanggal'], y=prediction['Batas Atas'], mode='lines',
+                             line={'width': 0}, showlegend=False, hoverinfo='skip'))
+    fig.add_trace(go.Scatter(x=prediction['Tanggal'], y=prediction['Batas Bawah'], mode='lines',
+                             line={'width': 0}, fill='tonexty', fillcolor='rgba(255, 127, 14, 0.2)',
+                             name=f'Interval ±{INTERVAL_Z}σ'))
+    fig.add_trace(go.Scatter(x=prediction['Tanggal'], y=prediction['Prediksi'], mode='lines',
+                             line={'dash': 'dash'}, name='Prediksi'))
+    fig.update_layout(title=title, xaxis_title='Tanggal', yaxis_title=target, hovermode='x unified')
+    return fig
+
+def analisis_peramalan(df, cube, stored=None):
+    st.subheader("🔮 Peramalan Pemasukan dan Volume")
     
-    fig = make_subplots(specs=[[{"secondary_y": True}]])
+    # Pastikan kolom yang diperlukan ada
+    missing_cols = [col for col in FORECAST_COLUMNS if col not in df.columns]
     
-    fig.add_trace(
-        go.Bar(
-            x=monthly_profit['Bulan'],
-            y=monthly_profit['Profit'],
-            name='Monthly Profit',
-            marker_color='lightgreen'
-        ),
-        secondary_y=False
+    if missing_cols:
+        st.warning(f"Kolom yang diperlukan tidak ditemukan: {missing_cols}")
+        return
+    
+    # Model disimpan per versi data; model dari store dipakai jika mencakup baris yang sama
+    state = cube_forecasts(df, cube, stored)
+    if len(state.models) == 0:
+        st.info("Data bertanggal belum cukup untuk peramalan")
+        return
+    
+    # 1. Pilihan seri
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        target = st.selectbox("📏 Ukuran:", state.targets(), key="peramalan_target")
+    
+    with col2:
+        level = st.selectbox("🧭 Tingkat Seri:", state.levels(), key="peramalan_level")
+    
+    with col3:
+        seri = st.selectbox("🏷️ Seri:", state.series(level, target), key=f"peramalan_seri_{level}")
+    
+    horizon = st.slider("⏩ Horizon Peramalan (hari):", min_value=7, max_value=90, value=HORIZON_DAYS,
+                        key="peramalan_horizon")
+    
+    model = state.model(level, seri, target)
+    prediction = forecast(state, level, seri, target, horizon)
+    fmt = RUPIAH if target == 'Pemasukan' else LITER
+    
+    # 2. Ringkasan prediksi
+    st.markdown("### 🎯 Ringkasan Prediksi")
+    
+    predicted_total = prediction['Prediksi'].sum()
+    predicted_daily = prediction['Prediksi'].mean()
+    recent_daily = model['Rata_Rata_Terakhir']
+    change = (predicted_daily - recent_daily) / recent_daily * 100 if recent_daily > 0 else 0
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.markdown(f"""
+        <div class="metric-container">
+            <h4>🔮 Prediksi {horizon} Hari</h4>
+            <p class="big-metric">{fmt.format(predicted_total)}</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col2:
+        st.markdown(f"""
+        <div class="metric-container">
+            <h4>📅 Prediksi per Hari</h4>
+            <p class="big-metric">{fmt.format(predicted_daily)}</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col3:
+        st.markdown(f"""
+        <div class="metric-container">
+            <h4>📈 Dibanding 30 Hari Terakhir</h4>
+            <p class="big-metric">{change:+.1f}%</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    # 3. Grafik aktual dan prediksi
+    fig = cached_figures(
+        cube, ('peramalan', target, level, seri, horizon),
+        lambda: forecast_figure(state.history(level, seri, target), prediction, target,
+                                f"Peramalan {target} - {seri} ({horizon} hari)")
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption(f"Model: tren linear + efek hari dalam seminggu, di-fit pada data "
+               f"{model['Mulai']:%d-%m-%Y} s/d {model['Akhir']:%d-%m-%Y}")
+    
+    # 4. Prediksi semua seri pada tingkat terpilih
+    st.markdown(f"### 📋 Prediksi per Seri ({level})")
+    
+    summary = forecast_summary(state, level, target, horizon)
+    show_table(summary, {
+        'Prediksi Total': fmt,
+        'Prediksi per Hari': fmt,
+        'Rata-rata Harian Terakhir': fmt,
+        'Perubahan (%)': "{:+.1f}%"
+    }, key="peramalan_ringkasan")
+
+# 10. DETEKSI ANOMALI
+def anomali_figures(flags):
+    """Score timeline of the flagged rows/days and their count per plate"""
+    figures = {}
+    
+    figures['timeline'] = scatter_chart(
+        flags,
+        x='Tanggal',
+        y='Skor',
+        color='Ukuran',
+        hover_data=['Plat Nomor', 'Sopir', 'Order', 'Nilai', 'Acuan'],
+        title='Skor Anomali per Tanggal'
     )
     
-    fig.add_trace(
-        go.Scatter(
-            x=monthly_profit['Bulan'],
-            y=monthly_profit['Profit_Margin'],
-            name='Profit Margin (%)',
-            mode='lines+markers',
-            line=dict(color='red', width=3)
-        ),
-        secondary_y=True
+    per_plate = flags.groupby(['Plat Nomor', 'Ukuran']).size().reset_index(name='Jumlah Anomali')
+    figures['per_plate'] = px.bar(
+        per_plate,
+        x='Plat Nomor',
+        y='Jumlah Anomali',
+        color='Ukuran',
+        title='Jumlah Anomali per Armada'
     )
+    return figures
+
+def analisis_anomali(df, cube, stored=None):
+    st.subheader("🚨 Deteksi Anomali Transaksi dan Pengeluaran")
     
+    # Pastikan kolom yang diperlukan ada
+    missing_cols = [col for col in ANOMALY_COLUMNS if col not in df.columns]
+    
+    if missing_cols:
+        st.warning(f"Kolom yang diperlukan tidak ditemukan: {missing_cols}")
+        return
+    
+    # Statistik berjalan dari store dipakai jika mencakup baris yang sama (histori tidak dipindai ulang)
+    state = cube_anomalies(df, cube, stored)
+    anomalies = state.anomalies()
+    
+    # 1. Ringkasan
+    st.markdown("### 🎯 Ringkasan Anomali")
+    
+    n_transaksi = int((anomalies['Jenis'] == 'Transaksi').sum())
+    n_harian = int((anomalies['Jenis'] == 'Harian').sum())
+    top_plate = anomalies['Plat Nomor'].value_counts()
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.markdown(f"""
+        <div class="metric-container">
+            <h4>🧾 Transaksi Janggal</h4>
+            <p class="big-metric">{n_transaksi:,}</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col2:
+        st.markdown(f"""
+        <div class="metric-container">
+            <h4>📅 Lonjakan Pengeluaran Harian</h4>
+            <p class="big-metric">{n_harian:,}</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col3:
+        st.markdown(f"""
+        <div class="metric-container">
+            <h4>🚚 Armada Paling Sering</h4>
+            <p class="big-metric">{top_plate.index[0] if len(top_plate) else '-'}</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    st.caption(f"Transaksi ditandai jika |robust z-score| (median/MAD per plat, sopir, atau order) > {Z_THRESHOLD}; "
+               f"pengeluaran harian ditandai jika melewati rata-rata EWMA + {EWMA_BAND:g}σ per plat")
+    
+    if len(anomalies) == 0:
+        st.success("✅ Tidak ada anomali yang terdeteksi")
+        return
+    
+    # 2. Grafik anomali
+    jenis = st.radio("Jenis Anomali:", ["Semua", "Transaksi", "Harian"], horizontal=True, key="anomali_jenis")
+    selected = anomalies if jenis == "Semua" else anomalies[anomalies['Jenis'] == jenis]
+    if len(selected) == 0:
+        st.info("Tidak ada anomali untuk jenis ini")
+        return
+    
+    figures = cached_figures(cube, ('anomali', jenis), lambda: anomali_figures(selected))
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.plotly_chart(figures['timeline'], use_container_width=True)
+    
+    with col2:
+        st.plotly_chart(figures['per_plate'], use_container_width=True)
+    
+    # 3. Daftar anomali, skor terbesar lebih dulu
+    st.markdown("### 📋 Daftar Anomali")
+    
+    table = selected.iloc[selected['Skor'].abs().argsort()[::-1]].reset_index(drop=True)
+    show_table(table, {'Nilai': "{:,.2f}", 'Acuan': "{:,.2f}", 'Skor': "{:+.2f}"}, key="anomali_tabel")
+
+# 11. PERENCANAAN RUTE
+def rute_figures(plan, title):
+    """Planned vs actual litres per km per plate and the planned trips on a map"""
+    figures = {}
+    
+    per_plate = plan.per_plate.melt(
+        id_vars='Plat Nomor',
+        value_vars=['L/km Aktual', 'L/km Rencana'],
+        var_name='Jenis',
+        value_name='Liter per Km'
+    )
+    figures['per_plate'] = px.bar(
+        per_plate,
+        x='Plat Nomor',
+        y='Liter per Km',
+        color='Jenis',
+        barmode='group',
+        title='Liter per Km per Armada: Aktual vs Rencana'
+    )
+    
+    fig = px.line_mapbox(
+        plan.paths,
+        lat='Latitude',
+        lon='Longitude',
+        color='Rute',
+        hover_name='Nama Lokasi',
+        hover_data={'Urutan': True, 'Latitude': ':.4f', 'Longitude': ':.4f'},
+        zoom=11,
+        height=600,
+        title=title
+    )
+    fig.update_traces(mode='lines+markers')
     fig.update_layout(
-        title='Trend Profit dan Profit Margin Bulanan',
-        xaxis_title='Bulan'
+        mapbox_style="open-street-map",
+        margin={"r":0,"t":50,"l":0,"b":0}
     )
+    figures['map'] = fig
+    return figures
+
+def perencanaan_rute(df, cube, df_locations):
+    st.subheader("🗺️ Perencanaan Rute Harian")
     
-    fig.update_yaxes(title_text="Profit (Rp)", secondary_y=False)
-    fig.update_yaxes(title_text="Profit Margin (%)", secondary_y=True)
+    # Pastikan kolom yang diperlukan ada
+    missing_cols = [col for col in ROUTING_COLUMNS if col not in df.columns]
     
-    st.plotly_chart(fig, use_container_width=True)
+    if missing_cols:
+        st.warning(f"Kolom yang diperlukan tidak ditemukan: {missing_cols}")
+        return
+    
+    locations = location_dimension(df_locations)
+    if locations is None or not locations.has_coordinates or len(located_ids(locations)) == 0:
+        st.warning("Data lokasi dengan koordinat (Latitude, Longitude) tidak ditemukan")
+        return
+    
+    dates = pd.to_datetime(df['Tanggal'], errors='coerce').dropna()
+    if len(dates) == 0:
+        st.info("Data bertanggal belum tersedia untuk perencanaan rute")
+        return
+    
+    # 1. Pilihan hari dan titik berangkat
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        day = st.date_input("📅 Tanggal:", value=dates.max().date(), min_value=dates.min().date(),
+                            max_value=dates.max().date(), key="rute_tanggal")
+    
+    with col2:
+        base = base_selectbox(locations, key="rute_base")
+    
+    # Rencana disimpan per versi data, tanggal, dan titik berangkat
+    plan = cube_route_plan(df, cube, locations, day, base)
+    if len(plan.routes) == 0:
+        st.info("Tidak ada pengiriman ke lokasi berkoordinat pada tanggal ini")
+        return
+    
+    # 2. Ringkasan
+    st.markdown("### 🎯 Ringkasan Rencana")
+    
+    km_aktual = plan.per_plate['Km Aktual'].sum()
+    km_rencana = plan.per_plate['Km Rencana'].sum()
+    hemat = (km_aktual - km_rencana) / km_aktual * 100 if km_aktual > 0 else 0
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.markdown(f"""
+        <div class="metric-container">
+            <h4>🧭 Jumlah Rute</h4>
+            <p class="big-metric">{len(plan.routes):,}</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col2:
+        st.markdown(f"""
+        <div class="metric-container">
+            <h4>🛣️ Km Aktual</h4>
+            <p class="big-metric">{km_aktual:,.1f} km</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col3:
+        st.markdown(f"""
+        <div class="metric-container">
+            <h4>📐 Km Rencana</h4>
+            <p class="big-metric">{km_rencana:,.1f} km</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col4:
+        st.markdown(f"""
+        <div class="metric-container">
+            <h4>💡 Penghematan Jarak</h4>
+            <p class="big-metric">{hemat:.1f}%</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    st.caption(f"Jarak = jarak garis lurus × {ROAD_FACTOR:g}; km aktual menganggap setiap pengiriman "
+               f"pulang-pergi dari titik berangkat; kapasitas tangki = pengiriman tunggal terbesar per plat")
+    
+    # 3. Grafik per armada dan peta rute
+    figures = cached_figures(
+        cube, ('rute', str(day), base),
+        lambda: rute_figures(plan, f"Rute Rencana {day:%d-%m-%Y}")
+    )
+    
+    st.plotly_chart(figures['per_plate'], use_container_width=True)
+    st.plotly_chart(figures['map'], use_container_width=True)
+    
+    # 4. Tabel rute dan perbandingan per plat
+    st.markdown("### 📋 Daftar Rute")
+    
+    show_table(plan.routes, {'Muatan (L)': LITER, 'Jarak (km)': "{:,.1f}"}, key="rute_tabel")
+    
+    st.markdown("### 🚚 Perbandingan per Armada")
+    
+    show_table(plan.per_plate, {
+        'Volume Aktual (L)': LITER,
+        'Km Aktual': "{:,.1f}",
+        'L/km Aktual': "{:,.1f}",
+        'Volume Rencana (L)': LITER,
+        'Km Rencana': "{:,.1f}",
+        'L/km Rencana': "{:,.1f}"
+    }, key="rute_armada")
 
 # Main dashboard function - DIPERBARUI
 def main():
     st.markdown('<h1 class="main-header">🚛 Dashboard Analisis Truk Air Isi Ulang</h1>', unsafe_allow_html=True)
     
     # Load data CSV
-    sheet2, sheet3 = load_csv_data()
+    sheet2, sheet3, data_version = load_csv_data()
     
     if sheet2 is None or sheet3 is None:
         st.stop()
@@ -1389,7 +2049,10 @@ def main():
         "👨‍🚀 5. Kinerja Sopir",
         "⚡ 6. Efisiensi Operasional",
         "📊 7. Pola Operasional",
-        "📈 8. Performa Bisnis"
+        "📈 8. Performa Bisnis",
+        "🔮 9. Peramalan",
+        "🚨 10. Deteksi Anomali",
+        "🗺️ 11. Perencanaan Rute"
     ]
     
     selected_analysis = st.sidebar.selectbox("Pilih Jenis Analisis:", analysis_options)
@@ -1397,39 +2060,62 @@ def main():
     # Pilihan dataset
     dataset_choice = st.sidebar.selectbox("Pilih Dataset:", ["Sheet 2", "Sheet 3", "Gabungan"])
     
-    if dataset_choice == "Sheet 2":
-        df = sheet2.copy()
-        st.sidebar.success("📄 Dataset: Sheet 2")
-    elif dataset_choice == "Sheet 3":
-        df = sheet3.copy()
-        st.sidebar.success("📄 Dataset: Sheet 3")
-    else:
-        df = pd.concat([sheet2, sheet3], ignore_index=True)
-        st.sidebar.success("📄 Dataset: Gabungan")
+    base_df, df_info = get_base_frame(sheet2, sheet3, dataset_choice, data_version)
+    st.sidebar.success(f"📄 Dataset: {dataset_choice}")
+    
+    # Halaman analisis menerima view copy-on-write, bukan salinan penuh dari base frame
+    df = base_df.copy(deep=False)
     
     # Tampilkan info dataset
     st.sidebar.markdown("### 📋 Info Dataset")
-    st.sidebar.write(f"📊 Jumlah Baris: {len(df):,}")
-    st.sidebar.write(f"📈 Jumlah Kolom: {len(df.columns)}")
-    st.sidebar.write(f"🔍 Missing Values: {df.isnull().sum().sum()}")
+    st.sidebar.write(f"📊 Jumlah Baris: {df_info['rows']:,}")
+    st.sidebar.write(f"📈 Jumlah Kolom: {df_info['columns']}")
+    st.sidebar.write(f"🔍 Missing Values: {df_info['missing']}")
+    
+    # Cube agregasi dibangun sekali per versi dataset dan dipakai semua halaman
+    dataset_key = (dataset_choice, data_version)
+    cube = get_cube(base_df, dataset_key)
+    locations = get_locations(sheet3, data_version)
+    stored_series = get_stored_timeseries(dataset_key)
+    stored_forecasts = get_stored_forecasts(dataset_key)
+    stored_anomalies = get_stored_anomalies(dataset_key)
+    if PRECOMPUTE_ALL_PAGES:
+        warm_pages(base_df, cube, locations, dataset_key)
+    
+    # Filter global: view dan cube terfilter diambil dari indeks, bukan pemindaian penuh
+    filter_index = get_filter_index(base_df, dataset_key)
+    spec = filter_panel(filter_index)
+    if not spec.is_empty():
+        filtered_df, cube = get_filtered_view(base_df, filter_index, cube, dataset_key, spec.key(), spec)
+        st.sidebar.write(f"🔎 Baris setelah filter: {len(filtered_df):,}")
+        if len(filtered_df) == 0:
+            st.warning("⚠️ Tidak ada data yang cocok dengan filter yang dipilih")
+            return
+        df = filtered_df.copy(deep=False)
     
     # Jalankan analisis sesuai pilihan
     if selected_analysis == "💰 1. Transaksi Keuangan":
-        analisis_transaksi_keuangan(df)
+        analisis_transaksi_keuangan(df, cube, stored_series)
     elif selected_analysis == "🚛 2. Rekap Pengiriman Air":
-        rekap_pengiriman_air(df)
+        rekap_pengiriman_air(df, cube, stored_series)
     elif selected_analysis == "📍 3. Demografi Pengiriman":
-        demografi_pengiriman_air(df, sheet3)
+        demografi_pengiriman_air(df, cube, locations)
     elif selected_analysis == "🚚 4. Penggunaan Armada":
-        demografi_penggunaan_armada(df, sheet3)
+        demografi_penggunaan_armada(df, cube, locations)
     elif selected_analysis == "👨‍🚀 5. Kinerja Sopir":
-        analisis_kinerja_sopir(df)
+        analisis_kinerja_sopir(df, cube)
     elif selected_analysis == "⚡ 6. Efisiensi Operasional":
-        analisis_efisiensi_operasional(df)
+        analisis_efisiensi_operasional(df, cube, locations)
     elif selected_analysis == "📊 7. Pola Operasional":
-        analisis_pola_operasional(df)
+        analisis_pola_operasional(df, cube)
     elif selected_analysis == "📈 8. Performa Bisnis":
-        analisis_performa_bisnis(df)
+        analisis_performa_bisnis(df, cube, stored_series)
+    elif selected_analysis == "🔮 9. Peramalan":
+        analisis_peramalan(df, cube, stored_forecasts)
+    elif selected_analysis == "🚨 10. Deteksi Anomali":
+        analisis_anomali(df, cube, stored_anomalies)
+    elif selected_analysis == "🗺️ 11. Perencanaan Rute":
+        perencanaan_rute(df, cube, locations)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,220 @@
+# Engine query opsional (DuckDB/Polars): cube agregasi dihitung lazy langsung dari store parquet,
+# multi-thread dan out-of-core, tanpa memuat seluruh tabel transaksi ke pandas
+import os
+import glob
+import time
+import argparse
+import importlib.util
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from aggregates import CUBE_DIMENSIONS, CUBE_MEASURES, RATIO_MEASURES, DAY_NAMES, build_cube
+from storage import SHEET2_STORE, load_dataset
+
+# Engine dipilih lewat environment variable; default pandas (cube dibangun dari DataFrame)
+ENGINE_ENV = 'DASHBOARD_ENGINE'
+ENGINES = ['pandas', 'duckdb', 'polars']
+
+# Dimensi yang diturunkan dari Tanggal (sama dengan enrich_transactions)
+TIME_DIMENSIONS = ['Bulan', 'Hari_Minggu', 'Quarter']
+
+
+def engine_available(engine):
+    """Whether the optional package behind an engine is installed"""
+    return engine == 'pandas' or importlib.util.find_spec(engine) is not None
+
+
+def configured_engine(engine=None):
+    """Engine from the argument or DASHBOARD_ENGINE, falling back to pandas if it is unknown or not installed"""
+    engine = (engine or os.environ.get(ENGINE_ENV) or 'pandas').strip().lower()
+    if engine not in ENGINES or not engine_available(engine):
+        return 'pandas'
+    return engine
+
+
+def _store_glob(path):
+    # Hanya part data; file pendamping (_cube.parquet, state ingest) diawali '_'
+    return os.path.join(path, 'part-*.parquet')
+
+
+def _store_columns(path):
+    parts = sorted(glob.glob(_store_glob(path)))
+    return set(pq.read_schema(parts[0]).names) if parts else set()
+
+
+def _cube_layout(columns):
+    """Dimensions, measures and ratio flag available for a store (same rules as build_cube)"""
+    dims = [dim for dim in CUBE_DIMENSIONS
+            if dim in columns or (dim in TIME_DIMENSIONS and 'Tanggal' in columns)]
+    measures = [col for col in CUBE_MEASURES if col in columns]
+    with_ratios = all(col in columns for col in CUBE_MEASURES)
+    return dims, measures, with_ratios
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _duckdb_cube(path, dims, measures, with_ratios, has_date):
+    import duckdb
+
+    time_exprs = {
+        'Bulan': "strftime(\"Tanggal\", '%Y-%m')",
+        'Hari_Minggu': 'dayname("Tanggal")',
+        'Quarter': 'quarter("Tanggal")'
+    }
+    select = [f'{time_exprs.get(dim, _quote(dim))} AS {_quote(dim)}' for dim in dims]
+    select += [f'CAST({_quote(col)} AS DOUBLE) AS {_quote(col)}' for col in measures]
+    if with_ratios:
+        volume, pemasukan, pengeluaran = (f'CAST({_quote(col)} AS DOUBLE)' for col in CUBE_MEASURES)
+        ratios = {
+            'Efisiensi': f'({pemasukan} - {pengeluaran}) / {volume}',
+            'Revenue_per_Liter': f'{pemasukan} / {volume}'
+        }
+        # Rasio tak hingga/NaN (volume 0) dianggap missing, sama dengan build_cube
+        select += [f'CASE WHEN isfinite({expr}) THEN {expr} END AS {_quote(name)}'
+                   for name, expr in ratios.items()]
+    if has_date:
+        select.append('"Tanggal"')
+
+    values = measures + (RATIO_MEASURES if with_ratios else [])
+    aggregates = []
+    for col in values:
+        aggregates += [f'COALESCE(SUM({_quote(col)}), 0) AS {_quote(col + "_sum")}',
+                       f'COUNT({_quote(col)}) AS {_quote(col + "_count")}']
+    aggregates.append('COUNT(*) AS "Jumlah_Baris"')
+    if has_date:
+        aggregates.append('COUNT("Tanggal") AS "Tanggal_count"')
+
+    group = ', '.join(_quote(dim) for dim in dims)
+    query = (f"SELECT {', '.join([_quote(dim) for dim in dims] + aggregates)} "
+             f"FROM (SELECT {', '.join(select)} FROM read_parquet('{_store_glob(path)}'))"
+             + (f" GROUP BY {group}" if dims else ""))
+    # Koneksi in-memory sendiri: DuckDB memakai semua core dan spill ke disk jika memori tidak cukup
+    with duckdb.connect() as connection:
+        return connection.sql(query).df()
+
+
+def _polars_cube(path, dims, measures, with_ratios, has_date):
+    import polars as pl
+
+    tanggal = pl.col('Tanggal')
+    time_exprs = {
+        'Bulan': tanggal.dt.strftime('%Y-%m'),
+        'Hari_Minggu': tanggal.dt.strftime('%A'),
+        'Quarter': tanggal.dt.quarter()
+    }
+    columns = [time_exprs[dim].alias(dim) if dim in time_exprs else pl.col(dim).cast(pl.Utf8) for dim in dims]
+    columns += [pl.col(col).cast(pl.Float64) for col in measures]
+    if with_ratios:
+        volume, pemasukan, pengeluaran = (pl.col(col).cast(pl.Float64) for col in CUBE_MEASURES)
+        ratios = {
+            'Efisiensi': (pemasukan - pengeluaran) / volume,
+            'Revenue_per_Liter': pemasukan / volume
+        }
+        # Rasio tak hingga/NaN (volume 0) dianggap missing, sama dengan build_cube
+        columns += [pl.when(expr.is_finite()).then(expr).alias(name) for name, expr in ratios.items()]
+    if has_date:
+        columns.append(tanggal)
+
+    values = measures + (RATIO_MEASURES if with_ratios else [])
+    aggregates = []
+    for col in values:
+        aggregates += [pl.col(col).sum().alias(f'{col}_sum'), pl.col(col).count().alias(f'{col}_count')]
+    aggregates.append(pl.len().alias('Jumlah_Baris'))
+    if has_date:
+        aggregates.append(tanggal.count().alias('Tanggal_count'))
+
+    query = pl.scan_parquet(_store_glob(path)).select(columns)
+    query = query.group_by(dims).agg(aggregates) if dims else query.select(aggregates)
+    # Engine streaming memproses parquet per batch (out-of-core) dengan semua core
+    return query.collect(engine='streaming').to_pandas()
+
+
+def _as_cube(result, dims, has_date):
+    """Give an engine result the dtypes and column order of build_cube"""
+    cube = result.copy()
+    for dim in dims:
+        if dim == 'Quarter':
+            cube[dim] = cube[dim].astype('Int8')
+        elif dim == 'Hari_Minggu':
+            cube[dim] = pd.Categorical(cube[dim], categories=DAY_NAMES)
+        else:
+            cube[dim] = cube[dim].astype('category')
+
+    counts = ['Jumlah_Baris'] + (['Tanggal_count'] if has_date else [])
+    value_cols = [col for col in cube.columns if col.endswith(('_sum', '_count')) and col not in counts]
+    for col in value_cols + counts:
+        cube[col] = cube[col].astype('float64' if col.endswith('_sum') else 'int64')
+    ordered = dims + value_cols + counts
+
+    # Urutan baris engine tidak tetap; diurutkan menurut kunci agar hasil deterministik
+    cube = cube[ordered]
+    if dims:
+        cube = cube.sort_values(dims, key=_sort_key, na_position='last')
+    return cube.reset_index(drop=True)
+
+
+def _sort_key(values):
+    return values.astype(object) if isinstance(values.dtype, pd.CategoricalDtype) else values
+
+
+def build_store_cube(path, engine=None):
+    """Build the aggregate cube of a parquet store with the configured engine
+
+    DuckDB and Polars run the same groupby as build_cube as a lazy query over
+    the store's part files, so the transaction table never has to fit in
+    memory. With the pandas engine the store is loaded and build_cube is used.
+    """
+    engine = configured_engine(engine)
+    if engine == 'pandas':
+        return build_cube(load_dataset(path))
+
+    columns = _store_columns(path)
+    dims, measures, with_ratios = _cube_layout(columns)
+    has_date = 'Tanggal' in columns
+    run = _duckdb_cube if engine == 'duckdb' else _polars_cube
+    return _as_cube(run(path, dims, measures, with_ratios, has_date), dims, has_date)
+
+
+def cubes_match(left, right, rtol=1e-9):
+    """Whether two cubes hold the same groups and values (row order and category order ignored)"""
+    if sorted(left.columns) != sorted(right.columns):
+        return False
+    dims = [dim for dim in CUBE_DIMENSIONS if dim in left.columns]
+
+    def normalized(cube):
+        cube = cube[sorted(cube.columns)].copy()
+        for dim in dims:
+            cube[dim] = cube[dim].astype(object).where(cube[dim].notna(), None)
+        if dims:
+            cube = cube.sort_values(dims, key=lambda values: values.astype(str))
+        return cube.reset_index(drop=True)
+
+    left, right = normalized(left), normalized(right)
+    if len(left) != len(right) or not left[dims].equals(right[dims]):
+        return False
+    values = [col for col in left.columns if col not in dims]
+    return np.allclose(left[values].to_numpy(dtype='float64'), right[values].to_numpy(dtype='float64'),
+                       rtol=rtol, equal_nan=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bangun cube agregasi dari store parquet dengan tiap engine dan cocokkan hasilnya dengan pandas")
+    parser.add_argument('store', nargs='?', default=SHEET2_STORE, help="Folder store parquet transaksi")
+    parser.add_argument('--engines', default=','.join(ENGINES), help="Daftar engine dipisah koma")
+    args = parser.parse_args()
+
+    reference = None
+    for engine in args.engines.split(','):
+        if not engine_available(engine):
+            print(f"⏭️ {engine}: paket tidak terpasang")
+            continue
+        start = time.perf_counter()
+        cube = build_store_cube(args.store, engine)
+        seconds = time.perf_counter() - start
+        if reference is None:
+            reference = cube if engine == 'pandas' else build_store_cube(args.store, 'pandas')
+        status = "cocok" if cubes_match(cube, reference) else "BERBEDA"
+        print(f"{engine}: {len(cube):,} grup, {seconds:.3f} s, {status} dengan pandas")
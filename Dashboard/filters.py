@@ -0,0 +1,129 @@
+# Filter global (rentang tanggal, sopir, plat, order, jenis transaksi) dengan indeks yang dibangun sekali per versi data
+from dataclasses import dataclass
+from typing import Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from aggregates import CUBE_DIMENSIONS
+
+# Dimensi yang bisa difilter (kolom kategori pada tabel fakta) beserta labelnya di sidebar
+FILTER_DIMENSIONS = {
+    'Sopir': "👨‍🚀 Sopir",
+    'Plat Nomor': "🚚 Plat Nomor",
+    'Order': "📍 Order",
+    'Jenis Transaksi': "💳 Jenis Transaksi"
+}
+
+
+@dataclass(frozen=True)
+class FilterSpec:
+    """Selected filters; an empty tuple means the dimension is not filtered"""
+    date_range: Optional[Tuple[pd.Timestamp, pd.Timestamp]] = None
+    sopir: Tuple[str, ...] = ()
+    plat_nomor: Tuple[str, ...] = ()
+    order: Tuple[str, ...] = ()
+    jenis_transaksi: Tuple[str, ...] = ()
+
+    def dimensions(self):
+        """{column: selected values} for the filtered dimensions"""
+        selected = {
+            'Sopir': self.sopir,
+            'Plat Nomor': self.plat_nomor,
+            'Order': self.order,
+            'Jenis Transaksi': self.jenis_transaksi
+        }
+        return {col: values for col, values in selected.items() if values}
+
+    def is_empty(self):
+        return self.date_range is None and not self.dimensions()
+
+    def key(self):
+        """Hashable cache key (None when nothing is filtered)"""
+        if self.is_empty():
+            return None
+        date_key = None if self.date_range is None else tuple(str(d) for d in self.date_range)
+        return (date_key,) + tuple(sorted(self.dimensions().items()))
+
+
+class FilterIndex:
+    """Sorted date index plus categorical codes for fast filtered views of one frame
+
+    Dates are sorted once (argsort, skipped when already sorted), so a date
+    range is two binary searches and a slice. Each dimension keeps its
+    categorical codes; a selection becomes a small lookup table over the
+    categories and the row mask is a single gather over the codes.
+    """
+
+    def __init__(self, df):
+        self.n_rows = len(df)
+        self.date_min = self.date_max = None
+        self._order = None
+        self._dates = None
+        if 'Tanggal' in df.columns:
+            dates = pd.to_datetime(df['Tanggal'], errors='coerce').to_numpy(dtype='datetime64[ns]')
+            valid = ~np.isnat(dates)
+            # Baris tanpa tanggal tidak pernah masuk rentang tanggal
+            if valid.all() and (dates[1:] >= dates[:-1]).all():
+                self._dates = dates
+            else:
+                # NaT diurutkan ke belakang lalu dibuang
+                self._order = np.argsort(dates, kind='stable')[:int(valid.sum())]
+                self._dates = dates[self._order]
+            if len(self._dates) > 0:
+                self.date_min = pd.Timestamp(self._dates[0])
+                self.date_max = pd.Timestamp(self._dates[-1])
+
+        self.codes = {}
+        self.categories = {}
+        for col in FILTER_DIMENSIONS:
+            if col in df.columns:
+                values = df[col] if isinstance(df[col].dtype, pd.CategoricalDtype) else df[col].astype('category')
+                self.codes[col] = values.cat.codes.to_numpy()
+                self.categories[col] = values.cat.categories
+
+    def options(self, col):
+        """Category values of a dimension, for the filter widgets"""
+        return list(self.categories[col]) if col in self.categories else []
+
+    def _date_rows(self, date_range):
+        if date_range is None or self._dates is None:
+            return None
+        start, end = pd.Timestamp(date_range[0]), pd.Timestamp(date_range[1]) + pd.Timedelta(days=1)
+        lo, hi = np.searchsorted(self._dates, [start.to_datetime64(), end.to_datetime64()], side='left')
+        if self._order is None:
+            return np.arange(lo, hi)
+        return np.sort(self._order[lo:hi])
+
+    def rows(self, spec):
+        """Positions of the rows matching spec (in the original row order)"""
+        rows = self._date_rows(spec.date_range)
+        for col, values in spec.dimensions().items():
+            if col not in self.codes:
+                continue
+            # Tabel lookup per kategori: True untuk kategori terpilih, indeks -1 (NaN) selalu False
+            allowed = np.zeros(len(self.categories[col]) + 1, dtype=bool)
+            allowed[self.categories[col].get_indexer(list(values))] = True
+            allowed[-1] = False
+            codes = self.codes[col] if rows is None else self.codes[col][rows]
+            mask = allowed[codes]
+            rows = np.flatnonzero(mask) if rows is None else rows[mask]
+        return np.arange(self.n_rows) if rows is None else rows
+
+    def apply(self, df, spec):
+        """Filtered view of df (the frame this index was built on)"""
+        if spec.is_empty():
+            return df
+        return df.iloc[self.rows(spec)]
+
+
+def filter_cube(cube, spec):
+    """Filter a cube directly when every filtered column is a cube dimension, else None"""
+    if spec.date_range is not None:
+        return None
+    dimensions = spec.dimensions()
+    if any(col not in CUBE_DIMENSIONS or col not in cube.columns for col in dimensions):
+        return None
+    mask = np.ones(len(cube), dtype=bool)
+    for col, values in dimensions.items():
+        mask &= cube[col].isin(values).to_numpy()
+    return cube[mask].reset_index(drop=True)
@@ -0,0 +1,372 @@
+# Peramalan Pemasukan dan Volume per seri (total depot, per plat, per order teratas) dengan model
+# musiman mingguan ringan; model disimpan di store dan hanya seri yang berubah yang di-fit ulang
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+
+from cache import LRUCache
+from timeseries import build_daily, merge_daily
+from storage import SHEET2_STORE, load_dataset, load_forecast, save_forecast, store_exists, store_row_count
+
+# Ukuran yang diramalkan dan kolom yang wajib ada
+FORECAST_TARGETS = ['Pemasukan', 'Volume (L)']
+FORECAST_COLUMNS = ['Tanggal'] + FORECAST_TARGETS
+
+# Tingkat seri → kolom pengelompokan (None: total seluruh depot/store)
+SERIES_LEVELS = {'Total': None, 'Plat Nomor': 'Plat Nomor', 'Order': 'Order'}
+TOTAL_SERIES = 'Total'
+
+# Order yang dimodelkan: yang volumenya terbesar dalam jendela fit
+TOP_ORDERS = 20
+# Model di-fit pada hari-hari terakhir saja (tren linear tidak berlaku untuk histori bertahun-tahun)
+FIT_DAYS = 365
+HORIZON_DAYS = 30
+# Pembanding prediksi: rata-rata harian hari-hari terakhir
+RECENT_DAYS = 30
+# Batas interval prediksi ±1.96σ (≈95%)
+INTERVAL_Z = 1.96
+
+# Koefisien model: konstanta, tren per jendela fit, dan efek hari (Senin sebagai acuan)
+COEFFICIENTS = ['Konstanta', 'Tren', 'Selasa', 'Rabu', 'Kamis', 'Jumat', 'Sabtu', 'Minggu']
+
+# Model per versi data (dibagi antar sesi, jadi pemakai tidak boleh mengubahnya)
+FORECAST_CACHE = LRUCache(maxsize=16)
+
+
+def series_daily(df, targets=FORECAST_TARGETS):
+    """Daily sums of the targets per series (Level, Seri, Tanggal) in long format
+
+    Every series is a timeseries.build_daily frame of its own rows (gap-free
+    from its first to its last day, rows without a date left out), stacked
+    with its Level and Seri.
+    """
+    targets = [col for col in targets if col in df.columns]
+    frames = []
+    if 'Tanggal' in df.columns:
+        for level, col in SERIES_LEVELS.items():
+            if col is None:
+                frames.append(_long_daily(level, TOTAL_SERIES, build_daily(df, targets)))
+            elif col in df.columns:
+                rows = df[['Tanggal', col] + targets]
+                for seri, group in rows.groupby(col, observed=True, sort=False):
+                    frames.append(_long_daily(level, str(seri), build_daily(group, targets)))
+    return _normalized_daily(frames, targets)
+
+
+def _long_daily(level, seri, daily):
+    daily = daily.rename_axis('Tanggal').reset_index()
+    daily.insert(0, 'Seri', seri)
+    daily.insert(0, 'Level', level)
+    return daily
+
+
+def _normalized_daily(frames, targets):
+    columns = ['Level', 'Seri', 'Tanggal'] + targets + ['Jumlah_Baris']
+    frames = [frame for frame in frames if len(frame)]
+    if not frames:
+        empty = {'Level': 'object', 'Seri': 'object', 'Tanggal': 'datetime64[ns]'}
+        return pd.DataFrame({col: pd.Series(dtype=empty.get(col, 'float64')) for col in columns}).astype(
+            {'Jumlah_Baris': 'int64'})
+    daily = pd.concat(frames, ignore_index=True)[columns]
+    return daily.astype({col: 'float64' for col in targets} | {'Jumlah_Baris': 'int64'})
+
+
+def _series_frames(daily):
+    """(Level, Seri) → calendar-day frame of one series, the layout timeseries.merge_daily works on"""
+    return {key: rows.drop(columns=['Level', 'Seri']).set_index('Tanggal')
+            for key, rows in daily.groupby(['Level', 'Seri'], sort=False)}
+
+
+def merge_series_daily(daily, delta):
+    """Add the series daily sums of new rows into the stored ones, series by series with merge_daily"""
+    if len(delta) == 0:
+        return daily
+    if len(daily) == 0:
+        return delta
+    targets = [col for col in daily.columns if col not in ('Level', 'Seri', 'Tanggal', 'Jumlah_Baris')]
+    stored = _series_frames(daily)
+    touched = pd.MultiIndex.from_frame(daily[['Level', 'Seri']]).isin(
+        pd.MultiIndex.from_frame(delta[['Level', 'Seri']]))
+    frames = [daily[~touched]]
+    for (level, seri), rows in _series_frames(delta).items():
+        merged = merge_daily(stored[(level, seri)], rows) if (level, seri) in stored else rows
+        frames.append(_long_daily(level, seri, merged))
+    return _normalized_daily(frames, targets)
+
+
+def _design(days, start, n_days):
+    """Design matrix [1, t/n_days, weekday dummies] for day offsets from start"""
+    weekday = (start.dayofweek + days) % 7
+    X = np.zeros((len(days), len(COEFFICIENTS)))
+    X[:, 0] = 1.0
+    X[:, 1] = days / n_days
+    X[np.arange(len(days))[weekday > 0], 1 + weekday[weekday > 0]] = 1.0
+    return X
+
+
+def _fit_window(daily):
+    """(start, end) of the fit window: the last FIT_DAYS days of the data"""
+    dated = daily['Tanggal'].dropna()
+    if len(dated) == 0:
+        return None, None
+    end = dated.max()
+    return max(end - pd.Timedelta(days=FIT_DAYS - 1), dated.min()), end
+
+
+def _model_keys(window, top_orders):
+    """(Level, Seri) pairs to model: every total/plate series plus the top orders by volume"""
+    keys = window[['Level', 'Seri']].drop_duplicates()
+    orders = window[window['Level'] == 'Order']
+    if len(orders):
+        measure = 'Volume (L)' if 'Volume (L)' in orders.columns else 'Jumlah_Baris'
+        top = orders.groupby('Seri', sort=False)[measure].sum().nlargest(top_orders).index
+        keys = keys[(keys['Level'] != 'Order') | keys['Seri'].isin(top)]
+    return pd.MultiIndex.from_frame(keys)
+
+
+def _empty_models(targets=FORECAST_TARGETS):
+    columns = {'Level': 'object', 'Seri': 'object', 'Target': 'object'}
+    columns |= {col: 'float64' for col in COEFFICIENTS + ['Sigma', 'Rata_Rata_Terakhir']}
+    columns |= {'Mulai': 'datetime64[ns]', 'Akhir': 'datetime64[ns]'}
+    return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in columns.items()})
+
+
+def fit_models(daily, only=None, previous=None, top_orders=TOP_ORDERS):
+    """Fit a weekday-seasonal linear-trend model per (series, target)
+
+    Every series shares the calendar of the fit window, so the design matrix
+    is the same for all of them and one pseudo-inverse fits every series of a
+    target as a single matrix product. With previous models and only (the
+    (Level, Seri) pairs touched by new rows), the other series keep their
+    coefficients as long as the fit window did not move.
+    """
+    targets = [col for col in daily.columns if col not in ('Level', 'Seri', 'Tanggal', 'Jumlah_Baris')]
+    start, end = _fit_window(daily)
+    if start is None:
+        return _empty_models(targets)
+    window = daily[daily['Tanggal'] >= start]
+    keys = _model_keys(window, top_orders)
+
+    reused = None
+    if (previous is not None and only is not None and len(previous)
+            and previous['Mulai'].iloc[0] == start and previous['Akhir'].iloc[0] == end):
+        # Jendela fit sama: seri yang tidak tersentuh baris baru memakai koefisien lamanya
+        previous_keys = pd.MultiIndex.from_frame(previous[['Level', 'Seri']])
+        touched = pd.MultiIndex.from_frame(only[['Level', 'Seri']])
+        keep = previous_keys.isin(keys) & ~previous_keys.isin(touched)
+        reused = previous[keep]
+        keys = keys[~keys.isin(previous_keys[keep])]
+
+    n_days = (end - start).days + 1
+    X = _design(np.arange(n_days), start, n_days)
+    pinv = np.linalg.pinv(X)
+    dof = max(n_days - np.linalg.matrix_rank(X), 1)
+    recent = min(RECENT_DAYS, n_days)
+
+    codes = keys.get_indexer(pd.MultiIndex.from_frame(window[['Level', 'Seri']]))
+    valid = codes >= 0
+    cells = codes[valid] * n_days + (window['Tanggal'] - start).dt.days.to_numpy()[valid]
+
+    frames = [] if reused is None else [reused]
+    for target in targets:
+        # Matriks seri × hari (hari tanpa baris bernilai 0), diisi dengan satu bincount
+        weights = window[target].to_numpy(dtype='float64')[valid]
+        Y = np.bincount(cells, weights=weights, minlength=len(keys) * n_days).reshape(len(keys), n_days)
+        coefficients = Y @ pinv.T
+        residuals = Y - coefficients @ X.T
+        frame = keys.to_frame(index=False)
+        frame['Target'] = target
+        frame[COEFFICIENTS] = coefficients
+        frame['Sigma'] = np.sqrt((residuals ** 2).sum(axis=1) / dof)
+        frame['Rata_Rata_Terakhir'] = Y[:, -recent:].mean(axis=1)
+        frame['Mulai'] = start
+        frame['Akhir'] = end
+        frames.append(frame)
+    models = pd.concat(frames, ignore_index=True) if frames else _empty_models(targets)
+    return models.sort_values(['Level', 'Seri', 'Target'], kind='stable').reset_index(drop=True)
+
+
+@dataclass
+class ForecastState:
+    """Per-series daily sums plus the models fitted on them (what is persisted per store)"""
+    daily: pd.DataFrame
+    models: pd.DataFrame
+    # Jumlah baris transaksi yang membangun state (termasuk baris tanpa tanggal)
+    n_rows: int
+
+    def targets(self):
+        return [col for col in FORECAST_TARGETS if col in set(self.models['Target'])]
+
+    def levels(self):
+        return [level for level in SERIES_LEVELS if level in set(self.models['Level'])]
+
+    def series(self, level, target):
+        """Modelled series of a level, largest recent daily average first"""
+        models = self._models(level, target)
+        return models.sort_values('Rata_Rata_Terakhir', ascending=False, kind='stable')['Seri'].tolist()
+
+    def _models(self, level, target):
+        return self.models[(self.models['Level'] == level) & (self.models['Target'] == target)]
+
+    def history(self, level, seri, target):
+        """Actual daily values of a series over its fit window (days without rows are 0)"""
+        model = self.model(level, seri, target)
+        index = pd.date_range(model['Mulai'], model['Akhir'], freq='D', name='Tanggal')
+        rows = self.daily[(self.daily['Level'] == level) & (self.daily['Seri'] == seri)]
+        values = rows.set_index('Tanggal')[target].reindex(index, fill_value=0.0)
+        return pd.DataFrame({'Tanggal': index, 'Aktual': values.to_numpy()})
+
+    def model(self, level, seri, target):
+        models = self._models(level, target)
+        return models[models['Seri'] == seri].iloc[0]
+
+
+def _predict(models, horizon):
+    """Predictions (series × days) of model rows sharing one fit window, clipped at 0"""
+    start, end = models['Mulai'].iloc[0], models['Akhir'].iloc[0]
+    n_days = (end - start).days + 1
+    days = np.arange(n_days, n_days + horizon)
+    # Tren diskalakan dengan panjang jendela fit, bukan panjang horizon
+    X = _design(days, start, n_days)
+    return np.clip(models[COEFFICIENTS].to_numpy() @ X.T, 0, None), end
+
+
+def forecast(state, level, seri, target, horizon=HORIZON_DAYS):
+    """Daily forecast of one series for the next horizon days with a ±1.96σ band"""
+    model = state.model(level, seri, target)
+    predictions, end = _predict(model.to_frame().T, horizon)
+    prediction = predictions[0]
+    margin = INTERVAL_Z * float(model['Sigma'])
+    return pd.DataFrame({
+        'Tanggal': pd.date_range(end + pd.Timedelta(days=1), periods=horizon, freq='D'),
+        'Prediksi': prediction,
+        'Batas Bawah': np.clip(prediction - margin, 0, None),
+        'Batas Atas': prediction + margin
+    })
+
+
+def forecast_summary(state, level, target, horizon=HORIZON_DAYS):
+    """Forecast totals of every modelled series of a level next to its recent daily average"""
+    models = state._models(level, target)
+    if len(models) == 0:
+        return pd.DataFrame(columns=['Seri', 'Prediksi Total', 'Prediksi per Hari',
+                                     'Rata-rata Harian Terakhir', 'Perubahan (%)'])
+    predictions, _ = _predict(models, horizon)
+    recent = models['Rata_Rata_Terakhir'].to_numpy()
+    per_day = predictions.mean(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change = np.where(recent > 0, (per_day - recent) / recent * 100, np.nan)
+    summary = pd.DataFrame({
+        'Seri': models['Seri'].to_numpy(),
+        'Prediksi Total': predictions.sum(axis=1),
+        'Prediksi per Hari': per_day,
+        'Rata-rata Harian Terakhir': recent,
+        'Perubahan (%)': change
+    })
+    return summary.sort_values('Prediksi Total', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def fit_forecasts(df):
+    """Forecast state of a transaction frame, fitted from scratch"""
+    daily = series_daily(df)
+    return ForecastState(daily, fit_models(daily), len(df))
+
+
+def update_forecasts(state, new_rows):
+    """Fold new rows into a forecast state, refitting only the series they touch
+
+    When the new rows move the fit window (a later last day), every series is
+    refitted; the fit is one matrix product per target, so that stays cheap.
+    """
+    delta = series_daily(new_rows)
+    n_rows = state.n_rows + len(new_rows)
+    if len(delta) == 0:
+        return ForecastState(state.daily, state.models, n_rows)
+    daily = merge_series_daily(state.daily, delta)
+    touched = delta[['Level', 'Seri']].drop_duplicates()
+    return ForecastState(daily, fit_models(daily, only=touched, previous=state.models), n_rows)
+
+
+def save_forecast_state(state, path):
+    save_forecast(state.daily, state.models, state.n_rows, path)
+
+
+def load_forecast_state(path):
+    """Persisted forecast state of a store, or None (also for states saved without a row count)"""
+    tables = load_forecast(path)
+    if tables is None or tables[2] is None:
+        return None
+    return ForecastState(*tables)
+
+
+def cube_forecasts(df, cube, stored=None):
+    """Forecast state of df, built once per data version of a tagged cube
+
+    A stored state (persisted by ingest/pipeline) is reused when it was built
+    from the same number of rows, so the dashboard does not refit at all.
+    """
+    def build():
+        if stored is not None and stored.n_rows == len(df):
+            return stored
+        return fit_forecasts(df)
+
+    tag = cube.attrs.get('cache_version')
+    if tag is None or tag[1] != id(cube):
+        return build()
+    return FORECAST_CACHE.get_or_compute(tag[0], build)
+
+
+def invalidate_forecasts(predicate=None):
+    """Drop cached forecast states whose data version matches predicate (all if None)"""
+    return FORECAST_CACHE.invalidate(predicate)
+
+
+def refresh_store(store_path):
+    """Make sure a store's persisted forecasts cover all its rows; refit from the store if not"""
+    start = time.perf_counter()
+    try:
+        n_rows = store_row_count(store_path)
+        state = load_forecast_state(store_path)
+        status = 'tersimpan'
+        if state is None or state.n_rows != n_rows:
+            state = fit_forecasts(load_dataset(store_path))
+            save_forecast_state(state, store_path)
+            status = 'di-fit'
+        summary = {'status': status, 'rows': n_rows, 'models': len(state.models)}
+    except Exception as e:
+        summary = {'status': 'error', 'error': f"{type(e).__name__}: {e}"}
+    summary.update(store=store_path, seconds=round(time.perf_counter() - start, 2))
+    return summary
+
+
+def refresh_forecasts(stores, workers=None):
+    """Refresh the forecasts of many stores (one per depot) in a process pool"""
+    if workers == 1 or len(stores) < 2:
+        return [refresh_store(store) for store in stores]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(refresh_store, stores))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit/perbarui model peramalan store transaksi (satu store per depot, paralel)")
+    parser.add_argument('stores', nargs='*', default=[SHEET2_STORE], help="Folder store parquet transaksi")
+    parser.add_argument('--workers', type=int, default=None, help="Jumlah proses (default: semua core)")
+    args = parser.parse_args()
+
+    stores = [store for store in args.stores if store_exists(store)]
+    for store in sorted(set(args.stores) - set(stores)):
+        print(f"❌ {store}: store tidak ditemukan")
+    results = refresh_forecasts(stores, args.workers)
+    for result in results:
+        if result['status'] == 'error':
+            print(f"❌ {result['store']}: {result['error']}")
+        else:
+            print(f"✅ {result['store']}: {result['models']} model ({result['status']}, "
+                  f"{result['rows']:,} baris, {result['seconds']} s)")
+
+    # Kode keluar non-nol agar refresh terjadwal bisa mendeteksi kegagalan
+    failed = len(stores) < len(args.stores) or any(result['status'] == 'error' for result in results)
+    raise SystemExit(1 if failed else 0)
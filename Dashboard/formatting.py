@@ -0,0 +1,32 @@
+# Format tampilan tabel: kolom tetap numerik, format Rupiah/liter hanya diterapkan pada halaman yang ditampilkan
+import math
+
+# Format per jenis nilai (str.format); angka aslinya tetap dikirim sehingga urutan/sortir tetap numerik
+RUPIAH = "Rp {:,.0f}"
+LITER = "{:,.0f} L"
+COORDINATE = "{:.5f}"
+
+# Jumlah baris per halaman tabel detail
+PAGE_SIZE = 100
+
+
+def page_count(n_rows, page_size=PAGE_SIZE):
+    """Number of pages needed for n_rows (at least one)"""
+    return max(math.ceil(n_rows / page_size), 1)
+
+
+def page_slice(frame, page, page_size=PAGE_SIZE):
+    """Rows of a 1-based page of frame (positional, so any index works)"""
+    page = min(max(int(page), 1), page_count(len(frame), page_size))
+    start = (page - 1) * page_size
+    return frame.iloc[start:start + page_size]
+
+
+def format_table(frame, formats):
+    """Styler that formats only the given columns of an already sliced frame
+
+    The underlying values keep their numeric dtypes; only the displayed text
+    is formatted, and only for the rows of the current page.
+    """
+    formats = {col: fmt for col, fmt in formats.items() if col in frame.columns}
+    return frame.style.format(formats, na_rep='-')
@@ -0,0 +1,177 @@
+# Data spasial: indeks grid untuk clustering peta per tingkat zoom dan dimensi ID lokasi (Sheet 3)
+import numpy as np
+import pandas as pd
+
+from cache import LRUCache
+
+# Ukuran tile peta (piksel) dan radius cluster di layar
+TILE_SIZE = 256
+CLUSTER_RADIUS_PX = 60
+
+# Di bawah jumlah titik ini peta tetap menampilkan setiap titik tanpa clustering
+CLUSTER_MIN_POINTS = 500
+
+MIN_ZOOM = 3
+MAX_ZOOM = 16
+
+# Perkiraan ukuran viewport peta (piksel); cluster di luar viewport x padding tidak dikirim
+VIEWPORT_PX = (1200, 600)
+VIEWPORT_PADDING = 2.0
+
+
+def to_world(lat, lon):
+    """Web-mercator world coordinates in [0, 1) for latitude/longitude arrays"""
+    lat = np.clip(np.asarray(lat, dtype='float64'), -85.0511, 85.0511)
+    x = (np.asarray(lon, dtype='float64') + 180.0) / 360.0
+    sin_lat = np.sin(np.radians(lat))
+    y = 0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * np.pi)
+    return x, y
+
+
+def to_latlon(x, y):
+    """Inverse of to_world"""
+    lon = np.asarray(x) * 360.0 - 180.0
+    lat = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * np.asarray(y)))))
+    return lat, lon
+
+
+class GridIndex:
+    """Grid index over point rows with clusters cached per zoom level
+
+    Every zoom level buckets the points into square web-mercator cells of
+    about CLUSTER_RADIUS_PX screen pixels, so building a level is one
+    vectorised groupby and later lookups only slice the cached clusters.
+    """
+
+    def __init__(self, frame, weights, label, group=None, lat='Latitude', lon='Longitude'):
+        self.frame = frame.reset_index(drop=True)
+        self.weights = list(weights)
+        self.label = label
+        self.group = group
+        self._x, self._y = to_world(self.frame[lat], self.frame[lon])
+        self._group_codes = None
+        if group is not None:
+            self._group_codes, self._group_values = pd.factorize(self.frame[group], sort=True)
+        self._levels = {}
+
+    def __len__(self):
+        return len(self.frame)
+
+    def center(self):
+        """Centroid (lat, lon) of all points"""
+        lat, lon = to_latlon(self._x.mean(), self._y.mean())
+        return float(lat), float(lon)
+
+    def clusters(self, zoom):
+        """Clusters at a zoom level: centroid, point count, weight sums and a label"""
+        zoom = int(min(max(zoom, 0), MAX_ZOOM))
+        if zoom not in self._levels:
+            self._levels[zoom] = self._build_level(zoom)
+        return self._levels[zoom]
+
+    def _build_level(self, zoom):
+        cells_per_axis = max(int(TILE_SIZE * 2 ** zoom / CLUSTER_RADIUS_PX), 1)
+        gx = np.minimum((self._x * cells_per_axis).astype('int64'), cells_per_axis - 1)
+        gy = np.minimum((self._y * cells_per_axis).astype('int64'), cells_per_axis - 1)
+        key = gx * cells_per_axis + gy
+        if self._group_codes is not None:
+            key = key * (len(self._group_values) + 1) + self._group_codes
+
+        cell_codes, cell = np.unique(key, return_inverse=True)
+        counts = np.bincount(cell)
+        x = np.bincount(cell, weights=self._x) / counts
+        y = np.bincount(cell, weights=self._y) / counts
+        lat, lon = to_latlon(x, y)
+
+        clusters = pd.DataFrame({'Latitude': lat, 'Longitude': lon, 'Jumlah Titik': counts})
+        for col in self.weights:
+            clusters[col] = np.bincount(cell, weights=self.frame[col].to_numpy(dtype='float64'))
+
+        # Label cluster: nama titik jika hanya satu, selain itu jumlah titiknya
+        first = np.full(len(cell_codes), len(cell))
+        np.minimum.at(first, cell, np.arange(len(cell)))
+        names = self.frame[self.label].to_numpy()[first].astype(str)
+        clusters[self.label] = np.where(counts == 1, names, pd.Series(counts).map(lambda n: f"{n:,} lokasi").to_numpy())
+        if self._group_codes is not None:
+            clusters[self.group] = self.frame[self.group].to_numpy()[first]
+
+        # Diurutkan menurut x agar potongan viewport cukup dengan binary search
+        clusters['_x'], clusters['_y'] = x, y
+        return clusters.sort_values('_x', kind='stable').reset_index(drop=True)
+
+    def visible(self, zoom, center=None, viewport=VIEWPORT_PX, padding=VIEWPORT_PADDING):
+        """Clusters of a zoom level inside the (padded) viewport around center"""
+        clusters = self.clusters(zoom)
+        lat, lon = center if center is not None else self.center()
+        cx, cy = to_world(lat, lon)
+        scale = TILE_SIZE * 2 ** int(min(max(zoom, 0), MAX_ZOOM))
+        half_w = viewport[0] * padding / 2 / scale
+        half_h = viewport[1] * padding / 2 / scale
+
+        x = clusters['_x'].to_numpy()
+        start, end = np.searchsorted(x, [cx - half_w, cx + half_w], side='left')
+        window = clusters.iloc[start:end]
+        window = window[(window['_y'] >= cy - half_h) & (window['_y'] <= cy + half_h)]
+        return window.drop(columns=['_x', '_y'])
+
+
+def build_index(frame, weights, label, group=None, min_points=CLUSTER_MIN_POINTS):
+    """GridIndex over frame, or None when there are too few points to need clustering"""
+    if frame is None or len(frame) < min_points:
+        return None
+    return GridIndex(frame, weights, label, group)
+
+
+class LocationDimension:
+    """Integer location-ID dimension resolved once from the location table (Sheet 3)
+
+    A location's ID is its row position in the table. Categorical keys on the
+    fact table are mapped to IDs once per category set, so coordinates come
+    from an array lookup by code instead of a string join. ID -1 means the
+    location is unknown and maps to NaN coordinates.
+    """
+
+    def __init__(self, df_locations, name='Nama Lokasi'):
+        # Nama lokasi ganda: baris pertama yang dipakai
+        table = df_locations.drop_duplicates(name, keep='first')
+        self.names = pd.Index(table[name])
+        self.has_coordinates = 'Latitude' in table.columns and 'Longitude' in table.columns
+        self._coordinates = None
+        if self.has_coordinates:
+            # Baris terakhir berisi NaN sehingga ID -1 langsung menunjuk koordinat kosong
+            coordinates = table[['Latitude', 'Longitude']].to_numpy(dtype='float64')
+            self._coordinates = np.vstack([coordinates, [np.nan, np.nan]])
+        self._category_ids = LRUCache(maxsize=16)
+
+    def __len__(self):
+        return len(self.names)
+
+    def category_ids(self, categories):
+        """Location ID of every category (resolved once per category Index object)"""
+        cached = self._category_ids.get(id(categories))
+        if cached is None or cached[0] is not categories:
+            cached = (categories, self.names.get_indexer(categories))
+            self._category_ids.put(id(categories), cached)
+        return cached[1]
+
+    def ids(self, keys):
+        """Location IDs for a key Series (categorical codes or plain names)"""
+        if isinstance(keys.dtype, pd.CategoricalDtype):
+            # Kode -1 (NaN) jatuh ke elemen terakhir, yaitu ID -1
+            ids = np.append(self.category_ids(keys.cat.categories), -1)
+            return ids[keys.cat.codes.to_numpy()]
+        return self.names.get_indexer(keys)
+
+    def coordinates(self, keys):
+        """Latitude and Longitude arrays for a key Series"""
+        coordinates = self._coordinates[self.ids(keys)]
+        return coordinates[:, 0], coordinates[:, 1]
+
+
+def location_dimension(df_locations):
+    """LocationDimension for a location table (passed through if already built), or None"""
+    if df_locations is None or isinstance(df_locations, LocationDimension):
+        return df_locations
+    if 'Nama Lokasi' not in df_locations.columns:
+        return None
+    return LocationDimension(df_locations)
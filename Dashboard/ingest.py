@@ -0,0 +1,257 @@
+# Ingest inkremental: baris transaksi baru dibersihkan dan diimputasi memakai
+# statistik yang tersimpan, lalu ditambahkan ke store dan cube tanpa memproses ulang histori
+import os
+import json
+import argparse
+import pandas as pd
+import numpy as np
+
+from aggregates import build_cube, merge_cubes
+from anomaly import detect_anomalies, detect_rows, load_anomaly_state, save_anomaly_state
+from forecast import fit_forecasts, load_forecast_state, save_forecast_state, update_forecasts
+from timeseries import build_timeseries, load_timeseries, save_timeseries
+from preprocessing import IMPUTE_EXCLUDE_COLUMNS, clean_unknown_values, impute_from_reference
+from storage import (
+    SHEET2_SCHEMA, SHEET2_STORE,
+    apply_schema, append_dataset, load_cube, load_dataset, save_cube, store_exists
+)
+
+STATE_FILE = '_ingest_state.json'
+REFERENCE_FILE = '_knn_reference.parquet'
+
+# Jumlah baris lengkap terakhir per partisi (Jenis Transaksi, Order) yang disimpan sebagai referensi KNN
+KNN_REFERENCE_PER_PARTITION = 1000
+REFERENCE_PARTITION = ['Jenis Transaksi', 'Order']
+KNN_NEIGHBORS = 5
+
+
+def _categorical_columns(schema):
+    return [col for col, dtype in schema.items() if dtype == 'category']
+
+
+def _feature_columns(schema):
+    """Numeric columns used as KNN features (row markers such as No are excluded)"""
+    return [col for col, dtype in schema.items()
+            if dtype.startswith(('int', 'float')) and col not in IMPUTE_EXCLUDE_COLUMNS]
+
+
+def _reference_columns(schema):
+    return _feature_columns(schema) + REFERENCE_PARTITION + ['Tanggal']
+
+
+def _mode_from_counts(counts):
+    """Mode of a {value: count} mapping, ties resolved like Series.mode()[0]"""
+    if not counts:
+        return None
+    top = max(counts.values())
+    return sorted(value for value, count in counts.items() if count == top)[0]
+
+
+def new_ingest_state(columns):
+    """Empty ingest statistics for a store with the given columns"""
+    return {'columns': list(columns), 'value_counts': {}, 'last_date': None, 'last_no': None}
+
+
+def add_value_counts(state, df_clean, schema=SHEET2_SCHEMA):
+    """Add the category counts of cleaned (not yet imputed) rows to the state"""
+    for col in _categorical_columns(schema):
+        if col in df_clean.columns:
+            counts = state['value_counts'].setdefault(col, {})
+            for value, count in df_clean[col].dropna().astype(str).value_counts().items():
+                counts[value] = counts.get(value, 0) + int(count)
+
+
+def add_reference_rows(reference, df_clean, schema=SHEET2_SCHEMA):
+    """Append the complete rows of df_clean to the KNN reference, bounded per partition"""
+    columns = [col for col in _reference_columns(schema) if col in df_clean.columns]
+    features = [col for col in _feature_columns(schema) if col in df_clean.columns]
+    rows = df_clean[columns].copy()
+    rows[features] = rows[features].apply(pd.to_numeric, errors='coerce').astype('float64')
+    for col in REFERENCE_PARTITION:
+        if col in rows.columns:
+            rows[col] = rows[col].astype(object)
+    if 'Tanggal' in rows.columns:
+        rows['Tanggal'] = pd.to_datetime(rows['Tanggal'], errors='coerce')
+    rows = rows.dropna(subset=features)
+
+    if reference is not None and len(reference) > 0:
+        rows = pd.concat([reference, rows], ignore_index=True)
+    keys = [col for col in REFERENCE_PARTITION if col in rows.columns]
+    if keys:
+        rows = rows.groupby(keys, dropna=False, sort=False).tail(KNN_REFERENCE_PER_PARTITION)
+    return rows.reset_index(drop=True)
+
+
+def fill_reference_modes(state, reference):
+    """Fill missing partition keys of the reference with the category modes, as smart_imputation does"""
+    for col in REFERENCE_PARTITION:
+        mode_value = _mode_from_counts(state['value_counts'].get(col, {}))
+        if col in reference.columns and mode_value is not None:
+            reference[col] = reference[col].fillna(mode_value)
+    return reference
+
+
+def advance_position(state, df_final):
+    """Remember the last date and row number so the next rows continue from them"""
+    if 'Tanggal' in df_final.columns:
+        tanggal = pd.to_datetime(df_final['Tanggal'], errors='coerce').dropna()
+        if len(tanggal) > 0:
+            state['last_date'] = tanggal.iloc[-1].isoformat()
+    if 'No' in df_final.columns and df_final['No'].notna().any():
+        state['last_no'] = max(state['last_no'] or 0, int(df_final['No'].max()))
+
+
+def build_ingest_state(df_clean, df_final, schema=SHEET2_SCHEMA):
+    """Build the stored statistics from a full preprocessing run
+
+    df_clean is the frame after sentinel cleaning (before imputation) and is
+    used for the category counts and KNN reference; df_final is the imputed,
+    date-filled frame.
+    """
+    state = new_ingest_state(col for col in schema if col in df_final.columns)
+    add_value_counts(state, df_clean, schema)
+    reference = fill_reference_modes(state, add_reference_rows(None, df_clean, schema))
+    advance_position(state, df_final)
+    return state, reference
+
+
+def save_ingest_state(state, reference, store_path=SHEET2_STORE):
+    """Write the ingest statistics and KNN reference set into the store"""
+    with open(os.path.join(store_path, STATE_FILE), 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    reference.to_parquet(os.path.join(store_path, REFERENCE_FILE), index=False)
+
+
+def load_ingest_state(store_path=SHEET2_STORE):
+    """Load the ingest statistics, bootstrapping them from the store if missing"""
+    state_path = os.path.join(store_path, STATE_FILE)
+    reference_path = os.path.join(store_path, REFERENCE_FILE)
+
+    if os.path.exists(state_path) and os.path.exists(reference_path):
+        with open(state_path, encoding='utf-8') as f:
+            state = json.load(f)
+        return state, pd.read_parquet(reference_path)
+
+    # Bootstrap dari store yang sudah bersih (tanpa data sebelum imputasi); disimpan oleh ingest_rows
+    df = load_dataset(store_path)
+    return build_ingest_state(df, df)
+
+
+def clean_new_rows(new_rows, state, reference, schema=SHEET2_SCHEMA, counted=False):
+    """Clean and impute only the new rows against the stored statistics
+
+    counted=True means the category counts of these rows are already in the
+    state (streaming pipeline), so they are not added a second time for the mode.
+    """
+    # 1. Nilai UNKNOWN/NULL/'-' menjadi NaN
+    df = clean_unknown_values(new_rows)
+
+    # 2. Samakan kolom dengan store (menggantikan remove_unnamed_columns)
+    df = df.reindex(columns=state['columns'])
+    df_clean = df.copy()
+
+    # 3. Kolom kategorikal diisi mode historis (+ baris baru)
+    for col, counts in state['value_counts'].items():
+        if col in df.columns and df[col].isnull().any():
+            merged_counts = dict(counts)
+            if not counted:
+                for value, count in df[col].dropna().astype(str).value_counts().items():
+                    merged_counts[value] = merged_counts.get(value, 0) + int(count)
+            mode_value = _mode_from_counts(merged_counts)
+            if mode_value is not None:
+                df[col] = df[col].fillna(mode_value)
+
+    # 4. Nomor baris dilanjutkan dari nomor terakhir di store
+    if 'No' in df.columns and df['No'].isnull().any():
+        start = (state['last_no'] or 0) + 1
+        df['No'] = df['No'].fillna(pd.Series(np.arange(start, start + len(df)), index=df.index))
+
+    # 5. Kolom numerik diimputasi KNN per partisi terhadap set referensi tersimpan
+    features = [col for col in _feature_columns(schema) if col in df.columns]
+    df[features] = df[features].apply(pd.to_numeric, errors='coerce')
+    df[features] = impute_from_reference(df, reference, features, n_neighbors=KNN_NEIGHBORS)
+
+    # 6. Tanggal: forward fill, diawali tanggal terakhir yang diketahui
+    if 'Tanggal' in df.columns:
+        tanggal = pd.to_datetime(df['Tanggal'], errors='coerce').fillna(method='ffill')
+        if state['last_date'] is not None:
+            tanggal = tanggal.fillna(pd.Timestamp(state['last_date']))
+        df['Tanggal'] = tanggal.fillna(method='bfill')
+
+    return apply_schema(df, schema), df_clean
+
+
+def update_ingest_state(state, reference, df_clean, df_final):
+    """Fold the new rows into the stored statistics (delta update)"""
+    add_value_counts(state, df_clean)
+    reference = fill_reference_modes(state, add_reference_rows(reference, df_clean))
+    advance_position(state, df_final)
+    return state, reference
+
+
+def ingest_rows(new_rows, store_path=SHEET2_STORE):
+    """Clean, append and roll up new transaction rows; cost scales with the new rows only
+
+    Every sidecar is updated in memory first; the new part and the sidecars
+    are written only after all of them succeeded, so a failure leaves the
+    store untouched and the same file can simply be ingested again.
+    """
+    if not store_exists(store_path):
+        raise FileNotFoundError(f"Store tidak ditemukan: {store_path}")
+
+    state, reference = load_ingest_state(store_path)
+    df_final, df_clean = clean_new_rows(new_rows, state, reference)
+
+    cube = load_cube(store_path)
+    series = load_timeseries(store_path)
+    forecasts = load_forecast_state(store_path)
+    anomalies = load_anomaly_state(store_path)
+
+    # Sidecar yang belum ada dibangun sekali dari histori + baris baru (part baru belum ditulis)
+    df_full = None
+    if any(sidecar is None for sidecar in [cube, series, forecasts, anomalies]):
+        df_full = apply_schema(pd.concat([load_dataset(store_path), df_final], ignore_index=True), SHEET2_SCHEMA)
+
+    # Cube diperbarui dengan delta dari baris baru saja
+    cube = build_cube(df_full) if cube is None else merge_cubes(cube, build_cube(df_final))
+
+    # Deret tren harian: baris baru dilipat lewat append (prefix sum dan jendela rolling dari hari pertama yang berubah)
+    series = build_timeseries(df_full) if series is None else series.append(df_final)
+
+    # Model peramalan: hanya seri yang tersentuh baris baru yang di-fit ulang
+    forecasts = fit_forecasts(df_full) if forecasts is None else update_forecasts(forecasts, df_final)
+
+    # Deteksi anomali: baris baru dinilai dengan statistik berjalan yang tersimpan
+    anomalies = detect_anomalies(df_full) if anomalies is None else detect_rows(anomalies, df_final)
+
+    state, reference = update_ingest_state(state, reference, df_clean, df_final)
+
+    # Baru ditulis setelah semua tahap berhasil; state ingest (posisi No/tanggal) paling akhir
+    part_path = append_dataset(df_final, store_path)
+    save_cube(cube, store_path)
+    save_timeseries(series, store_path)
+    save_forecast_state(forecasts, store_path)
+    save_anomaly_state(anomalies, store_path)
+    save_ingest_state(state, reference, store_path)
+
+    return df_final, part_path
+
+
+def read_new_rows(path, sheet_name=None):
+    """Read new raw transaction rows from CSV or Excel"""
+    if path.lower().endswith(('.xlsx', '.xls')):
+        return pd.read_excel(path, sheet_name=sheet_name or 0)
+    return pd.read_csv(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest baris transaksi baru ke store Sheet 2")
+    parser.add_argument('files', nargs='+', help="File CSV/Excel berisi baris transaksi baru")
+    parser.add_argument('--store', default=SHEET2_STORE, help="Folder store parquet Sheet 2")
+    parser.add_argument('--sheet', default=None, help="Nama sheet jika input berupa Excel")
+    args = parser.parse_args()
+
+    for file_path in args.files:
+        new_rows = read_new_rows(file_path, args.sheet)
+        df_final, part_path = ingest_rows(new_rows, args.store)
+        print(f"✅ {file_path}: {len(df_final)} baris ditambahkan ke {part_path}")
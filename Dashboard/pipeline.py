@@ -0,0 +1,217 @@
+# Pipeline preprocessing streaming: sheet transaksi diproses per chunk dengan memori terbatas
+# dan hasilnya langsung ditulis ke store parquet (part demi part)
+import os
+import io
+import time
+import argparse
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from openpyxl import load_workbook
+
+from aggregates import build_cube, merge_cubes
+from anomaly import detect_rows, new_anomaly_state, save_anomaly_state
+from timeseries import build_timeseries, save_timeseries
+from forecast import ForecastState, fit_models, merge_series_daily, save_forecast_state, series_daily
+from ingest import (
+    add_reference_rows, add_value_counts, advance_position, clean_new_rows,
+    fill_reference_modes, new_ingest_state, save_ingest_state
+)
+from preprocessing import preprocess_locations, scan_unknown_values
+from storage import (
+    SHEET2_SCHEMA, SHEET3_SCHEMA, SHEET2_STORE, SHEET3_STORE,
+    append_dataset, clear_store, save_cube, save_dataset
+)
+
+# Jumlah baris per chunk
+CHUNK_SIZE = 50000
+
+# Nama sheet transaksi dan lokasi pada workbook mentah
+TRANSACTION_SHEET = 'Dataset Keuangan Truk Air Isi U'
+LOCATION_SHEET = 'lokasi'
+
+# Folder hasil default (sama dengan lokasi store yang dibaca dashboard)
+OUTPUT_DIR = os.path.dirname(SHEET2_STORE)
+
+
+def iter_sheet_chunks(path, sheet_name=TRANSACTION_SHEET, chunksize=CHUNK_SIZE):
+    """Yield a raw sheet (Excel or CSV) as DataFrames of at most chunksize rows"""
+    if not path.lower().endswith(('.xlsx', '.xlsm')):
+        yield from pd.read_csv(path, chunksize=chunksize)
+        return
+
+    # Mode read_only membaca baris secara streaming tanpa memuat seluruh workbook
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name] if sheet_name in workbook.sheetnames else workbook.worksheets[1]
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [name if name is not None else f'Unnamed: {i}' for i, name in enumerate(header)]
+
+        batch = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            batch.append(row)
+            if len(batch) == chunksize:
+                yield pd.DataFrame(batch, columns=columns)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=columns)
+    finally:
+        workbook.close()
+
+
+def _merge_missing_info(total, missing_info):
+    for col, info in missing_info.items():
+        merged = total.setdefault(col, {'null_count': 0, 'unknown_count': 0, 'rows': 0})
+        merged['null_count'] += info['null_count']
+        merged['unknown_count'] += info['unknown_count']
+        merged['rows'] += info['rows']
+
+
+def collect_stream_state(chunks, schema=SHEET2_SCHEMA):
+    """First pass: global category counts, KNN reference and missing-value report"""
+    state = new_ingest_state([])
+    reference = None
+    missing_total = {}
+    non_null = {}
+
+    for chunk in chunks:
+        df_clean, missing_info = scan_unknown_values(chunk)
+        for col, info in missing_info.items():
+            info['rows'] = len(chunk)
+            non_null[col] = non_null.get(col, 0) + len(chunk) - info['null_count'] - info['unknown_count']
+        _merge_missing_info(missing_total, missing_info)
+
+        add_value_counts(state, df_clean, schema)
+        reference = add_reference_rows(reference, df_clean, schema)
+
+    if reference is None:
+        raise ValueError("Sheet transaksi tidak berisi baris data")
+
+    # Kolom unnamed dan kolom yang kosong seluruhnya dibuang, seperti remove_unnamed_columns
+    state['columns'] = [col for col in missing_total
+                        if not str(col).startswith('Unnamed') and non_null[col] > 0]
+
+    for col, info in missing_total.items():
+        info['total_missing'] = info['null_count'] + info['unknown_count']
+        info['percentage'] = (info['total_missing'] / info['rows']) * 100 if info['rows'] > 0 else 0.0
+        del info['rows']
+
+    return state, fill_reference_modes(state, reference), missing_total
+
+
+def preprocess_stream(path, store_path=SHEET2_STORE, sheet_name=TRANSACTION_SHEET,
+                      chunksize=CHUNK_SIZE, schema=SHEET2_SCHEMA):
+    """Clean, impute and write the transaction sheet chunk by chunk
+
+    The sheet is read twice: the first pass collects the global statistics
+    (modes, KNN reference, missing report), the second cleans every chunk with
+    them and appends it to the store. Only one chunk is in memory at a time.
+    """
+    state, reference, missing_info = collect_stream_state(
+        iter_sheet_chunks(path, sheet_name, chunksize), schema
+    )
+
+    clear_store(store_path)
+    cube = series = daily = None
+    anomalies = new_anomaly_state()
+    total_rows = 0
+    for chunk in iter_sheet_chunks(path, sheet_name, chunksize):
+        df_final, _ = clean_new_rows(chunk, state, reference, schema, counted=True)
+        append_dataset(df_final, store_path)
+        delta = build_cube(df_final)
+        cube = delta if cube is None else merge_cubes(cube, delta)
+        series = build_timeseries(df_final) if series is None else series.append(df_final)
+        delta = series_daily(df_final)
+        daily = delta if daily is None else merge_series_daily(daily, delta)
+        anomalies = detect_rows(anomalies, df_final)
+        advance_position(state, df_final)
+        total_rows += len(df_final)
+
+    # Cube, deret tren, model peramalan, statistik anomali, dan statistik ingest ikut disimpan agar ingest.py bisa melanjutkan store ini
+    save_cube(cube, store_path)
+    save_timeseries(series, store_path)
+    save_forecast_state(ForecastState(daily, fit_models(daily), total_rows), store_path)
+    save_anomaly_state(anomalies, store_path)
+    save_ingest_state(state, reference, store_path)
+
+    return {'rows': total_rows, 'store': store_path, 'missing_info': missing_info}
+
+
+def preprocess_location_sheet(path, store_path=SHEET3_STORE, sheet_name=LOCATION_SHEET):
+    """Clean the (small) location sheet in memory and write it as a fresh store"""
+    excel_file = pd.ExcelFile(path)
+    if sheet_name not in excel_file.sheet_names:
+        sheet_name = excel_file.sheet_names[2]
+    df = pd.read_excel(excel_file, sheet_name=sheet_name)
+
+    # Fungsi preprocessing mencetak log untuk notebook; di batch cukup ringkasannya
+    with contextlib.redirect_stdout(io.StringIO()):
+        df_final = preprocess_locations(df)
+    save_dataset(df_final, store_path, SHEET3_SCHEMA)
+    return {'rows': len(df_final), 'store': store_path}
+
+
+def plan_tasks(workbooks, output_dir=OUTPUT_DIR, chunksize=CHUNK_SIZE):
+    """One task per (workbook, sheet); several workbooks get a subfolder each"""
+    tasks = []
+    for path in workbooks:
+        target = output_dir
+        if len(workbooks) > 1:
+            target = os.path.join(output_dir, os.path.splitext(os.path.basename(path))[0])
+        tasks.append({'workbook': path, 'sheet': 'transaksi', 'chunksize': chunksize,
+                      'store': os.path.join(target, os.path.basename(SHEET2_STORE))})
+        if not path.lower().endswith('.csv'):
+            tasks.append({'workbook': path, 'sheet': 'lokasi',
+                          'store': os.path.join(target, os.path.basename(SHEET3_STORE))})
+    return tasks
+
+
+def run_task(task):
+    """Process one sheet of one workbook; errors are returned so the batch keeps going"""
+    start = time.perf_counter()
+    try:
+        if task['sheet'] == 'transaksi':
+            summary = preprocess_stream(task['workbook'], task['store'], chunksize=task['chunksize'])
+            summary.pop('missing_info')
+        else:
+            summary = preprocess_location_sheet(task['workbook'], task['store'])
+        summary['status'] = 'ok'
+    except Exception as e:
+        summary = {'status': 'error', 'error': f"{type(e).__name__}: {e}", 'store': task['store']}
+    summary.update(workbook=task['workbook'], sheet=task['sheet'],
+                   seconds=round(time.perf_counter() - start, 2))
+    return summary
+
+
+def run_batch(workbooks, output_dir=OUTPUT_DIR, workers=None, chunksize=CHUNK_SIZE):
+    """Preprocess many workbooks in a process pool, each sheet as an independent task"""
+    tasks = plan_tasks(workbooks, output_dir, chunksize)
+    if workers == 1:
+        return [run_task(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run_task, tasks))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Preprocessing workbook mentah ke store parquet (batch, paralel)")
+    parser.add_argument('workbooks', nargs='+', help="Workbook Excel (atau CSV transaksi) mentah, satu per depot/tahun")
+    parser.add_argument('--output', default=OUTPUT_DIR,
+                        help="Folder hasil; jika lebih dari satu workbook, tiap workbook mendapat subfolder")
+    parser.add_argument('--workers', type=int, default=None, help="Jumlah proses (default: semua core)")
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE, help="Jumlah baris per chunk sheet transaksi")
+    args = parser.parse_args()
+
+    results = run_batch(args.workbooks, args.output, args.workers, args.chunksize)
+    for result in results:
+        if result['status'] == 'ok':
+            print(f"✅ {result['workbook']} [{result['sheet']}]: {result['rows']} baris → {result['store']} ({result['seconds']} s)")
+        else:
+            print(f"❌ {result['workbook']} [{result['sheet']}]: {result['error']}")
+
+    # Kode keluar non-nol agar batch terjadwal bisa mendeteksi kegagalan
+    raise SystemExit(1 if any(result['status'] != 'ok' for result in results) else 0)
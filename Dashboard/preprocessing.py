@@ -0,0 +1,406 @@
+# Fungsi preprocessing dataset Truk Air Isi Ulang (dipindahkan dari Prepocessing.ipynb)
+import pandas as pd
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from sklearn.impute import KNNImputer
+from sklearn.neighbors import NearestNeighbors
+
+
+# Level partisi imputasi KNN, dari yang paling spesifik sampai seluruh data
+# '_Periode' adalah bulan dari kolom Tanggal (baris dengan tanggal berdekatan)
+IMPUTE_PARTITION_LEVELS = [
+    ['Jenis Transaksi', 'Order', '_Periode'],
+    ['Jenis Transaksi', 'Order'],
+    ['Jenis Transaksi'],
+    []
+]
+# Kolom penanda baris yang tidak dipakai sebagai fitur kemiripan
+IMPUTE_EXCLUDE_COLUMNS = ['No']
+
+# Daftar nilai yang dianggap sebagai missing/unknown (dibandingkan tanpa beda huruf besar/kecil)
+UNKNOWN_VALUES = ['UNKNOWN', 'NULL', 'NAN', '', ' ', 'N/A', 'NA', '-']
+
+
+def _is_text_column(series):
+    return series.dtype == 'object' or isinstance(series.dtype, pd.CategoricalDtype) \
+        or pd.api.types.is_string_dtype(series.dtype)
+
+
+def _sentinel_mask(series):
+    """Boolean mask of sentinel values, checked once per distinct value instead of per row"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes, uniques = series.cat.codes.to_numpy(), series.cat.categories
+    else:
+        codes, uniques = pd.factorize(series)
+    is_unknown = pd.Index(uniques).astype(str).str.upper().isin(UNKNOWN_VALUES)
+    # Kode -1 (NaN) menunjuk ke elemen terakhir yang selalu False
+    return np.append(is_unknown, False)[codes], uniques[is_unknown]
+
+
+# Satu kali scan: membersihkan nilai UNKNOWN sekaligus menyusun laporan missing values
+def scan_unknown_values(df):
+    df_clean = df.copy()
+    missing_info = {}
+    n_rows = len(df)
+
+    for col in df.columns:
+        series = df[col]
+        null_count = int(series.isnull().sum())
+        unknown_count = 0
+
+        # Kolom numerik/tanggal tidak mungkin berisi teks UNKNOWN, jadi hanya kolom teks yang di-scan
+        if _is_text_column(series):
+            mask, unknown_uniques = _sentinel_mask(series)
+            unknown_count = int(mask.sum())
+            if unknown_count > 0:
+                if isinstance(series.dtype, pd.CategoricalDtype):
+                    df_clean[col] = series.cat.remove_categories(list(unknown_uniques))
+                else:
+                    # Kolom seperti Volume (L) yang berisi '-' menjadi numerik setelah dibersihkan
+                    df_clean[col] = series.mask(mask).infer_objects()
+
+        total_missing = null_count + unknown_count
+        missing_info[col] = {
+            'null_count': null_count,
+            'unknown_count': unknown_count,
+            'total_missing': total_missing,
+            'percentage': (total_missing / n_rows) * 100 if n_rows > 0 else 0.0
+        }
+
+    return df_clean, missing_info
+
+
+# Tampilkan laporan missing values hasil scan
+def report_missing_values(missing_info, sheet_name):
+    print(f"\n=== ANALISIS MISSING VALUES - {sheet_name} ===")
+
+    for col, info in missing_info.items():
+        if info['total_missing'] > 0:
+            print(f"{col}: {info['total_missing']} missing ({info['percentage']:.2f}%)")
+            print(f"  - NULL/NaN: {info['null_count']}")
+            print(f"  - UNKNOWN/empty: {info['unknown_count']}")
+
+
+# Analisis nilai NULL dan UNKNOWN untuk kedua sheet
+def analyze_missing_values(df, sheet_name):
+    _, missing_info = scan_unknown_values(df)
+    report_missing_values(missing_info, sheet_name)
+    return missing_info
+
+
+# Fungsi untuk membersihkan dan standarisasi nilai UNKNOWN
+def clean_unknown_values(df):
+    df_clean, _ = scan_unknown_values(df)
+    return df_clean
+
+
+# Fungsi untuk menghapus kolom unnamed khususnya di kolom 1 sheet 3
+def remove_unnamed_columns(df, sheet_name):
+    df_clean = df.copy()
+    print(f"\n=== MEMBERSIHKAN KOLOM UNNAMED - {sheet_name} ===")
+    print(f"Kolom sebelum pembersihan: {list(df_clean.columns)}")
+    
+    # Hapus kolom yang unnamed (biasanya dimulai dengan 'Unnamed:')
+    unnamed_cols = [col for col in df_clean.columns if 'Unnamed:' in str(col)]
+    
+    if unnamed_cols:
+        print(f"Menghapus kolom unnamed: {unnamed_cols}")
+        df_clean = df_clean.drop(columns=unnamed_cols)
+    
+    # Hapus kolom kosong di posisi pertama jika ada
+    if len(df_clean.columns) > 0:
+        first_col = df_clean.columns[0]
+        if df_clean[first_col].isnull().all() or str(first_col).startswith('Unnamed'):
+            print(f"Menghapus kolom pertama yang kosong/unnamed: {first_col}")
+            df_clean = df_clean.drop(columns=[first_col])
+    
+    # Hapus kolom yang semua nilainya NaN
+    empty_cols = df_clean.columns[df_clean.isnull().all()].tolist()
+    if empty_cols:
+        print(f"Menghapus kolom kosong: {empty_cols}")
+        df_clean = df_clean.drop(columns=empty_cols)
+    
+    print(f"Kolom setelah pembersihan: {list(df_clean.columns)}")
+    print(f"Ukuran dataset: {df_clean.shape}")
+    
+    return df_clean
+
+
+def _knn_fill(values, missing_rows, donor_rows, n_neighbors):
+    """Fill missing_rows from their nearest complete donor rows, like KNNImputer (uniform weights)"""
+    donors = values[donor_rows]
+    filled = values[missing_rows].copy()
+    k = min(n_neighbors, len(donor_rows))
+    missing_mask = np.isnan(filled)
+
+    # Baris dikelompokkan per pola missing agar satu index tetangga dipakai bersama
+    patterns, pattern_ids = np.unique(missing_mask, axis=0, return_inverse=True)
+    for pattern_id, pattern in enumerate(patterns):
+        rows = np.flatnonzero(pattern_ids == pattern_id)
+        present = ~pattern
+        if present.any():
+            index = NearestNeighbors(n_neighbors=k).fit(donors[:, present])
+            neighbors = index.kneighbors(filled[rows][:, present], return_distance=False)
+            estimates = donors[neighbors][:, :, pattern].mean(axis=1)
+        else:
+            estimates = np.tile(donors[:, pattern].mean(axis=0), (len(rows), 1))
+        block = filled[rows]
+        block[:, pattern] = estimates
+        filled[rows] = block
+    return missing_rows, filled
+
+
+def partitioned_knn_impute(df, numeric_cols, n_neighbors=5, partition_levels=None,
+                           exclude_cols=None, n_jobs=None):
+    """KNN imputation that only compares rows within the same partition, partitions run in parallel
+
+    Rows are matched level by level (see IMPUTE_PARTITION_LEVELS); a partition
+    with fewer than n_neighbors complete rows falls through to the next, coarser level.
+    """
+    if partition_levels is None:
+        partition_levels = IMPUTE_PARTITION_LEVELS
+    if exclude_cols is None:
+        exclude_cols = IMPUTE_EXCLUDE_COLUMNS
+
+    feature_cols = [col for col in numeric_cols if col not in exclude_cols]
+    values = df[feature_cols].to_numpy(dtype='float64', copy=True)
+    missing = np.isnan(values).any(axis=1)
+    complete = ~missing
+    if not missing.any() or not complete.any():
+        return df[feature_cols].copy()
+
+    keys = pd.DataFrame(index=np.arange(len(df)))
+    for level in partition_levels:
+        for col in level:
+            if col == '_Periode' and 'Tanggal' in df.columns:
+                keys[col] = pd.to_datetime(df['Tanggal'], errors='coerce').dt.to_period('M').to_numpy()
+            elif col in df.columns:
+                keys[col] = df[col].to_numpy()
+
+    unresolved = missing.copy()
+    tasks = []
+    for level_no, level in enumerate(partition_levels):
+        level = [col for col in level if col in keys.columns]
+        is_last = level_no == len(partition_levels) - 1
+        if not unresolved.any():
+            break
+        if level:
+            groups = keys.groupby(level, dropna=False, sort=False).indices.values()
+        else:
+            groups = [np.arange(len(df))]
+        for rows in groups:
+            missing_rows = rows[unresolved[rows]]
+            donor_rows = rows[complete[rows]]
+            if len(missing_rows) == 0 or len(donor_rows) == 0:
+                continue
+            if len(donor_rows) >= n_neighbors or is_last:
+                tasks.append((missing_rows, donor_rows))
+                unresolved[missing_rows] = False
+
+    # Setiap partisi independen, jadi dikerjakan paralel
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        results = executor.map(lambda task: _knn_fill(values, task[0], task[1], n_neighbors), tasks)
+        for missing_rows, filled in results:
+            values[missing_rows] = filled
+
+    return pd.DataFrame(values, index=df.index, columns=feature_cols)
+
+
+def impute_from_reference(df, reference, feature_cols, n_neighbors=5, n_jobs=None):
+    """Impute the gaps in df's feature columns using only the reference rows as donors"""
+    result = df[feature_cols].copy()
+    missing = result.isnull().any(axis=1).to_numpy()
+    if not missing.any() or reference is None or len(reference) == 0:
+        return result
+
+    # Referensi (baris lengkap) digabung dengan baris yang perlu diisi saja
+    key_cols = [col for col in reference.columns if col not in feature_cols]
+    query = df.loc[missing, feature_cols + [col for col in key_cols if col in df.columns]]
+    combined = pd.concat([reference, query], ignore_index=True)
+    for col in key_cols:
+        if col != 'Tanggal':
+            combined[col] = combined[col].astype(object)
+
+    imputed = partitioned_knn_impute(combined, feature_cols, n_neighbors=n_neighbors,
+                                     exclude_cols=[], n_jobs=n_jobs)
+    result.loc[missing, feature_cols] = imputed.iloc[len(reference):].to_numpy()
+    return result
+
+
+# Fungsi untuk imputasi berdasarkan similarity dan mode
+def smart_imputation(df, method='similarity'):
+    df_imputed = df.copy()
+    
+    # Pisahkan kolom numerik dan kategorikal
+    numeric_cols = df_imputed.select_dtypes(include=[np.number]).columns.tolist()
+    categorical_cols = df_imputed.select_dtypes(include=['object']).columns.tolist()
+    
+    print(f"Kolom numerik: {numeric_cols}")
+    print(f"Kolom kategorikal: {categorical_cols}")
+    
+    # Imputasi untuk kolom kategorikal (gunakan mode/nilai terbanyak)
+    for col in categorical_cols:
+        if df_imputed[col].isnull().any():
+            mode_value = df_imputed[col].mode()
+            if len(mode_value) > 0:
+                df_imputed[col].fillna(mode_value[0], inplace=True)
+                print(f"Kolom '{col}' diisi dengan mode: '{mode_value[0]}'")
+    
+    # Imputasi untuk kolom numerik
+    if method == 'similarity' and len(numeric_cols) > 0:
+        # Gunakan KNN Imputer untuk similarity-based imputation
+        imputer = KNNImputer(n_neighbors=5)
+        df_imputed[numeric_cols] = imputer.fit_transform(df_imputed[numeric_cols])
+        print("Kolom numerik diimputasi menggunakan KNN (similarity-based)")
+    
+    elif method == 'partitioned' and len(numeric_cols) > 0:
+        # KNN per partisi (Jenis Transaksi, Order, bulan) memakai index tetangga terdekat
+        imputed = partitioned_knn_impute(df_imputed, numeric_cols)
+        df_imputed[imputed.columns] = imputed
+        print(f"Kolom numerik diimputasi menggunakan KNN per partisi (fitur: {list(imputed.columns)})")
+    
+    elif method == 'mean' and len(numeric_cols) > 0:
+        # Gunakan mean untuk imputasi sederhana
+        for col in numeric_cols:
+            if df_imputed[col].isnull().any():
+                mean_value = df_imputed[col].mean()
+                df_imputed[col].fillna(mean_value, inplace=True)
+                print(f"Kolom '{col}' diisi dengan mean: {mean_value:.2f}")
+    
+    return df_imputed
+
+
+# Fungsi khusus untuk menangani missing values pada kolom tanggal di Sheet 2
+def handle_date_missing_values_sheet2(df):
+    df_clean = df.copy()
+    print(f"\n=== MENANGANI MISSING VALUES TANGGAL - SHEET 2 ===")
+    
+    # Identifikasi kolom yang mungkin berisi tanggal
+    date_columns = []
+    for col in df_clean.columns:
+        col_name = str(col).lower()
+        if any(keyword in col_name for keyword in ['tanggal', 'date', 'tgl', 'waktu', 'time']):
+            date_columns.append(col)
+    
+    print(f"Kolom tanggal yang terdeteksi: {date_columns}")
+    
+    for col in date_columns:
+        print(f"\nMemproses kolom tanggal: {col}")
+        
+        # Tampilkan sample data sebelum konversi
+        print(f"Sample data sebelum konversi:")
+        print(df_clean[col].head(10))
+        
+        # Konversi ke datetime jika belum
+        try:
+            df_clean[col] = pd.to_datetime(df_clean[col], errors='coerce')
+            print(f"Berhasil konversi ke datetime")
+        except Exception as e:
+            print(f"Gagal konversi kolom {col} ke datetime: {e}")
+            continue
+        
+        # Hitung missing values
+        missing_count = df_clean[col].isnull().sum()
+        print(f"Missing values: {missing_count}")
+        
+        if missing_count > 0:
+            # Method 1: Forward fill (menggunakan tanggal sebelumnya)
+            before_ffill = df_clean[col].isnull().sum()
+            df_clean[col] = df_clean[col].fillna(method='ffill')
+            after_ffill = df_clean[col].isnull().sum()
+            print(f"Setelah forward fill: {before_ffill} → {after_ffill}")
+            
+            # Method 2: Jika masih ada missing di awal, gunakan backward fill
+            if df_clean[col].isnull().sum() > 0:
+                before_bfill = df_clean[col].isnull().sum()
+                df_clean[col] = df_clean[col].fillna(method='bfill')
+                after_bfill = df_clean[col].isnull().sum()
+                print(f"Setelah backward fill: {before_bfill} → {after_bfill}")
+            
+            # Method 3: Jika masih ada missing, gunakan median date
+            if df_clean[col].isnull().sum() > 0:
+                median_date = df_clean[col].median()
+                df_clean[col] = df_clean[col].fillna(median_date)
+                print(f"Menggunakan median date: {median_date}")
+            
+            print(f"Missing values setelah imputasi: {df_clean[col].isnull().sum()}")
+        
+        # Tampilkan info tanggal
+        if not df_clean[col].isnull().all():
+            print(f"Rentang tanggal: {df_clean[col].min()} sampai {df_clean[col].max()}")
+            print(f"Total hari: {(df_clean[col].max() - df_clean[col].min()).days} hari")
+    
+    return df_clean
+
+
+# Validasi hasil imputasi
+def validate_imputation(df_original, df_imputed, sheet_name):
+    print(f"\n=== VALIDASI HASIL IMPUTASI - {sheet_name} ===")
+    
+    print(f"Missing values sebelum imputasi: {df_original.isnull().sum().sum()}")
+    print(f"Missing values setelah imputasi: {df_imputed.isnull().sum().sum()}")
+    
+    # Tampilkan perbandingan per kolom
+    for col in df_original.columns:
+        before = df_original[col].isnull().sum()
+        after = df_imputed[col].isnull().sum()
+        if before > 0:
+            print(f"Kolom '{col}': {before} → {after} missing values")
+    
+    # Tampilkan statistik deskriptif untuk kolom numerik
+    numeric_cols = df_imputed.select_dtypes(include=[np.number]).columns
+    if len(numeric_cols) > 0:
+        print(f"\nStatistik deskriptif kolom numerik:")
+        print(df_imputed[numeric_cols].describe())
+
+
+# Pengecekan menyeluruh missing values untuk Sheet 2 dan Sheet 3
+def comprehensive_missing_check(df, sheet_name):
+    print(f"\n{'='*50}")
+    print(f"PENGECEKAN MISSING VALUES - {sheet_name}")
+    print(f"{'='*50}")
+    
+    # Info dasar dataset
+    print(f"Ukuran dataset: {df.shape}")
+    print(f"Total data points: {df.shape[0] * df.shape[1]}")
+    print(f"Total missing values: {df.isnull().sum().sum()}")
+    print(f"Persentase missing: {(df.isnull().sum().sum() / (df.shape[0] * df.shape[1])) * 100:.2f}%")
+    
+    # Missing values per kolom
+    missing_per_col = df.isnull().sum()
+    missing_percentage_per_col = (missing_per_col / len(df)) * 100
+    
+    print(f"\n--- MISSING VALUES PER KOLOM ---")
+    for col in df.columns:
+        missing_count = missing_per_col[col]
+        missing_pct = missing_percentage_per_col[col]
+        status = "✅ BERSIH" if missing_count == 0 else f"❌ {missing_count} missing ({missing_pct:.2f}%)"
+        print(f"{col}: {status}")
+    
+    # Statistik missing values
+    if missing_per_col.sum() > 0:
+        print(f"\n--- STATISTIK MISSING VALUES ---")
+        print(f"Kolom dengan missing terbanyak: {missing_per_col.idxmax()} ({missing_per_col.max()} missing)")
+        print(f"Jumlah kolom yang memiliki missing: {(missing_per_col > 0).sum()}")
+        print(f"Jumlah kolom yang bersih: {(missing_per_col == 0).sum()}")
+        
+        # Baris dengan missing values
+        rows_with_missing = df.isnull().any(axis=1).sum()
+        print(f"Baris yang memiliki missing values: {rows_with_missing} dari {len(df)} baris")
+        print(f"Persentase baris dengan missing: {(rows_with_missing / len(df)) * 100:.2f}%")
+    else:
+        print(f"\n🎉 SELAMAT! Dataset {sheet_name} sudah bersih dari missing values!")
+    
+    return {
+        'total_missing': missing_per_col.sum(),
+        'missing_per_column': missing_per_col.to_dict(),
+        'missing_percentage_per_column': missing_percentage_per_col.to_dict(),
+        'rows_with_missing': df.isnull().any(axis=1).sum() if missing_per_col.sum() > 0 else 0
+    }
+
+
+# Preprocessing lengkap sheet lokasi (kecil, cukup diproses di memori)
+def preprocess_locations(df):
+    df_clean, _ = scan_unknown_values(df)
+    df_clean = remove_unnamed_columns(df_clean, "LOKASI")
+    return smart_imputation(df_clean, method='partitioned')
@@ -0,0 +1,277 @@
+# Perencanaan rute harian: matriks jarak haversine antar lokasi Sheet 3 (di-cache per tabel lokasi),
+# penugasan order ke truk dengan batas kapasitas tangki (heuristik savings Clarke-Wright + 2-opt),
+# dan perbandingan liter per km rencana dengan realisasi per plat
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+
+from cache import LRUCache
+from geo import location_dimension
+
+ROUTING_COLUMNS = ['Tanggal', 'Order', 'Plat Nomor', 'Volume (L)']
+
+EARTH_RADIUS_KM = 6371.0088
+# Jarak jalan ≈ jarak garis lurus × faktor jalan (tidak ada data jaringan jalan)
+ROAD_FACTOR = 1.3
+# Kandidat penggabungan per order: tetangga dengan savings terbesar saja
+SAVINGS_NEIGHBORS = 30
+# Batas jumlah putaran 2-opt per rute (tiap putaran menerapkan satu pembalikan terbaik)
+TWO_OPT_PASSES = 1000
+# Lokasi awal/akhir default: lokasi pertama yang namanya diawali prefix ini
+BASE_PREFIX = 'Depot'
+
+# Matriks jarak per tabel lokasi dan rencana per (versi data, tanggal, base)
+DISTANCE_CACHE = LRUCache(maxsize=8)
+PLAN_CACHE = LRUCache(maxsize=64)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance (km) between broadcastable arrays of points"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(value, dtype='float64')) for value in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def haversine_matrix(lat, lon):
+    """Great-circle distances (km) between every pair of points, fully vectorised"""
+    lat, lon = np.asarray(lat, dtype='float64'), np.asarray(lon, dtype='float64')
+    return haversine_km(lat[:, None], lon[:, None], lat[None, :], lon[None, :])
+
+
+def distance_matrix(locations):
+    """Road-distance estimate (km) between the locations of a LocationDimension, built once per table"""
+    cached = DISTANCE_CACHE.get(id(locations))
+    if cached is None or cached[0] is not locations:
+        lat, lon = locations.coordinates(pd.Series(locations.names))
+        cached = (locations, haversine_matrix(lat, lon) * ROAD_FACTOR)
+        DISTANCE_CACHE.put(id(locations), cached)
+    return cached[1]
+
+
+def base_distances(locations, base):
+    """Road-distance estimate (km) from base to every location ID; the extra last entry (ID -1) is NaN"""
+    lat, lon = locations.coordinates(pd.Series(locations.names))
+    return np.append(haversine_km(lat[base], lon[base], lat, lon) * ROAD_FACTOR, np.nan)
+
+
+def located_ids(locations):
+    """IDs of the locations that have coordinates (only these can be routed)"""
+    lat, lon = locations.coordinates(pd.Series(locations.names))
+    return np.flatnonzero(~(np.isnan(lat) | np.isnan(lon)))
+
+
+def default_base(locations):
+    """Location ID of the default start/end point (first located depot, else the first located location)"""
+    located = located_ids(locations)
+    names = pd.Series(locations.names[located])
+    depots = located[names.str.startswith(BASE_PREFIX).to_numpy()]
+    return int(depots[0]) if len(depots) else int(located[0])
+
+
+def truck_capacities(df):
+    """Tank capacity per plate: the largest single delivery the plate ever made"""
+    deliveries = df[pd.to_numeric(df['Volume (L)'], errors='coerce') > 0]
+    return deliveries.groupby('Plat Nomor', observed=True)['Volume (L)'].max().astype('float64')
+
+
+def day_orders(df, day, locations):
+    """Deliveries of one day to a location with coordinates: Order, location ID, litres and the actual plate"""
+    dates = pd.to_datetime(df['Tanggal'], errors='coerce').dt.normalize()
+    rows = df[(dates == pd.Timestamp(day).normalize()).to_numpy()]
+    volume = pd.to_numeric(rows['Volume (L)'], errors='coerce')
+    if 'Pemasukan' in rows.columns:
+        # Hanya pengiriman ke pelanggan (baris pengeluaran tidak punya tujuan)
+        volume = volume.where(pd.to_numeric(rows['Pemasukan'], errors='coerce') > 0)
+    orders = pd.DataFrame({
+        'Order': rows['Order'].astype(str).to_numpy(),
+        'Lokasi': locations.ids(rows['Order']),
+        'Volume (L)': volume.to_numpy(dtype='float64'),
+        'Plat Nomor': rows['Plat Nomor'].astype(str).to_numpy()
+    })
+    known = np.isin(orders['Lokasi'].to_numpy(), located_ids(locations))
+    return orders[known & (orders['Volume (L)'] > 0)].reset_index(drop=True)
+
+
+def _savings_routes(stops, demand, base, distances, capacity):
+    """Clarke-Wright savings: start with one route per stop and merge route ends by largest saving"""
+    n = len(stops)
+    routes = {i: [i] for i in range(n)}
+    route_of = np.arange(n)
+    load = {i: demand[i] for i in range(n)}
+    if n < 2:
+        return list(routes.values())
+
+    to_base = distances[base, stops]
+    savings = to_base[:, None] + to_base[None, :] - distances[np.ix_(stops, stops)]
+    np.fill_diagonal(savings, -np.inf)
+    # Pasangan yang muatannya melebihi kapasitas tidak pernah bisa digabung
+    savings[demand[:, None] + demand[None, :] > capacity] = -np.inf
+
+    # Kandidat: tetangga dengan savings terbesar per order, diurutkan menurun
+    k = min(SAVINGS_NEIGHBORS, n - 1)
+    partners = np.argpartition(-savings, k - 1, axis=1)[:, :k]
+    pairs = np.unique(np.sort(np.column_stack([np.repeat(np.arange(n), k), partners.ravel()]), axis=1), axis=0)
+    first, second = pairs[:, 0], pairs[:, 1]
+    values = savings[first, second]
+    keep = values > 0
+    first, second, values = first[keep], second[keep], values[keep]
+    order = np.argsort(-values, kind='stable')
+
+    for i, j in zip(first[order], second[order]):
+        ri, rj = route_of[i], route_of[j]
+        if ri == rj or load[ri] + load[rj] > capacity:
+            continue
+        a, b = routes[ri], routes[rj]
+        # Hanya ujung rute yang bisa disambung (i dan j masih bertetangga dengan base)
+        if a[-1] == i and b[0] == j:
+            merged = a + b
+        elif a[0] == i and b[-1] == j:
+            merged = b + a
+        elif a[-1] == i and b[-1] == j:
+            merged = a + b[::-1]
+        elif a[0] == i and b[0] == j:
+            merged = a[::-1] + b
+        else:
+            continue
+        routes[ri] = merged
+        load[ri] += load.pop(rj)
+        del routes[rj]
+        route_of[merged] = ri
+    return list(routes.values())
+
+
+def _route_length(route, stops, base, distances):
+    path = np.concatenate([[base], stops[route], [base]])
+    return float(distances[path[:-1], path[1:]].sum())
+
+
+def _two_opt(route, stops, base, distances):
+    """Reverse segments of a route while that shortens it
+
+    Every pass evaluates all segment pairs at once and applies the best
+    reversal; at most TWO_OPT_PASSES passes are made.
+    """
+    if len(route) <= 2:
+        return route
+    path = np.array([base] + list(stops[route]) + [base])
+    for _ in range(TWO_OPT_PASSES):
+        # Sisi k = path[k] → path[k + 1]; membalik path[i + 1..j] mengganti sisi i dan j
+        start, end = path[:-1], path[1:]
+        current = distances[start, end]
+        change = (distances[start[:, None], start[None, :]] + distances[end[:, None], end[None, :]]
+                  - current[:, None] - current[None, :])
+        change = np.triu(change, 2)
+        best = np.argmin(change)
+        if change.flat[best] >= -1e-9:
+            break
+        i, j = divmod(best, len(current))
+        path[i + 1:j + 1] = path[i + 1:j + 1][::-1]
+        route[i:j] = route[i:j][::-1]
+    return route
+
+
+@dataclass
+class RoutePlan:
+    """Planned trips of one day and the planned vs actual litres per km per plate"""
+    routes: pd.DataFrame
+    per_plate: pd.DataFrame
+    paths: pd.DataFrame
+
+
+def plan_routes(orders, locations, base, capacities):
+    """Assign a day's deliveries to trucks as capacity-feasible trips from and back to base
+
+    Trips are built with the savings heuristic (capacity = the smallest
+    tank), tidied with 2-opt and then handed out longest first to the
+    truck with the least planned kilometres whose tank fits the load.
+    Trucks are the plates that actually drove that day.
+    """
+    distances = distance_matrix(locations)
+    stops = orders['Lokasi'].to_numpy(dtype='int64')
+    demand = orders['Volume (L)'].to_numpy(dtype='float64')
+    trucks = capacities.reindex(pd.Index(orders['Plat Nomor'].unique())).dropna()
+    if len(trucks) == 0:
+        trucks = capacities
+    # Rute gabungan dibatasi tangki terkecil agar muat di truk mana pun (order yang lebih besar jadi rute sendiri)
+    capacity = float(trucks.min()) if len(trucks) else float(demand.max(initial=0))
+
+    routes = [_two_opt(route, stops, base, distances)
+              for route in _savings_routes(stops, demand, base, distances, capacity)]
+    lengths = [_route_length(route, stops, base, distances) for route in routes]
+    loads = [float(demand[route].sum()) for route in routes]
+
+    # Penugasan: rute terpanjang dulu ke truk dengan km rencana terkecil yang tangkinya cukup
+    assigned_km = pd.Series(0.0, index=trucks.index)
+    plates = []
+    for r in np.argsort(lengths, kind='stable')[::-1]:
+        eligible = trucks.index[trucks.to_numpy() >= loads[r]]
+        candidates = assigned_km[eligible] if len(eligible) else assigned_km[[trucks.idxmax()]]
+        plate = candidates.idxmin()
+        assigned_km[plate] += lengths[r]
+        plates.append((r, plate))
+    plate_of = dict(plates)
+
+    names = orders['Order'].to_numpy()
+    base_name = locations.names[base]
+    route_frame = pd.DataFrame({
+        'Rute': np.arange(1, len(routes) + 1),
+        'Plat Nomor': [plate_of[r] for r in range(len(routes))],
+        'Urutan': [' → '.join([base_name] + list(names[route]) + [base_name]) for route in routes],
+        'Jumlah Order': [len(route) for route in routes],
+        'Muatan (L)': loads,
+        'Jarak (km)': lengths
+    })
+
+    lat, lon = locations.coordinates(pd.Series(locations.names))
+    path_rows = []
+    for r, route in enumerate(routes):
+        for order_stop, location in enumerate([base] + list(stops[route]) + [base]):
+            path_rows.append((r + 1, order_stop, lat[location], lon[location], locations.names[location]))
+    paths = pd.DataFrame(path_rows, columns=['Rute', 'Urutan', 'Latitude', 'Longitude', 'Nama Lokasi'])
+    paths['Rute'] = 'Rute ' + paths['Rute'].astype(str)
+
+    return RoutePlan(route_frame, compare_plates(orders, route_frame, distances, base), paths)
+
+
+def compare_plates(orders, routes, distances, base):
+    """Planned vs actual litres per km per plate
+
+    Actual kilometres assume every recorded delivery was its own trip from
+    base and back (the ledger has one row per trip and no odometer).
+    """
+    actual = orders.assign(km=2 * distances[base, orders['Lokasi'].to_numpy()])
+    actual = actual.groupby('Plat Nomor').agg(volume=('Volume (L)', 'sum'), km=('km', 'sum'))
+    planned = routes.groupby('Plat Nomor').agg(volume=('Muatan (L)', 'sum'), km=('Jarak (km)', 'sum'))
+    per_plate = actual.join(planned, how='outer', lsuffix='_aktual', rsuffix='_rencana').fillna(0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        comparison = pd.DataFrame({
+            'Volume Aktual (L)': per_plate['volume_aktual'],
+            'Km Aktual': per_plate['km_aktual'],
+            'L/km Aktual': per_plate['volume_aktual'] / per_plate['km_aktual'],
+            'Volume Rencana (L)': per_plate['volume_rencana'],
+            'Km Rencana': per_plate['km_rencana'],
+            'L/km Rencana': per_plate['volume_rencana'] / per_plate['km_rencana']
+        })
+    # Jarak 0 (pelanggan di lokasi base) tidak punya L/km
+    comparison = comparison.replace([np.inf, -np.inf], np.nan)
+    return comparison.rename_axis('Plat Nomor').reset_index()
+
+
+def cube_route_plan(df, cube, df_locations, day, base=None):
+    """Route plan of one day, memoized per data version of a tagged cube, day and base"""
+    locations = location_dimension(df_locations)
+    if base is None:
+        base = default_base(locations)
+
+    def build():
+        return plan_routes(day_orders(df, day, locations), locations, base, truck_capacities(df))
+
+    tag = cube.attrs.get('cache_version')
+    if tag is None or tag[1] != id(cube):
+        return build()
+    return PLAN_CACHE.get_or_compute((tag[0], str(pd.Timestamp(day).date()), base), build)
+
+
+def invalidate_plans(predicate=None):
+    """Drop cached route plans whose data version matches predicate (all if None)"""
+    return PLAN_CACHE.invalidate(None if predicate is None else lambda key: predicate(key[0]))
@@ -0,0 +1,212 @@
+import os
+import glob
+import json
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Skema bertipe untuk dataset hasil cleaning
+# Sheet 2: data transaksi, Sheet 3: data lokasi
+SHEET2_SCHEMA = {
+    'No': 'int32',
+    'Tanggal': 'datetime64[ns]',
+    'Sopir': 'category',
+    'Plat Nomor': 'category',
+    'Order': 'category',
+    'Volume (L)': 'float32',
+    'Pemasukan': 'int64',
+    'Pengeluaran': 'int64',
+    'Jenis Transaksi': 'category',
+    'Jumlah': 'int64',
+    'Keterangan': 'category'
+}
+
+SHEET3_SCHEMA = {
+    'Nama Lokasi': 'object',
+    'Latitude': 'float64',
+    'Longitude': 'float64'
+}
+
+# Lokasi default store parquet (satu folder per sheet, berisi file part-*.parquet)
+SHEET2_STORE = 'Dataset/Cleaned/Sheet2_Cleaned'
+SHEET3_STORE = 'Dataset/Cleaned/Sheet3_Cleaned'
+
+# File pendamping di dalam store (diawali '_' sehingga diabaikan saat membaca parquet)
+CUBE_FILE = '_cube.parquet'
+SERIES_DAILY_FILE = '_series_daily.parquet'
+FORECAST_DAILY_FILE = '_forecast_daily.parquet'
+FORECAST_MODEL_FILE = '_forecast_models.parquet'
+ANOMALY_STATE_FILE = '_anomaly_state.json'
+ANOMALY_FILE = '_anomalies.parquet'
+ANOMALY_PENDING_FILE = '_anomaly_pending.parquet'
+
+
+def _cast_column(series, dtype):
+    """Cast a single column to the schema dtype"""
+    if dtype == 'datetime64[ns]':
+        return pd.to_datetime(series, errors='coerce')
+    if dtype == 'category':
+        return series.astype('category')
+    if dtype.startswith('int'):
+        numeric = pd.to_numeric(series, errors='coerce')
+        # Kolom integer yang masih punya missing value tetap float64
+        if numeric.isnull().any():
+            return numeric.astype('float64')
+        return numeric.round().astype(dtype)
+    if dtype.startswith('float'):
+        return pd.to_numeric(series, errors='coerce').astype(dtype)
+    return series
+
+
+def apply_schema(df, schema):
+    """Return a copy of df with columns cast to the typed schema"""
+    typed = df.copy()
+    for col, dtype in schema.items():
+        if col in typed.columns:
+            typed[col] = _cast_column(typed[col], dtype)
+    return typed
+
+
+def _part_files(path):
+    return sorted(glob.glob(os.path.join(path, 'part-*.parquet')))
+
+
+def _sidecar_files(path):
+    return glob.glob(os.path.join(path, '_*'))
+
+
+def store_exists(path):
+    """Check whether a parquet store exists at path"""
+    return os.path.isdir(path) and len(_part_files(path)) > 0
+
+
+def clear_store(path):
+    """Create an empty store at path, removing old parts and sidecar files"""
+    os.makedirs(path, exist_ok=True)
+    # Part lama dan file pendamping (cube, state ingest) tidak berlaku lagi
+    for old_file in _part_files(path) + _sidecar_files(path):
+        os.remove(old_file)
+    return path
+
+
+def save_dataset(df, path, schema=None):
+    """Write df as a fresh parquet store (replaces existing parts)"""
+    if schema is not None:
+        df = apply_schema(df, schema)
+    clear_store(path)
+    df.to_parquet(os.path.join(path, 'part-00000.parquet'), index=False)
+    return path
+
+
+def append_dataset(df, path, schema=None):
+    """Append df to a parquet store as a new part file, returns the part path"""
+    if schema is not None:
+        df = apply_schema(df, schema)
+    os.makedirs(path, exist_ok=True)
+    part_path = os.path.join(path, f'part-{len(_part_files(path)):05d}.parquet')
+    df.to_parquet(part_path, index=False)
+    return part_path
+
+
+def load_dataset(path, columns=None):
+    """Load every part of a parquet store into one typed DataFrame"""
+    return pd.read_parquet(path, columns=columns)
+
+
+def save_cube(cube, path):
+    """Persist the aggregate cube next to the parquet store"""
+    cube.to_parquet(os.path.join(path, CUBE_FILE), index=False)
+
+
+def load_cube(path):
+    """Load the persisted aggregate cube of a store, or None if there is none"""
+    cube_path = os.path.join(path, CUBE_FILE)
+    if not os.path.exists(cube_path):
+        return None
+    return pd.read_parquet(cube_path)
+
+
+def _write_counted(frame, n_rows, file_path, index=True):
+    # Jumlah baris transaksi yang tercakup (termasuk baris tanpa tanggal) disimpan di metadata parquet
+    table = pa.Table.from_pandas(frame, preserve_index=index)
+    table = table.replace_schema_metadata({**table.schema.metadata, b'n_rows': str(int(n_rows)).encode()})
+    pq.write_table(table, file_path)
+
+
+def _read_counted(file_path):
+    # File lama tanpa jumlah baris: n_rows None (pemakai membangun ulang dari store)
+    table = pq.read_table(file_path)
+    n_rows = (table.schema.metadata or {}).get(b'n_rows')
+    return table.to_pandas(), None if n_rows is None else int(n_rows)
+
+
+def save_daily_series(daily, n_rows, path):
+    """Persist the calendar-day trend sums and the number of rows they cover next to the parquet store"""
+    _write_counted(daily, n_rows, os.path.join(path, SERIES_DAILY_FILE))
+
+
+def load_daily_series(path):
+    """Load (daily, n_rows) of a store's trend series, or None if it was never saved"""
+    file_path = os.path.join(path, SERIES_DAILY_FILE)
+    if not os.path.exists(file_path):
+        return None
+    return _read_counted(file_path)
+
+
+def save_forecast(daily, models, n_rows, path):
+    """Persist the per-series daily sums, the rows they cover and the fitted forecast models next to the parquet store"""
+    _write_counted(daily, n_rows, os.path.join(path, FORECAST_DAILY_FILE), index=False)
+    models.to_parquet(os.path.join(path, FORECAST_MODEL_FILE), index=False)
+
+
+def load_forecast(path):
+    """Load (daily, models, n_rows) of a store's forecasts, or None if they were never saved"""
+    daily_path, models_path = (os.path.join(path, name) for name in [FORECAST_DAILY_FILE, FORECAST_MODEL_FILE])
+    if not (os.path.exists(daily_path) and os.path.exists(models_path)):
+        return None
+    daily, n_rows = _read_counted(daily_path)
+    return daily, pd.read_parquet(models_path), n_rows
+
+
+def save_anomalies(state, flags, pending, path):
+    """Persist the running anomaly statistics (JSON), the flagged rows and the open block next to the parquet store"""
+    with open(os.path.join(path, ANOMALY_STATE_FILE), 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False)
+    flags.to_parquet(os.path.join(path, ANOMALY_FILE), index=False)
+    pending.to_parquet(os.path.join(path, ANOMALY_PENDING_FILE), index=False)
+
+
+def load_anomalies(path):
+    """Load (state, flags, pending) of a store's anomaly detection, or None if it was never saved"""
+    files = [os.path.join(path, name) for name in [ANOMALY_STATE_FILE, ANOMALY_FILE, ANOMALY_PENDING_FILE]]
+    # State lama tanpa blok terbuka dianggap tidak ada (dibangun ulang dari store)
+    if not all(os.path.exists(file_path) for file_path in files):
+        return None
+    with open(files[0], encoding='utf-8') as f:
+        state = json.load(f)
+    return state, pd.read_parquet(files[1]), pd.read_parquet(files[2])
+
+
+def store_row_count(path):
+    """Number of rows in a parquet store, read from the part footers only"""
+    return sum(pq.ParquetFile(part).metadata.num_rows for part in _part_files(path))
+
+
+def csv_to_store(csv_path, store_path, schema):
+    """Convert an untyped cleaned CSV into a typed parquet store"""
+    df = pd.read_csv(csv_path)
+    return save_dataset(df, store_path, schema)
+
+
+def memory_usage_mb(df):
+    """Deep memory usage of a DataFrame in MB"""
+    return df.memory_usage(deep=True).sum() / (1024 * 1024)
+
+
+if __name__ == "__main__":
+    # Konversi CSV hasil cleaning lama ke store parquet
+    csv_to_store('Dataset/Cleaned/Sheet2_Cleaned.csv', SHEET2_STORE, SHEET2_SCHEMA)
+    csv_to_store('Dataset/Cleaned/Sheet3_Cleaned.csv', SHEET3_STORE, SHEET3_SCHEMA)
+    for store in [SHEET2_STORE, SHEET3_STORE]:
+        df = load_dataset(store)
+        print(f"{store}: {df.shape}, {memory_usage_mb(df):.2f} MB")
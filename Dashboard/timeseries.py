@@ -0,0 +1,207 @@
+# Engine deret waktu harian: indeks tanggal terurut per hari kalender, resampling hari/minggu/bulan,
+# dan jendela rolling 7/30 hari yang diperbarui secara inkremental saat baris baru ditambahkan
+import numpy as np
+import pandas as pd
+
+from cache import LRUCache
+from storage import load_daily_series, save_daily_series
+
+# Ukuran yang dijumlahkan per hari
+TREND_MEASURES = ['Pemasukan', 'Pengeluaran', 'Volume (L)']
+ROLLING_WINDOWS = [7, 30]
+
+# Label granularitas → aturan resample pandas (minggu berakhir hari Minggu, bulan dilabeli tanggal 1)
+FREQUENCIES = {'Harian': 'D', 'Mingguan': 'W', 'Bulanan': 'MS'}
+
+# Deret harian per versi data (dibagi antar sesi, jadi pemakai tidak boleh mengubahnya)
+SERIES_CACHE = LRUCache(maxsize=16)
+
+
+def build_daily(df, measures=TREND_MEASURES):
+    """Daily sums of the measures plus a row count, on a gap-free calendar-day index
+
+    One pass: dates become integer day numbers and every measure is summed
+    with a bincount, so no per-row strings or groupby keys are created.
+    """
+    measures = [col for col in measures if col in df.columns]
+    if 'Tanggal' not in df.columns:
+        return _empty_daily(measures)
+    tanggal = df['Tanggal']
+    # Kolom yang sudah datetime tidak dikonversi ulang (to_datetime memeriksa cache per nilai)
+    if not pd.api.types.is_datetime64_any_dtype(tanggal):
+        tanggal = pd.to_datetime(tanggal, errors='coerce')
+    days = tanggal.to_numpy(dtype='datetime64[D]')
+    valid = ~np.isnat(days)
+    if not valid.any():
+        return _empty_daily(measures)
+
+    day_numbers = days[valid].astype('int64')
+    start = day_numbers.min()
+    codes = day_numbers - start
+    n_days = int(codes.max()) + 1
+
+    data = {}
+    for col in measures:
+        values = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype='float64')[valid]
+        # Nilai kosong tidak ikut dijumlahkan (sama dengan sum pandas)
+        data[col] = np.bincount(codes, weights=np.nan_to_num(values, nan=0.0), minlength=n_days)
+    data['Jumlah_Baris'] = np.bincount(codes, minlength=n_days)
+    index = pd.date_range(pd.Timestamp(np.datetime64(int(start), 'D')), periods=n_days, freq='D', name='Tanggal')
+    return pd.DataFrame(data, index=index)
+
+
+def _empty_daily(measures):
+    columns = {col: pd.Series(dtype='float64') for col in measures}
+    columns['Jumlah_Baris'] = pd.Series(dtype='int64')
+    return pd.DataFrame(columns, index=pd.DatetimeIndex([], name='Tanggal', freq='D'))
+
+
+def merge_daily(daily, delta):
+    """Add a delta daily frame (from new rows) into an existing one, keeping the index gap-free"""
+    if len(delta) == 0:
+        return daily
+    if len(daily) == 0:
+        return delta
+    merged = daily.add(delta, fill_value=0)
+    index = pd.date_range(merged.index.min(), merged.index.max(), freq='D', name='Tanggal')
+    merged = merged.reindex(index, fill_value=0)
+    merged['Jumlah_Baris'] = merged['Jumlah_Baris'].astype('int64')
+    return merged
+
+
+class TimeSeries:
+    """Daily series with resampling and rolling windows served from prefix sums
+
+    Rolling sums are differences of a cumulative sum, so every window size
+    costs one vectorised subtraction. Appending rows only recomputes the
+    cumulative sums and cached windows from the first day the rows touch.
+    """
+
+    def __init__(self, daily, n_rows=None):
+        self.daily = daily
+        # Jumlah baris transaksi yang sudah dilipat ke deret (termasuk yang tanpa tanggal)
+        self.n_rows = int(daily['Jumlah_Baris'].sum()) if n_rows is None else int(n_rows)
+        self._columns = list(daily.columns)
+        self._cumsum = self._prefix_sums(daily.to_numpy(dtype='float64'))
+        self._rolling = {}
+
+    def __len__(self):
+        return len(self.daily)
+
+    def _prefix_sums(self, values, first=0):
+        # Baris i berisi jumlah hari 0..i-1; baris sampai hari pertama yang berubah dipakai ulang
+        prefix = np.zeros((len(values) + 1, values.shape[1]))
+        if first > 0:
+            prefix[:first + 1] = self._cumsum[:first + 1]
+        prefix[first + 1:] = prefix[first] + np.cumsum(values[first:], axis=0)
+        return prefix
+
+    def resample(self, frequency='D'):
+        """Sums per day ('D'), week ('W') or month ('MS'); accepts the FREQUENCIES labels too"""
+        frequency = FREQUENCIES.get(frequency, frequency)
+        if frequency == 'D' or len(self.daily) == 0:
+            return self.daily
+        return self.daily.resample(frequency).sum()
+
+    def rolling(self, window):
+        """Rolling window sums and moving averages per day ('{col}_sum_{w}', '{col}_avg_{w}')
+
+        Days before a full window is available are NaN, as with
+        DataFrame.rolling(window).sum().
+        """
+        if window not in self._rolling:
+            self._rolling[window] = self._window_frame(window, self._window_sums(window, 0), self.daily.index)
+        return self._rolling[window]
+
+    def _window_sums(self, window, start):
+        # Baris t berisi jumlah hari t-window+1..t; hari sebelum jendela penuh bernilai NaN
+        n_days = len(self.daily)
+        sums = np.full((n_days - start, len(self._columns)), np.nan)
+        first = max(start, window - 1)
+        if first < n_days:
+            ends = np.arange(first, n_days)
+            sums[first - start:] = self._cumsum[ends + 1] - self._cumsum[ends + 1 - window]
+        return sums
+
+    def _window_frame(self, window, sums, index):
+        frame = pd.DataFrame(index=index)
+        for i, col in enumerate(self._columns):
+            if col == 'Jumlah_Baris':
+                continue
+            frame[f'{col}_sum_{window}'] = sums[:, i]
+            frame[f'{col}_avg_{window}'] = sums[:, i] / window
+        return frame
+
+    def append(self, rows):
+        """Fold new transaction rows into the series, updating only the affected tail"""
+        delta = build_daily(rows, [col for col in self._columns if col != 'Jumlah_Baris'])
+        self.n_rows += len(rows)
+        if len(delta) == 0:
+            return self
+        old_start = self.daily.index[0] if len(self.daily) else None
+        old_days = len(self.daily)
+        self.daily = merge_daily(self.daily, delta)
+
+        # Baris yang lebih tua dari awal deret menggeser seluruh indeks: hitung ulang semuanya
+        if old_start is None or delta.index[0] < old_start:
+            self._cumsum = self._prefix_sums(self.daily.to_numpy(dtype='float64'))
+            self._rolling = {}
+            return self
+
+        # Hari kosong di antara akhir deret lama dan baris baru juga belum punya prefix sum
+        first_changed = min(self.daily.index.get_loc(delta.index[0]), old_days)
+        self._cumsum = self._prefix_sums(self.daily.to_numpy(dtype='float64'), first_changed)
+
+        # Jendela yang sudah dihitung hanya diperbarui mulai hari pertama yang berubah
+        for window, frame in self._rolling.items():
+            tail = self._window_frame(window, self._window_sums(window, first_changed),
+                                      self.daily.index[first_changed:])
+            self._rolling[window] = pd.concat([frame.iloc[:first_changed], tail])
+        return self
+
+
+def build_timeseries(df):
+    """TimeSeries of all rows of df"""
+    return TimeSeries(build_daily(df), len(df))
+
+
+def save_timeseries(series, store_path):
+    """Persist the daily sums of a TimeSeries next to a parquet store"""
+    save_daily_series(series.daily, series.n_rows, store_path)
+
+
+def load_timeseries(store_path):
+    """TimeSeries persisted in a store, or None"""
+    loaded = load_daily_series(store_path)
+    if loaded is None:
+        return None
+    daily, n_rows = loaded
+    if n_rows is None:
+        return None
+    if len(daily) == 0:
+        return TimeSeries(_empty_daily([col for col in daily.columns if col != 'Jumlah_Baris']), n_rows)
+    # Parquet tidak menyimpan frekuensi indeks; indeks harian tanpa celah dibangun ulang
+    daily.index = pd.date_range(daily.index[0], periods=len(daily), freq='D', name='Tanggal')
+    return TimeSeries(daily, n_rows)
+
+
+def cube_timeseries(df, cube, stored=None):
+    """TimeSeries of df, built once per data version of a tagged cube
+
+    A stored series (kept up to date by ingest/pipeline through append) is
+    reused when it covers the same number of rows.
+    """
+    def build():
+        if stored is not None and stored.n_rows == len(df):
+            return stored
+        return build_timeseries(df)
+
+    tag = cube.attrs.get('cache_version')
+    if tag is None or tag[1] != id(cube):
+        return build()
+    return SERIES_CACHE.get_or_compute(tag[0], build)
+
+
+def invalidate_series(predicate=None):
+    """Drop cached series whose data version matches predicate (all if None)"""
+    return SERIES_CACHE.invalidate(predicate)
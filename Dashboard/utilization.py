@@ -0,0 +1,114 @@
+# Utilisasi armada: jarak pulang-pergi depot → lokasi Order per trip (haversine tervektorisasi),
+# agregat km, liter, trip, dan biaya per plat per hari, serta biaya/km, pendapatan/km, dan hari menganggur
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+
+from cache import LRUCache
+from geo import location_dimension
+from routing import base_distances, default_base
+
+UTILIZATION_COLUMNS = ['Tanggal', 'Plat Nomor', 'Order', 'Volume (L)', 'Pemasukan', 'Pengeluaran']
+DAILY_MEASURES = ['Trip', 'Trip Tanpa Lokasi', 'Km', 'Volume (L)', 'Pemasukan', 'Pengeluaran']
+
+# Hasil per (versi data, base)
+UTILIZATION_CACHE = LRUCache(maxsize=16)
+
+
+def trip_mask(df):
+    """Rows that are deliveries (litres delivered and paid for)"""
+    volume = pd.to_numeric(df['Volume (L)'], errors='coerce').to_numpy(dtype='float64')
+    pemasukan = pd.to_numeric(df['Pemasukan'], errors='coerce').to_numpy(dtype='float64')
+    return (volume > 0) & (pemasukan > 0)
+
+
+def trip_distances(df, locations, base):
+    """Round-trip km from base per row; NaN for non-delivery rows and Orders without coordinates"""
+    km = 2 * base_distances(locations, base)[locations.ids(df['Order'])]
+    return np.where(trip_mask(df), km, np.nan)
+
+
+def daily_utilization(df, locations, base):
+    """Trips, km, litres, revenue and expenses per plate per day"""
+    trips = trip_mask(df)
+    km = trip_distances(df, locations, base)
+    volume = pd.to_numeric(df['Volume (L)'], errors='coerce').to_numpy(dtype='float64')
+    frame = pd.DataFrame({
+        'Plat Nomor': df['Plat Nomor'],
+        'Tanggal': pd.to_datetime(df['Tanggal'], errors='coerce').dt.normalize(),
+        'Trip': trips.astype('int64'),
+        'Trip Tanpa Lokasi': (trips & np.isnan(km)).astype('int64'),
+        'Km': np.nan_to_num(km),
+        # Liter hanya dari trip berlokasi agar liter per km sebanding dengan km
+        'Volume (L)': np.where(np.isnan(km), 0.0, volume),
+        'Pemasukan': pd.to_numeric(df['Pemasukan'], errors='coerce').fillna(0).to_numpy(dtype='float64'),
+        'Pengeluaran': pd.to_numeric(df['Pengeluaran'], errors='coerce').fillna(0).to_numpy(dtype='float64')
+    }, index=df.index)
+    daily = frame.groupby(['Plat Nomor', 'Tanggal'], observed=True, sort=True)[DAILY_MEASURES].sum()
+    return daily.reset_index()
+
+
+def _per_km(numerator, km):
+    # Km 0 (belum ada trip berlokasi) tidak punya rasio per km
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (numerator / km).where(km > 0)
+
+
+@dataclass
+class UtilizationResult:
+    """Per plate per day and per plate utilization over the period of the data"""
+    daily: pd.DataFrame
+    per_plate: pd.DataFrame
+    period_days: int
+
+    def fleet(self):
+        """Fleet totals: km, trips, cost/km, revenue/km, litres/km and utilization"""
+        totals = self.per_plate[['Trip', 'Km', 'Volume (L)', 'Pemasukan', 'Pengeluaran', 'Hari Aktif']].sum()
+        km = totals['Km']
+        plate_days = self.period_days * len(self.per_plate)
+        return {
+            'trip': int(totals['Trip']),
+            'km': float(km),
+            'biaya_per_km': totals['Pengeluaran'] / km if km > 0 else np.nan,
+            'pendapatan_per_km': totals['Pemasukan'] / km if km > 0 else np.nan,
+            'liter_per_km': totals['Volume (L)'] / km if km > 0 else np.nan,
+            'utilisasi': totals['Hari Aktif'] / plate_days * 100 if plate_days > 0 else 0.0
+        }
+
+
+def compute_utilization(df, df_locations, base=None):
+    """Utilization of every plate; idle days are the days of the data period without a delivery"""
+    locations = location_dimension(df_locations)
+    if base is None:
+        base = default_base(locations)
+    daily = daily_utilization(df, locations, base)
+
+    dates = daily['Tanggal'].dropna()
+    period_days = int((dates.max() - dates.min()).days) + 1 if len(dates) else 0
+
+    grouped = daily.groupby('Plat Nomor', observed=True, sort=True)
+    per_plate = grouped[DAILY_MEASURES].sum()
+    per_plate['Hari Aktif'] = (daily['Trip'] > 0).groupby(daily['Plat Nomor'], observed=True, sort=True).sum()
+    per_plate['Hari Menganggur'] = period_days - per_plate['Hari Aktif']
+    per_plate['Utilisasi (%)'] = per_plate['Hari Aktif'] / period_days * 100 if period_days else 0.0
+    per_plate['Biaya per Km'] = _per_km(per_plate['Pengeluaran'], per_plate['Km'])
+    per_plate['Pendapatan per Km'] = _per_km(per_plate['Pemasukan'], per_plate['Km'])
+    per_plate['Liter per Km'] = _per_km(per_plate['Volume (L)'], per_plate['Km'])
+    return UtilizationResult(daily, per_plate.reset_index(), period_days)
+
+
+def cube_utilization(df, cube, df_locations, base=None):
+    """Fleet utilization, memoized per data version of a tagged cube and base"""
+    locations = location_dimension(df_locations)
+    if base is None:
+        base = default_base(locations)
+
+    tag = cube.attrs.get('cache_version')
+    if tag is None or tag[1] != id(cube):
+        return compute_utilization(df, locations, base)
+    return UTILIZATION_CACHE.get_or_compute((tag[0], base), lambda: compute_utilization(df, locations, base))
+
+
+def invalidate_utilization(predicate=None):
+    """Drop cached utilization results whose data version matches predicate (all if None)"""
+    return UTILIZATION_CACHE.invalidate(None if predicate is None else lambda key: predicate(key[0]))